@@ -0,0 +1,123 @@
+"""
+Memory the Python engine allocates per tick, traced with tracemalloc.
+
+    python -m benchmarks.allocations
+    python -m benchmarks.allocations --scenarios water_flood --size 160x240 --ticks 50
+
+Tracing restarts every tick. Blocks and retained bytes are what the tick allocated and still holds
+at its end, like positions replaced on every move. Temporaries freed within a particle step only
+show up in the peak.
+
+--output saves the numbers as JSON, --baseline puts an earlier output next to them with the change.
+The script only needs Simulation and the scenarios, so it also measures older revisions, like the glm
+based particle steps before the int ones:
+
+    git worktree add ../before <revision>
+    cp benchmarks/allocations.py ../before/benchmarks/
+    (cd ../before && python -m benchmarks.allocations --output before.json)
+    python -m benchmarks.allocations --baseline ../before/before.json
+"""
+from typing import Dict, Any, Optional
+from time import perf_counter
+import argparse
+import json
+import tracemalloc
+
+from benchmarks.scenarios import SCENARIOS, Scenario
+from benchmarks.suite import parse_size, git_revision
+
+
+def measure(scenario: Scenario, height: int, width: int,
+            ticks: int = 30, warmup: int = 10, seed: int = 0) -> Dict[str, float]:
+    """
+    :param warmup: untraced ticks first, so one-off caches don't count
+    :returns: per tick means of peak and retained bytes, retained blocks, moved particles and ms
+    """
+    from src.simulation import Simulation, PENS
+    simulation = Simulation(height, width, seed=seed)
+    scenario.setup(simulation, PENS)
+    total = warmup + ticks
+
+    def tick(index: int) -> None:
+        if scenario.feed is not None:
+            scenario.feed(simulation, PENS, index, total)
+        simulation.step()
+
+    for index in range(warmup):
+        tick(index)
+
+    peak = retained = blocks = moved = elapsed = 0.0
+    for index in range(warmup, total):
+        tracemalloc.start()
+        try:
+            started = perf_counter()
+            tick(index)
+            elapsed += perf_counter() - started
+            current, top = tracemalloc.get_traced_memory()
+            traces = len(tracemalloc.take_snapshot().traces)
+        finally:
+            tracemalloc.stop()
+
+        peak += top
+        retained += current
+        blocks += traces
+        moved += simulation.moved_particles
+
+    return {
+        "peak_bytes": peak / ticks,
+        "retained_bytes": retained / ticks,
+        "blocks": blocks / ticks,
+        "moved_particles": moved / ticks,
+        "ms": 1000 * elapsed / ticks,
+    }
+
+
+def change(result: Dict[str, float], before: Optional[Dict[str, float]], name: str, scale: float = 1.0) -> str:
+    """ " before -> after (+delta)" of one number, empty without a baseline"""
+    if before is None:
+        return ""
+    old, new = before[name] / scale, result[name] / scale
+    return f" | {f'{old:.1f} -> {new:.1f} ({new - old:+.1f})':>33}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", default=["sand_avalanche", "water_flood"], choices=list(SCENARIOS))
+    parser.add_argument("--size", type=parse_size, default=(80, 120), help="board size as HEIGHTxWIDTH")
+    parser.add_argument("--ticks", type=int, default=30)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="also write the numbers here as JSON")
+    parser.add_argument("--baseline", help="earlier --output to show the numbers against")
+    args = parser.parse_args()
+
+    height, width = args.size
+    settings = {"height": height, "width": width, "ticks": args.ticks, "warmup": args.warmup, "seed": args.seed}
+    baseline: Dict[str, Any] = {}
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        if baseline["meta"]["settings"] != settings:
+            parser.error(f"baseline was measured with {baseline['meta']['settings']}, not {settings}")
+
+    header = f"{'scenario':>16} | {'peak KiB':>8} | {'retained KiB':>12} | {'blocks':>6} | {'moved':>5} | {'traced ms':>9}"
+    if baseline:
+        header += f" | {'blocks before -> after':>33} | {'retained KiB before -> after':>33}"
+    print(header)
+    results = {}
+    for name in args.scenarios:
+        result = results[name] = measure(SCENARIOS[name], height, width, args.ticks, args.warmup, args.seed)
+        before = baseline.get("results", {}).get(name)
+        print(f"{name:>16} | {result['peak_bytes'] / 1024:>8.1f} | {result['retained_bytes'] / 1024:>12.1f} | "
+              f"{result['blocks']:>6.0f} | {result['moved_particles']:>5.0f} | {result['ms']:>9.1f}"
+              f"{change(result, before, 'blocks')}{change(result, before, 'retained_bytes', 1024)}")
+    print("per tick means" + (f", baseline revision {baseline['meta']['revision']}" if baseline else ""))
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump({"meta": {"revision": git_revision(), "settings": settings}, "results": results}, file, indent=2)
+            file.write("\n")
+
+
+if __name__ == "__main__":
+    main()
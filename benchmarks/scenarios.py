@@ -0,0 +1,106 @@
+"""
+Canned scenarios painted through the common Simulation API, so every engine runs the same input.
+Coordinates are fractions of the board, so a scenario scales with the board size.
+"""
+from typing import Callable, Dict, Any, Tuple, Optional
+import os
+
+from src import replay
+
+
+# pen name -> whatever the engine's paint() takes
+Pens = Dict[str, Any]
+
+
+class Scenario:
+    def __init__(self, name: str, setup: Callable[[Any, Pens], None],
+                 feed: Optional[Callable[[Any, Pens, int, int], None]] = None,
+                 size: Optional[Tuple[int, int]] = None, ticks: Optional[int] = None) -> None:
+        """
+        :param setup: paints the starting board
+        :param feed: called before every tick with (simulation, pens, tick, ticks), for input that keeps coming
+        :param size: (height, width) the scenario only runs at, any size if None
+        :param ticks: length of the scenario, the suite decides if None
+        """
+        self.name = name
+        self.setup = setup
+        self.feed = feed
+        self.size = size
+        self.ticks = ticks
+
+    def __repr__(self) -> str:
+        return f"Scenario({self.name})"
+
+
+def stroke(simulation: Any, start: Tuple[float, float], end: Tuple[float, float], pen: Any) -> None:
+    """Paint from start to end, both (x, y) as fractions of the board"""
+    width, height = simulation.width - 1, simulation.height - 1
+    simulation.paint(
+        (round(start[0] * width), round(start[1] * height)),
+        (round(end[0] * width), round(end[1] * height)),
+        pen
+    )
+
+
+def sand_avalanche(simulation: Any, pens: Pens) -> None:
+    # A tall heap in the top left corner sliding down to the right
+    simulation.pen_size = 4
+    y = 0.05
+    while y < 0.5:
+        stroke(simulation, (0.05, y), (0.35, y), pens["sand"])
+        y += 0.03
+
+
+def water_basin(simulation: Any, pens: Pens) -> None:
+    simulation.pen_size = 2
+    stroke(simulation, (0.2, 0.9), (0.8, 0.9), pens["wood"])
+    stroke(simulation, (0.2, 0.9), (0.2, 0.5), pens["wood"])
+    stroke(simulation, (0.8, 0.9), (0.8, 0.5), pens["wood"])
+
+
+def water_flood(simulation: Any, pens: Pens, tick: int, ticks: int) -> None:
+    # Pour for the first half of the run
+    if tick < ticks // 2 and tick % 2 == 0:
+        simulation.pen_size = 3
+        stroke(simulation, (0.4, 0.05), (0.6, 0.05), pens["water"])
+
+
+def forest(simulation: Any, pens: Pens) -> None:
+    simulation.pen_size = 2
+    x = 0.1
+    while x < 0.95:
+        stroke(simulation, (x, 0.98), (x, 0.7), pens["wood"])
+        stroke(simulation, (x - 0.03, 0.72), (x + 0.03, 0.72), pens["wood"])
+        x += 0.08
+    # A ground fire under the first trees
+    simulation.pen_size = 3
+    stroke(simulation, (0.05, 0.97), (0.3, 0.97), pens["fire"])
+
+
+def idle(simulation: Any, pens: Pens) -> None:
+    pass
+
+
+def recorded(path: str) -> Scenario:
+    """Scenario replaying a src.replay recording at the size it was recorded on"""
+    recording = replay.load(path)
+    events = replay.events_by_tick(recording)
+
+    def feed(simulation: Any, pens: Pens, tick: int, ticks: int) -> None:
+        for event in events.get(tick, ()):
+            replay.paint(simulation, event, pens)
+
+    return Scenario(
+        f"replay:{os.path.basename(path)}", idle, feed,
+        size=(recording["height"], recording["width"]), ticks=recording["ticks"]
+    )
+
+
+SCENARIOS: Dict[str, Scenario] = {
+    scenario.name: scenario for scenario in (
+        Scenario("sand_avalanche", sand_avalanche),
+        Scenario("water_flood", water_basin, water_flood),
+        Scenario("forest_fire", forest),
+        Scenario("idle", idle),
+    )
+}
@@ -0,0 +1,289 @@
+"""
+Run the canned scenarios against every engine and print the results as JSON.
+
+    python -m benchmarks.suite --output results.json
+    python -m benchmarks.suite --engines cver --sizes 200x360 --baseline results.json
+
+Every run reports ticks/sec, per-phase ms (paint, reset_chunks, update, redraw) and active chunk counts,
+the paged engine also its page hits, misses, evictions and page in latency.
+With --baseline the run is compared against an earlier output and exits with 1 if any
+engine/scenario/size lost more than --tolerance of its ticks/sec.
+"""
+import os
+import sys
+import json
+import argparse
+import platform
+import subprocess
+from time import perf_counter
+from typing import Dict, List, Any, Optional, Tuple
+
+# Redraw goes through pygame, no window needed
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+from values import *
+from src.config import parse_size
+from benchmarks.scenarios import SCENARIOS, Scenario, recorded
+
+PHASES = ("paint", "reset_chunks", "update", "redraw")
+SIZES = ((80, 120), (160, 240), (BOARD_Y, BOARD_X))
+
+
+class Engine:
+    """How to build a simulation and a display of one implementation"""
+    name = ""
+
+    def pens(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def simulation(self, height: int, width: int, seed: int, chunk_size: int = CHUNK_SIZE) -> Any:
+        raise NotImplementedError
+
+    def display(self, simulation: Any) -> Any:
+        raise NotImplementedError
+
+    def chunk_count(self, simulation: Any) -> int:
+        raise NotImplementedError
+
+    def report(self, simulation: Any) -> Dict[str, Any]:
+        """Engine specific entries of a run's result"""
+        return {}
+
+
+class PythonEngine(Engine):
+    name = "src"
+
+    def pens(self) -> Dict[str, Any]:
+        from src.simulation import PENS
+        return PENS
+
+    def simulation(self, height: int, width: int, seed: int, chunk_size: int = CHUNK_SIZE) -> Any:
+        from src.simulation import Simulation
+        return Simulation(height, width, chunk_size, seed=seed)
+
+    def display(self, simulation: Any) -> Any:
+        import pygame as py
+        from src.draw import Display
+        py.display.init()
+        return Display(WX, WY, simulation)
+
+    def chunk_count(self, simulation: Any) -> int:
+        return simulation.chunks.size
+
+
+class CythonEngine(Engine):
+    name = "cver"
+
+    def pens(self) -> Dict[str, Any]:
+        from cver.csimulation import PENS
+        return PENS
+
+    def simulation(self, height: int, width: int, seed: int, chunk_size: int = CHUNK_SIZE) -> Any:
+        from cver.csimulation import Simulation
+        return Simulation(height, width, chunk_size, seed=seed)
+
+    def display(self, simulation: Any) -> Any:
+        import pygame as py
+        from cver.cdraw import Display
+        py.display.init()
+        return Display(WX, WY, simulation)
+
+    def chunk_count(self, simulation: Any) -> int:
+        return simulation.chunkRows * simulation.chunkColumns
+
+
+class AutomatonEngine(PythonEngine):
+    name = "numpy"
+
+    def simulation(self, height: int, width: int, seed: int, chunk_size: int = CHUNK_SIZE) -> Any:
+        from src.automaton import Automaton
+        return Automaton(height, width, chunk_size, seed=seed)
+
+
+class PagedEngine(PythonEngine):
+    """src Simulation on a PagedBoard with a small memory cap, so the larger boards page"""
+    name = "paged"
+    max_bytes = 4 << 20
+
+    def simulation(self, height: int, width: int, seed: int, chunk_size: int = CHUNK_SIZE) -> Any:
+        from functools import partial
+        from src.simulation import Simulation
+        from src.paging import PagedBoard
+        return Simulation(height, width, chunk_size, seed=seed,
+                          board_type=partial(PagedBoard, page_size=chunk_size, max_bytes=self.max_bytes))
+
+    def report(self, simulation: Any) -> Dict[str, Any]:
+        return {"paging": simulation.board.stats()}
+
+
+ENGINES: Dict[str, Engine] = {
+    engine.name: engine for engine in (PythonEngine(), CythonEngine(), AutomatonEngine(), PagedEngine())
+}
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    return {
+        "mean": sum(ordered) / len(ordered) if ordered else 0.0,
+        "p50": ordered[len(ordered) // 2] if ordered else 0.0,
+        "max": ordered[-1] if ordered else 0.0,
+        "total": sum(ordered),
+    }
+
+
+def run(engine: Engine, scenario: Scenario, height: int, width: int,
+        ticks: int, seed: int, redraw: bool = True, chunk_size: int = CHUNK_SIZE) -> Dict[str, Any]:
+    simulation = engine.simulation(height, width, seed, chunk_size)
+    display = engine.display(simulation) if redraw else None
+    pens = engine.pens()
+    scenario.setup(simulation, pens)
+
+    phases: Dict[str, List[float]] = {phase: [] for phase in PHASES}
+    active_chunks = []
+
+    start = perf_counter()
+    for tick in range(ticks):
+        # Same order as Simulation.step, timed phase by phase
+        t0 = perf_counter()
+        if scenario.feed is not None:
+            scenario.feed(simulation, pens, tick, ticks)
+        t1 = perf_counter()
+        simulation.reset_chunks()
+        t2 = perf_counter()
+        simulation.update()
+        simulation.tick += 1
+        t3 = perf_counter()
+        if display is not None:
+            display.redraw()
+        t4 = perf_counter()
+
+        phases["paint"].append(1000 * (t1 - t0))
+        phases["reset_chunks"].append(1000 * (t2 - t1))
+        phases["update"].append(1000 * (t3 - t2))
+        phases["redraw"].append(1000 * (t4 - t3))
+        active_chunks.append(simulation.active_chunks())
+    elapsed = perf_counter() - start
+
+    return {
+        "engine": engine.name,
+        "scenario": scenario.name,
+        "height": height,
+        "width": width,
+        "chunk_size": chunk_size,
+        "ticks": ticks,
+        "ticks_per_sec": ticks / elapsed if elapsed else 0.0,
+        "phases_ms": {phase: summarize(samples) for phase, samples in phases.items()},
+        "active_chunks": {
+            "mean": sum(active_chunks) / len(active_chunks) if active_chunks else 0.0,
+            "max": max(active_chunks, default=0),
+            "final": active_chunks[-1] if active_chunks else 0,
+            "total": engine.chunk_count(simulation),
+        },
+        **engine.report(simulation),
+    }
+
+
+def key(result: Dict[str, Any]) -> Tuple[str, str, int, int]:
+    return result["engine"], result["scenario"], result["height"], result["width"]
+
+
+def compare(results: List[Dict[str, Any]], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """
+    :returns: description of every run slower than the baseline by more than tolerance
+    """
+    previous = {key(result): result for result in baseline["results"]}
+    regressions = []
+    for result in results:
+        old = previous.get(key(result))
+        if old is None or not old["ticks_per_sec"]:
+            continue
+        ratio = result["ticks_per_sec"] / old["ticks_per_sec"]
+        result["baseline_ratio"] = ratio
+        if ratio < 1.0 - tolerance:
+            regressions.append("{} {} {}x{}: {:.1f} -> {:.1f} ticks/sec".format(
+                *key(result), old["ticks_per_sec"], result["ticks_per_sec"]
+            ))
+    return regressions
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--engines", nargs="+", default=list(ENGINES), choices=list(ENGINES))
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument("--sizes", nargs="+", type=parse_size, default=list(SIZES),
+                        help="board sizes as HEIGHTxWIDTH")
+    parser.add_argument("--replay", metavar="PATH", help="add a scenario replaying a recording (src.replay)")
+    parser.add_argument("--ticks", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--no-redraw", dest="redraw", action="store_false", help="skip the display entirely")
+    parser.add_argument("--output", help="write the JSON here instead of stdout")
+    parser.add_argument("--baseline", help="earlier output to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="allowed ticks/sec loss against the baseline")
+    args = parser.parse_args()
+
+    scenarios = {name: SCENARIOS[name] for name in args.scenarios}
+    if args.replay:
+        scenario = recorded(args.replay)
+        scenarios[scenario.name] = scenario
+
+    results = []
+    skipped = {}
+    for name in args.engines:
+        engine = ENGINES[name]
+        for scenario in scenarios.values():
+            for height, width in [scenario.size] if scenario.size else args.sizes:
+                try:
+                    result = run(engine, scenario, height, width, scenario.ticks or args.ticks, args.seed, args.redraw,
+                                 args.chunk_size)
+                except ImportError as error:  # cver not built
+                    skipped[name] = str(error)
+                    break
+                results.append(result)
+                print("{} {} {}x{}: {:.1f} ticks/sec".format(*key(result), result["ticks_per_sec"]), file=sys.stderr)
+            if name in skipped:
+                break
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "ticks": args.ticks,
+            "seed": args.seed,
+            "chunk_size": args.chunk_size,
+            "redraw": args.redraw,
+            "skipped": skipped,
+        },
+        "results": results,
+    }
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        report["regressions"] = regressions
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(text + "\n")
+    else:
+        print(text)
+
+    for regression in regressions:
+        print("REGRESSION", regression, file=sys.stderr)
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
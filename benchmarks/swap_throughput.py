@@ -0,0 +1,28 @@
+"""
+Particle swap throughput of cver.tools against the number of threads.
+"owned" is the update's model: every worker swaps lock-free in a band of the board nobody else touches.
+"locked" is what it replaces: workers swap anywhere on the board, every swap behind one board wide lock.
+
+    python setup.py build_ext
+    python -m benchmarks.swap_throughput
+"""
+import argparse
+
+from cver.tools import swap_throughput
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--swaps", type=int, default=2_000_000)
+    args = parser.parse_args()
+
+    print(f"{'threads':>7} | {'owned Mswaps/s':>14} | {'locked Mswaps/s':>15}")
+    for threads in args.threads:
+        owned = swap_throughput(threads, args.swaps, owned=True) / 1e6
+        locked = swap_throughput(threads, args.swaps, owned=False) / 1e6
+        print(f"{threads:>7} | {owned:>14.2f} | {locked:>15.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Pick the chunk size a workload runs fastest with on a given board.
+
+    python -m benchmarks.tune --engine cver --size 800x1440 --scenario water_flood
+    python main.py --size 800x1440 --chunk-size auto
+
+Every candidate runs the same scenario headless (no redraw) from the same seed and the most ticks/sec wins.
+Small chunks skip more settled cells, big ones cost less bookkeeping; where that balances depends on the engine,
+the board and what moves on it, so it is measured instead of guessed.
+"""
+from typing import Dict, Sequence, Tuple
+import argparse
+
+from benchmarks.scenarios import SCENARIOS, Scenario, recorded
+from benchmarks.suite import ENGINES, Engine, run
+from src.config import parse_size
+
+CANDIDATES = (8, 10, 16, 20, 25, 32, 40, 50, 64)
+
+
+def tune(engine: Engine, scenario: Scenario, height: int, width: int,
+         candidates: Sequence[int] = CANDIDATES, ticks: int = 30, seed: int = 0) -> Tuple[int, Dict[int, float]]:
+    """
+    :param candidates: chunk sizes to try, those larger than the board are skipped
+    :param ticks: length of every run, unless the scenario has its own
+    :returns: the fastest chunk size and the ticks/sec of every one tried
+    """
+    results = {}
+    for chunk_size in candidates:
+        if chunk_size > max(height, width):
+            continue
+        result = run(engine, scenario, height, width, scenario.ticks or ticks, seed, redraw=False, chunk_size=chunk_size)
+        results[chunk_size] = result["ticks_per_sec"]
+    if not results:
+        raise ValueError(f"no candidate chunk size fits a {height}x{width} board")
+    return max(results, key=results.get), results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--engine", default="src", choices=list(ENGINES))
+    parser.add_argument("--size", type=parse_size, required=True, help="board size as HEIGHTxWIDTH")
+    parser.add_argument("--scenario", default="water_flood", choices=list(SCENARIOS))
+    parser.add_argument("--replay", metavar="PATH", help="tune on a recording (src.replay) instead of a scenario")
+    parser.add_argument("--candidates", nargs="+", type=int, default=list(CANDIDATES))
+    parser.add_argument("--ticks", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    scenario = recorded(args.replay) if args.replay else SCENARIOS[args.scenario]
+    height, width = scenario.size or args.size
+    best, results = tune(ENGINES[args.engine], scenario, height, width, args.candidates, args.ticks, args.seed)
+
+    print(f"{args.engine} {scenario.name} {height}x{width}")
+    for chunk_size, ticks_per_sec in results.items():
+        print(f"{chunk_size:>4} | {ticks_per_sec:>8.1f} ticks/sec{'  <- fastest' if chunk_size == best else ''}")
+
+
+if __name__ == "__main__":
+    main()
@@ -16,7 +16,8 @@ cdef struct Particle_t:
     bint isFalling
 
     ParticleType pType
-    int color
+    # Index into src.particle.PALETTE
+    unsigned char color
 
     ivec pos
     vec vel
@@ -31,13 +32,18 @@ cdef struct Particle_t:
     int dispersion
     float mass
 
+cdef void seedRandom(unsigned int seed) nogil
+cdef unsigned int mixSeed(unsigned int seed, unsigned int a, unsigned int b) nogil
+cdef int particleReach() nogil
+
 cdef bint onUpdate(Particle_t* particle, Board* board) nogil
 cdef void resetParticle(Particle_t* particle) nogil
 cdef bint isValid(ParticleType particle, ParticleType spot)
 
-cdef Particle_t Sand(int y, int x, bint beenUpdated, bint isFalling)
-cdef Particle_t Water(int y, int x, bint beenUpdated, bint isFalling)
-cdef Particle_t Wood(int y, int x, bint beenUpdated, bint isFalling)
-cdef Particle_t Fire(int y, int x, bint beenUpdated, bint isFalling)
-cdef Particle_t Smoke(int y, int x, bint beenUpdated, bint isFalling)
-cdef Particle_t Empty(int y, int x, bint beenUpdated, bint isFalling)
+cdef Particle_t Sand(int y, int x, bint beenUpdated, bint isFalling) nogil
+cdef Particle_t Water(int y, int x, bint beenUpdated, bint isFalling) nogil
+cdef Particle_t Wood(int y, int x, bint beenUpdated, bint isFalling) nogil
+cdef Particle_t Fire(int y, int x, bint beenUpdated, bint isFalling) nogil
+cdef Particle_t Smoke(int y, int x, bint beenUpdated, bint isFalling) nogil
+cdef Particle_t Empty(int y, int x, bint beenUpdated, bint isFalling) nogil
+cdef Particle_t makeParticle(ParticleType pType, int y, int x, bint beenUpdated, bint isFalling) nogil
@@ -1,28 +1,68 @@
-import random
 from values import *
 
 from libc.stdio cimport printf, puts
-from libc.stdlib cimport RAND_MAX, rand, srand
 
 from cver.cparticle cimport *
-srand(0)
-
 
+# Every thread draws from its own xorshift32 stream, the simulation reseeds it per block of chunks
+# so the numbers a particle sees don't depend on which thread updates it
+cdef extern from *:
+    """
+    static __thread unsigned int particleRandomState = 0x9E3779B9u;
+    """
+    unsigned int particleRandomState
+
+
+cdef void seedRandom(unsigned int seed) nogil:
+    global particleRandomState
+    # xorshift never leaves 0
+    particleRandomState = seed if seed else 0x9E3779B9U
+
+cdef unsigned int mixSeed(unsigned int seed, unsigned int a, unsigned int b) nogil:
+    cdef unsigned int h = seed ^ 0x9E3779B9U
+    h = (h ^ a) * 0x85EBCA6BU
+    h = (h ^ (h >> 13) ^ b) * 0xC2B2AE35U
+    return h ^ (h >> 16)
+
+cdef inline unsigned int xorshift() nogil:
+    global particleRandomState
+    cdef unsigned int x = particleRandomState
+    x ^= x << 13
+    x ^= x >> 17
+    x ^= x << 5
+    particleRandomState = x
+    return x
+
+cdef inline int randomInt() nogil:
+    # [0, 2^31)
+    return <int>(xorshift() >> 1)
 cdef inline float randomize() nogil:
-    return rand() / (1.0 * RAND_MAX)
+    # [0, 1) from the top 24 bits
+    return (xorshift() >> 8) * (1.0 / 16777216.0)
 cdef inline bint zeroOrOne() nogil:
     return randomize() > 0.5
 
 
-cdef int[5][4] COLORS = [  # R G B  24bits
-    [0xE4EB15, 0xFFCD18, 0xC1C707, 0xE49009],  # Sand
-    [0x0F5E9C, 0x1CA3EC, 0x2389DA, 0x5ABCD8],  # Water
-    [0x461F00, 0x643D01, 0x8C6529, 0x000000],  # Wood
-    [0xFF0000, 0xFF4500, 0xE25822, 0x000000],  # Fire
-    [0x0A0A0A, 0x232323, 0x2C2424, 0x000000]   # Smoke
+cdef unsigned char[5][4] SHADES = [  # src.particle.PALETTE indexes, src.particle.SHADES
+    [1, 2, 3, 4],     # Sand
+    [5, 6, 7, 8],     # Water
+    [9, 10, 11, 0],   # Wood
+    [12, 13, 14, 0],  # Fire
+    [15, 16, 17, 0]   # Smoke
 ]
 cdef float G_GRAVITY = <float>GRAVITY
 cdef float G_AIR_FRICTION = <float>AIR_FRICTION
+cdef float G_TERMINAL_VELOCITY = <float>TERMINAL_VELOCITY
+cdef int WATER_DISPERSION = 3
+
+
+cdef int particleReach() nogil:
+    # path along the velocity, then a diagonal step and a dispersion slide twice, plus neighbours read on the way
+    return <int>G_TERMINAL_VELOCITY + 2 * (1 + WATER_DISPERSION) + 1
+
+cdef inline void clampVelocity(Particle_t* particle) nogil:
+    particle.vel.y = max(-G_TERMINAL_VELOCITY, min(particle.vel.y, G_TERMINAL_VELOCITY))
+    particle.vel.x = max(-G_TERMINAL_VELOCITY, min(particle.vel.x, G_TERMINAL_VELOCITY))
 
 
 cdef bint eqParticle(Particle_t* particle, Particle_t* other) nogil:
@@ -111,22 +151,26 @@ cdef bint sandStep(Particle_t* particle, Board* board) nogil:
     cdef ivec targetPosition
     
     cdef vec pos, additionalPos
-    cdef ivec* ipos = NULL
+    cdef ivec cell
+    cdef ivec* ipos = &cell
     cdef ivec iadditionalPos
 
+    cdef ivec* ray
+    cdef int rayLength, step
+
     cdef float velOnHit, direction
 
     particle.vel.y += G_GRAVITY
     if particle.isFalling:
         particle.vel.x *= G_AIR_FRICTION
+    clampVelocity(particle)
 
-    targetPosition = roundv(&particle.vel)
-    targetPosition = iaddv(&particle.pos, &targetPosition)
-
-    interpolatePos(&particle.pos, &targetPosition, 0)  # skipping current position
-    ipos = interpolatePos(NULL, &targetPosition, 0)
+    cdef ivec ivelocity = roundv(&particle.vel)
+    targetPosition = iaddv(&particle.pos, &ivelocity)
 
-    while ipos != NULL:
+    ray = castRay(&ivelocity, &rayLength)  # current position excluded
+    for step in range(rayLength):
+        cell = iaddv(&particle.pos, &ray[step])
         if not inBounds(board, ipos.y, ipos.x):
             particle.vel.y = 0
             particle.vel.x = 0
@@ -200,8 +244,6 @@ cdef bint sandStep(Particle_t* particle, Board* board) nogil:
             onBreak = True
             break
 
-        ipos = interpolatePos(NULL, &targetPosition, 0)
-
     if not onBreak and inBounds(board, targetPosition.y, targetPosition.x):
         neighbor = getParticle(board, targetPosition.y, targetPosition.x)
         if sandIsValid(neighbor.pType):
@@ -223,14 +265,14 @@ cdef bint sandIsValid(ParticleType other) nogil:
         return False
     return True
 
-cdef Particle_t Sand(int y, int x, bint beenUpdated, bint isFalling):
+cdef Particle_t Sand(int y, int x, bint beenUpdated, bint isFalling) nogil:
     cdef Particle_t sand
 
     sand.beenUpdated = beenUpdated
     sand.isFalling = isFalling
 
     sand.pType = SAND
-    sand.color = COLORS[<int>SAND][rand() % 4]
+    sand.color = SHADES[<int>SAND][randomInt() % 4]
 
     sand.pos.y = y
     sand.pos.x = x
@@ -263,26 +305,31 @@ cdef bint waterStep(Particle_t* particle, Board* board) nogil:
     cdef ivec diagonalNeighborPos, nextNeighborPos
 
     cdef ivec nextPos = particle.pos
-    cdef ivec targetPosition, newTarget
+    cdef ivec targetPosition
     
     cdef vec pos, additionalPos
-    cdef ivec* ipos = NULL
-    cdef ivec* newPos = NULL
-    cdef ivec iadditionalPos
+    cdef ivec cell, newCell
+    cdef ivec* ipos = &cell
+    cdef ivec* newPos = &newCell
+    cdef ivec iadditionalPos, dispersion
+
+    cdef ivec* ray
+    cdef ivec* spread
+    cdef int rayLength, spreadLength, step, spreadStep
 
     cdef float velOnHit, direction
 
     particle.vel.y += G_GRAVITY
     if particle.isFalling:
         particle.vel.x *= G_AIR_FRICTION
+    clampVelocity(particle)
 
     cdef ivec ivelocity = roundv(&particle.vel)
     targetPosition = iaddv(&particle.pos, &ivelocity)
 
-    interpolatePos(&particle.pos, &targetPosition, 0)  # skipping current position
-    ipos = interpolatePos(NULL, &targetPosition, 0)
-
-    while ipos != NULL:
+    ray = castRay(&ivelocity, &rayLength)  # current position excluded
+    for step in range(rayLength):
+        cell = iaddv(&particle.pos, &ray[step])
         if not inBounds(board, ipos.y, ipos.x):
             particle.vel.y = 0
             particle.vel.x *= -0.5
@@ -323,13 +370,13 @@ cdef bint waterStep(Particle_t* particle, Board* board) nogil:
 
             goOut = False
             diagonalNeighborPos = iaddv(&nextPos, &iadditionalPos)
-            newTarget = diagonalNeighborPos
-            newTarget.x += iadditionalPos.x * particle.dispersion
+            dispersion.y = 0
+            dispersion.x = iadditionalPos.x * particle.dispersion
 
-            interpolatePos(&diagonalNeighborPos, &newTarget, 1)  # Skipping 1st iteration
-            newPos = interpolatePos(NULL, &newTarget, 1)
-
-            while newPos != NULL:
+            spread = castRay(&dispersion, &spreadLength)  # Skipping 1st iteration
+            spreadStep = 0
+            while spreadStep < spreadLength:
+                newCell = iaddv(&diagonalNeighborPos, &spread[spreadStep])
                 if inBounds(board, newPos.y, newPos.x):
                     diagonalNeighbor = getParticle(board, newPos.y, newPos.x)
                     if waterIsValid(diagonalNeighbor.pType):
@@ -341,22 +388,18 @@ cdef bint waterStep(Particle_t* particle, Board* board) nogil:
                     goOut = True
                     break
                 
-                newPos = interpolatePos(NULL, &newTarget, 1)
+                spreadStep += 1
                 
-            if goOut or newPos == NULL:
+            if goOut or spreadStep == spreadLength:
                 break
 
             nextNeighborPos = nextPos
             nextNeighborPos.x += iadditionalPos.x
-            
-            newTarget = nextNeighborPos
-            newTarget.x += iadditionalPos.x * particle.dispersion
 
             if not equalIVec(&nextNeighborPos, &diagonalNeighborPos):
-                interpolatePos(&nextNeighborPos, &newTarget, 1)
-                newPos = interpolatePos(NULL, &newTarget, 1)
-
-                while newPos != NULL:
+                spreadStep = 0
+                while spreadStep < spreadLength:
+                    newCell = iaddv(&nextNeighborPos, &spread[spreadStep])
                     if inBounds(board, newPos.y, newPos.x):
                         nextNeighbor = getParticle(board, newPos.y, newPos.x)
                         if waterIsValid(nextNeighbor.pType):
@@ -368,15 +411,13 @@ cdef bint waterStep(Particle_t* particle, Board* board) nogil:
                     else:
                         break
     
-                    newPos = interpolatePos(NULL, &newTarget, 1)
+                    spreadStep += 1
 
-                if newPos == NULL:
+                if spreadStep == spreadLength:
                     break
     
             particle.isFalling = False
             break
-        
-        ipos = interpolatePos(NULL, &targetPosition, 0)
     
     if not onBreak and inBounds(board, targetPosition.y, targetPosition.x):
         neighbor = getParticle(board, targetPosition.y, targetPosition.x)
@@ -399,14 +440,14 @@ cdef bint waterIsValid(ParticleType other) nogil:
         return False
     return True
 
-cdef Particle_t Water(int y, int x, bint beenUpdated, bint isFalling):
+cdef Particle_t Water(int y, int x, bint beenUpdated, bint isFalling) nogil:
     cdef Particle_t water
 
     water.beenUpdated = beenUpdated
     water.isFalling = isFalling
 
     water.pType = WATER
-    water.color = COLORS[<int>WATER][rand() % 4]
+    water.color = SHADES[<int>WATER][randomInt() % 4]
 
     water.pos.y = y
     water.pos.x = x
@@ -420,7 +461,7 @@ cdef Particle_t Water(int y, int x, bint beenUpdated, bint isFalling):
     water.inertialResistance = 0
     water.bounciness = 0.5
     water.density = 10.0
-    water.dispersion = 3
+    water.dispersion = WATER_DISPERSION
     water.mass = 30.0
 
     return water
@@ -435,14 +476,14 @@ cdef bint woodIsValid(ParticleType other) nogil:
         return False
     return True
 
-cdef Particle_t Wood(int y, int x, bint beenUpdated, bint isFalling):
+cdef Particle_t Wood(int y, int x, bint beenUpdated, bint isFalling) nogil:
     cdef Particle_t wood
 
     wood.beenUpdated = beenUpdated
     wood.isFalling = isFalling
 
     wood.pType = WOOD
-    wood.color = COLORS[<int>WOOD][rand() % 3]
+    wood.color = SHADES[<int>WOOD][randomInt() % 3]
 
     wood.pos.y = y
     wood.pos.x = x
@@ -467,9 +508,8 @@ cdef bint fireStep(Particle_t* particle, Board* board) nogil:
     cdef Particle_t toEmpty
     
     if particle.heat <= 0:
-        with gil:
-            toEmpty = Empty(particle.pos.y, particle.pos.x, False, True)
-            setParticle(board, particle.pos.y, particle.pos.x, &toEmpty)
+        toEmpty = Empty(particle.pos.y, particle.pos.x, False, True)
+        setParticle(board, particle.pos.y, particle.pos.x, &toEmpty)
         return True
 
     cdef Particle_t* cell
@@ -496,14 +536,12 @@ cdef bint fireStep(Particle_t* particle, Board* board) nogil:
 
             if cell.pType == EMPTY:
                 if randomize() < 0.02:
-                    with gil:
-                        toEmpty = Smoke(pos.y, pos.x, False, True)
-                        setParticle(board, pos.y, pos.x, &toEmpty)
+                    toEmpty = Smoke(pos.y, pos.x, False, True)
+                    setParticle(board, pos.y, pos.x, &toEmpty)
             elif cell.pType == WOOD:
                 if 100.0 * randomize() > cell.flammable:
-                    with gil:
-                        toEmpty = Fire(pos.y, pos.x, False, True)
-                        setParticle(board, pos.y, pos.x, &toEmpty)
+                    toEmpty = Fire(pos.y, pos.x, False, True)
+                    setParticle(board, pos.y, pos.x, &toEmpty)
 
     # self.color = self.original_color - (abs(self.heat)//100)
     particle.heat -= 1.0
@@ -516,14 +554,14 @@ cdef bint fireIsValid(ParticleType other) nogil:
         return False
     return True
 
-cdef Particle_t Fire(int y, int x, bint beenUpdated, bint isFalling):
+cdef Particle_t Fire(int y, int x, bint beenUpdated, bint isFalling) nogil:
     cdef Particle_t fire
 
     fire.beenUpdated = beenUpdated
     fire.isFalling = isFalling
 
     fire.pType = FIRE
-    fire.color = COLORS[<int>FIRE][rand() % 3]
+    fire.color = SHADES[<int>FIRE][randomInt() % 3]
 
     fire.pos.y = y
     fire.pos.x = x
@@ -548,9 +586,8 @@ cdef bint smokeStep(Particle_t* particle, Board* board) nogil:
     cdef Particle_t toEmpty
 
     if particle.lifetime < 0:
-        with gil:
-            toEmpty = Empty(particle.pos.y, particle.pos.x, False, True)
-            setParticle(board, particle.pos.y, particle.pos.x, &toEmpty)
+        toEmpty = Empty(particle.pos.y, particle.pos.x, False, True)
+        setParticle(board, particle.pos.y, particle.pos.x, &toEmpty)
         return False
     particle.lifetime -= 1
 
@@ -586,14 +623,14 @@ cdef bint smokeIsValid(ParticleType other) nogil:
         return False
     return True
 
-cdef Particle_t Smoke(int y, int x, bint beenUpdated, bint isFalling):
+cdef Particle_t Smoke(int y, int x, bint beenUpdated, bint isFalling) nogil:
     cdef Particle_t smoke
 
     smoke.beenUpdated = beenUpdated
     smoke.isFalling = isFalling
 
     smoke.pType = SMOKE
-    smoke.color = COLORS[<int>SMOKE][rand() % 3]
+    smoke.color = SHADES[<int>SMOKE][randomInt() % 3]
 
     smoke.pos.y = y
     smoke.pos.x = x
@@ -617,14 +654,14 @@ cdef Particle_t Smoke(int y, int x, bint beenUpdated, bint isFalling):
 cdef bint emptyIsValid(ParticleType other) nogil:
     return True
 
-cdef Particle_t Empty(int y, int x, bint beenUpdated, bint isFalling):
+cdef Particle_t Empty(int y, int x, bint beenUpdated, bint isFalling) nogil:
     cdef Particle_t empty
 
     empty.beenUpdated = beenUpdated
     empty.isFalling = isFalling
 
     empty.pType = EMPTY
-    empty.color = 0x000000
+    empty.color = 0
 
     empty.pos.y = y
     empty.pos.x = x
@@ -642,4 +679,17 @@ cdef Particle_t Empty(int y, int x, bint beenUpdated, bint isFalling):
     empty.mass = 0.0
 
 
-    return empty
\ No newline at end of file
+    return empty
+
+cdef Particle_t makeParticle(ParticleType pType, int y, int x, bint beenUpdated, bint isFalling) nogil:
+    if pType == SAND:
+        return Sand(y, x, beenUpdated, isFalling)
+    elif pType == WATER:
+        return Water(y, x, beenUpdated, isFalling)
+    elif pType == WOOD:
+        return Wood(y, x, beenUpdated, isFalling)
+    elif pType == FIRE:
+        return Fire(y, x, beenUpdated, isFalling)
+    elif pType == SMOKE:
+        return Smoke(y, x, beenUpdated, isFalling)
+    return Empty(y, x, beenUpdated, isFalling)
@@ -0,0 +1,58 @@
+from cver.vector cimport *
+from cver.tools cimport *
+from cver.cparticle cimport *
+
+
+ctypedef struct UpdateArgs_t:
+    Chunk** chunks
+    int chunkRows, chunkColumns
+    ChunkIndex* index
+    Board* board
+    # block of chunks to update
+    int blockSize, blockRow, blockColumn, blockIndex
+    # cells around the block its particles can reach, the update owns them for the phase
+    int chunkSize, reach
+    # random stream of the block is derived from these
+    unsigned int seed
+    long tick
+    # particles that moved and cells visited in the block during the last update
+    int moved, visited
+
+
+cdef class Simulation:
+    cdef readonly int height, width
+    cdef public long tick
+    cdef readonly unsigned int seed
+    cdef unsigned int paintCount
+    # Particles that moved and cells visited during the last update
+    cdef readonly long moved_particles, visited_cells
+    cdef public object profiler
+    cdef public object recorder
+
+    cdef Board board
+    cdef Brush brush
+
+    cdef readonly int chunkSize, chunkRows, chunkColumns
+    cdef Chunk** chunks
+    # Update blocks double as the index blocks
+    cdef ChunkIndex index
+
+    cdef readonly int blockSize, blockRows, blockColumns
+    cdef UpdateArgs_t* blockArgs
+    # blockArgs of the active blocks grouped by phase, phase p owns phaseTasks[phaseStart[p]:phaseStart[p + 1]]
+    cdef void** phaseTasks
+    cdef int[5] phaseStart
+
+    cdef ThreadPool_t* pool
+
+    # Chunk rows and columns of an update block
+    cdef int blockRowStart(self, int block) nogil
+    cdef int blockRowEnd(self, int block) nogil
+    cdef int blockColumnStart(self, int block) nogil
+    cdef int blockColumnEnd(self, int block) nogil
+    cdef void activateChunksOnStroke(self, ivec pos, ivec lastPos, Rect* stroke)
+    cdef void resetRect(self, Rect* rect)
+
+    cpdef void update(self)
+    cpdef void reset_chunks(self)
+    cpdef void step(self, int n=*)
@@ -0,0 +1,584 @@
+from values import *
+
+import numpy as np
+cimport numpy as np
+np.import_array()
+
+from cython cimport boundscheck, wraparound
+from libc.stdlib cimport malloc, free
+
+from cver.vector cimport *
+from cver.tools cimport *
+from cver.cparticle cimport *
+
+from src.profiler import Profiler
+
+# Engine independent pen names, used by recordings and benchmarks
+PENS = {"sand": SAND, "water": WATER, "wood": WOOD, "fire": FIRE, "smoke": SMOKE, "eraser": EMPTY}
+PEN_NAMES = {pen: name for name, pen in PENS.items()}
+
+# Cells around a move that wake up with it: the neighbours of every cell it passed or changed
+DIRTY_MARGIN = 1
+cdef int dirtyMargin = DIRTY_MARGIN
+
+
+cdef class Simulation:
+    """
+    Headless simulation core: owns the board, the chunks and the brush.
+    Nothing in here touches the pygame window, so it can be stepped as fast as the physics allows.
+    """
+
+    def __cinit__(self, int height=BOARD_Y, int width=BOARD_X, int chunk_size=CHUNK_SIZE,
+                  int workers=1, unsigned int seed=0, profiler=None):
+        self.height = height
+        self.width = width
+        self.tick = 0
+        self.seed = seed
+        self.paintCount = 0
+        self.moved_particles = 0
+        self.visited_cells = 0
+        self.profiler = Profiler() if profiler is None else profiler
+        # src.replay.Recorder fed by paint()
+        self.recorder = None
+
+        # Board
+        self.board = initBoard(height, width)
+        self.brush = initBrush()
+
+        # Chunks
+        self.chunkSize = chunk_size  # 10 x 10
+        self.chunkRows = height // self.chunkSize + (1 if height % self.chunkSize else 0)
+        self.chunkColumns = width // self.chunkSize + (1 if width % self.chunkSize else 0)
+
+        self.chunks = <Chunk**>malloc(self.chunkRows * sizeof(Chunk*))
+
+        cdef int row, column, chunkHeight, chunkWidth, offset
+
+        for row in range(self.chunkRows):
+            self.chunks[row] = <Chunk*>malloc(self.chunkColumns * sizeof(Chunk))
+
+            # max chunk size or chunk loss
+            offset = height - row * self.chunkSize
+            chunkHeight = self.chunkSize if offset > self.chunkSize else offset
+
+            for column in range(self.chunkColumns):
+                # max chunk size or chunk loss
+                offset = width - column * self.chunkSize
+                chunkWidth = self.chunkSize if offset > self.chunkSize else offset
+
+                self.chunks[row][column] = makeChunk(
+                    row * self.chunkSize, column * self.chunkSize,
+                    chunkHeight, chunkWidth
+                )
+
+        # Update schedule
+        # Chunks are grouped in blocks wider than twice the chunks a particle can reach and wake in one tick.
+        # Blocks are updated in 4 checkerboard phases, so blocks running at the same time never share a cell
+        # or a chunk.
+        cdef int wakeReach = particleReach() + dirtyMargin
+        self.blockSize = (wakeReach - 1) // self.chunkSize + 1 + (wakeReach + self.chunkSize - 1) // self.chunkSize
+        self.blockRows = (self.chunkRows + self.blockSize - 1) // self.blockSize
+        self.blockColumns = (self.chunkColumns + self.blockSize - 1) // self.blockSize
+
+        # Every chunk starts updated, woken and waiting for a redraw
+        self.index = initChunkIndex(self.chunkRows, self.chunkColumns, self.blockSize)
+        fillIndex(&self.index, self.index.awake, 1)
+        fillIndex(&self.index, self.index.active, 1)
+        fillIndex(&self.index, self.index.dirty, 1)
+
+        self.blockArgs = <UpdateArgs_t*>malloc(self.blockRows * self.blockColumns * sizeof(UpdateArgs_t))
+        self.phaseTasks = <void**>malloc(self.blockRows * self.blockColumns * sizeof(void*))
+
+        cdef int blockRow, blockColumn
+        cdef UpdateArgs_t* args
+        for blockRow in range(self.blockRows):
+            for blockColumn in range(self.blockColumns):
+                args = &self.blockArgs[blockRow * self.blockColumns + blockColumn]
+                args.chunks = self.chunks
+                args.chunkRows = self.chunkRows
+                args.chunkColumns = self.chunkColumns
+                args.index = &self.index
+                args.board = &self.board
+                args.blockSize = self.blockSize
+                args.blockRow = blockRow
+                args.blockColumn = blockColumn
+                args.blockIndex = blockRow * self.blockColumns + blockColumn
+                args.chunkSize = self.chunkSize
+                args.reach = particleReach()
+                args.seed = seed
+                args.tick = 0
+                args.moved = 0
+                args.visited = 0
+
+        # Worker threads live as long as the simulation, Display borrows them for redraw
+        self.pool = initPool(workers)
+
+    def __dealloc__(self):
+        freeBoard(&self.board)
+
+        cdef int i
+        for i in range(self.chunkRows):
+            free(<void*>self.chunks[i])
+        free(<void*>self.chunks)
+
+        freePool(self.pool)
+        freeChunkIndex(&self.index)
+        free(<void*>self.phaseTasks)
+        free(<void*>self.blockArgs)
+
+    @property
+    def pen(self):
+        return self.brush.pen
+
+    @pen.setter
+    def pen(self, int value):
+        self.brush.pen = value
+
+    @property
+    def pen_size(self):
+        return self.brush.penSize
+
+    @pen_size.setter
+    def pen_size(self, int value):
+        if 0 < value < 50:
+            self.brush.penSize = value
+
+    def colors(self):
+        """
+        Copy of the board colors
+        :returns: (height, width) uint8 array of src.particle.PALETTE indexes
+        """
+        cdef np.ndarray[np.uint8_t, ndim=2] colors = np.empty((self.height, self.width), dtype=np.uint8)
+        cdef int i, j
+        for i in range(self.height):
+            for j in range(self.width):
+                colors[i, j] = getParticle(&self.board, i, j).color
+        return colors
+
+    def types(self):
+        """
+        Copy of the board particle types
+        :returns: (height, width) uint8 array of ParticleType values
+        """
+        cdef np.ndarray[np.uint8_t, ndim=2] types = np.empty((self.height, self.width), dtype=np.uint8)
+        cdef int i, j
+        for i in range(self.height):
+            for j in range(self.width):
+                types[i, j] = <np.uint8_t>getParticle(&self.board, i, j).pType
+        return types
+
+    def get_state(self):
+        """
+        Copy of the board and chunk state in the snapshot layout (src.snapshot), particle types as src.particle.ParticleType
+        """
+        cdef np.ndarray[np.uint8_t, ndim=2] types = np.empty((self.height, self.width), dtype=np.uint8)
+        cdef np.ndarray[np.uint8_t, ndim=2] colors = np.empty((self.height, self.width), dtype=np.uint8)
+        cdef np.ndarray[np.float32_t, ndim=3] vel = np.empty((self.height, self.width, 2), dtype=np.float32)
+        cdef np.ndarray[np.uint8_t, ndim=2] flags = np.empty((self.height, self.width), dtype=np.uint8)
+        cdef np.ndarray[np.float32_t, ndim=2] lifetime = np.empty((self.height, self.width), dtype=np.float32)
+        cdef np.ndarray[np.float32_t, ndim=2] heat = np.empty((self.height, self.width), dtype=np.float32)
+        cdef np.ndarray[np.uint8_t, ndim=2] chunks = np.empty((self.chunkRows, self.chunkColumns), dtype=np.uint8)
+
+        cdef Particle_t* cell
+        cdef Chunk* chunk
+        cdef int i, j
+        for i in range(self.height):
+            for j in range(self.width):
+                cell = getParticle(&self.board, i, j)
+                types[i, j] = TO_SNAPSHOT_TYPE[<int>cell.pType]
+                colors[i, j] = cell.color
+                vel[i, j, 0] = cell.vel.x
+                vel[i, j, 1] = cell.vel.y
+                flags[i, j] = (SNAPSHOT_FALLING if cell.isFalling else 0) | (SNAPSHOT_UPDATED if cell.beenUpdated else 0)
+                lifetime[i, j] = cell.lifetime
+                heat[i, j] = cell.heat
+
+        for i in range(self.chunkRows):
+            for j in range(self.chunkColumns):
+                chunk = &self.chunks[i][j]
+                chunks[i, j] = ((SNAPSHOT_CHUNK_ACTIVE if chunk.updateThisFrame else 0) |
+                                (SNAPSHOT_CHUNK_NEXT if chunk.shouldBeUpdatedNextFrame else 0))
+
+        return {
+            "tick": self.tick, "seed": self.seed, "chunk_size": self.chunkSize,
+            "type": types, "color": colors, "vel": vel, "flags": flags,
+            "lifetime": lifetime, "heat": heat, "chunks": chunks,
+        }
+
+    def set_state(self, state):
+        """
+        Restore get_state() output, arrays may be memory mapped
+        """
+        if state["type"].shape != (self.height, self.width):
+            raise ValueError(f"board is {self.height}x{self.width}, state is {state['type'].shape}")
+
+        cdef np.uint8_t[:, :] types = np.ascontiguousarray(state["type"], dtype=np.uint8)
+        cdef np.uint8_t[:, :] colors = np.ascontiguousarray(state["color"], dtype=np.uint8)
+        cdef np.float32_t[:, :, :] vel = np.ascontiguousarray(state["vel"], dtype=np.float32)
+        cdef np.uint8_t[:, :] flags = np.ascontiguousarray(state["flags"], dtype=np.uint8)
+        cdef np.float32_t[:, :] lifetime = np.ascontiguousarray(state["lifetime"], dtype=np.float32)
+        cdef np.float32_t[:, :] heat = np.ascontiguousarray(state["heat"], dtype=np.float32)
+        cdef np.uint8_t[:, :] chunks = np.ascontiguousarray(state["chunks"], dtype=np.uint8)
+        cdef bint sameChunks = chunks.shape[0] == self.chunkRows and chunks.shape[1] == self.chunkColumns
+
+        cdef Particle_t particle
+        cdef Chunk* chunk
+        cdef int i, j, chunkFlags
+        with nogil:
+            for i in range(self.height):
+                for j in range(self.width):
+                    particle = makeParticle(
+                        FROM_SNAPSHOT_TYPE[types[i, j]] if types[i, j] < 6 else EMPTY, i, j,
+                        flags[i, j] & SNAPSHOT_UPDATED != 0, flags[i, j] & SNAPSHOT_FALLING != 0
+                    )
+                    if particle.pType != EMPTY:
+                        particle.color = colors[i, j]
+                        particle.vel.x = vel[i, j, 0]
+                        particle.vel.y = vel[i, j, 1]
+                        particle.lifetime = lifetime[i, j]
+                        particle.heat = heat[i, j]
+                    self.board.board[i][j] = particle
+
+            for i in range(self.chunkRows):
+                for j in range(self.chunkColumns):
+                    chunk = &self.chunks[i][j]
+                    # A different chunk grid can't be mapped, everything wakes up instead
+                    chunkFlags = chunks[i, j] if sameChunks else SNAPSHOT_CHUNK_ACTIVE | SNAPSHOT_CHUNK_NEXT
+                    chunk.updateThisFrame = chunkFlags & SNAPSHOT_CHUNK_ACTIVE != 0
+                    if chunk.updateThisFrame:
+                        chunk.rect = makeRect(chunk.y, chunk.x, chunk.y + chunk.height, chunk.x + chunk.width)
+                    else:
+                        clearRect(&chunk.rect)
+                    deactivateChunk(chunk)
+                    if chunkFlags & SNAPSHOT_CHUNK_NEXT:
+                        activateChunk(chunk)
+            # Everything gets looked at on the next reset_chunks
+            fillIndex(&self.index, self.index.awake, 1)
+            fillIndex(&self.index, self.index.active, 1)
+
+        self.tick = state.get("tick", 0)
+        self.invalidate()
+
+    def paint(self, pos, last_pos=None, pen=None):
+        """
+        Paint a brush stroke and wake up the chunks it touches
+        :param pos: current brush position (x, y) in board coordinates
+        :param last_pos: previous brush position, the stroke is a single dab if omitted
+        :param pen: ParticleType to paint with, defaults to the brush pen
+        """
+        cdef ivec iPos, iLastPos
+        cdef int tempPen = self.brush.pen
+
+        iPos.x = pos[0]
+        iPos.y = pos[1]
+        if last_pos is None:
+            iLastPos = iPos
+        else:
+            iLastPos.x = last_pos[0]
+            iLastPos.y = last_pos[1]
+
+        if self.recorder is not None:
+            self.recorder.record(
+                self.tick, (iPos.x, iPos.y), (iLastPos.x, iLastPos.y),
+                PEN_NAMES[self.brush.pen if pen is None else pen], self.brush.penSize
+            )
+
+        if pen is not None:
+            self.brush.pen = pen
+        # Painted particles draw from their own stream, whatever ran on this thread before
+        seedRandom(mixSeed(~self.seed, <unsigned int>self.tick, self.paintCount))
+        self.paintCount += 1
+        paint(&self.brush, &self.board, iPos, iLastPos)
+        self.brush.pen = tempPen
+
+        # Everything the brush could have reached
+        cdef Rect stroke = makeRect(
+            min(iPos.y, iLastPos.y) - self.brush.penSize, min(iPos.x, iLastPos.x) - self.brush.penSize,
+            max(iPos.y, iLastPos.y) + self.brush.penSize + 1, max(iPos.x, iLastPos.x) + self.brush.penSize + 1
+        )
+        markCells(self.chunks, self.chunkSize, &self.index, &self.board, &stroke, False)
+        self.activateChunksOnStroke(iPos, iLastPos, &stroke)
+
+    def map_colors(self, image):
+        """
+        Fill the board under an image with the particles of the closest palette colors, keeping those colors
+        :param image: image file path or (height, width, 3) RGB array, scaled down to fit and centered
+        """
+        from src import convert
+        from src.particle import COLORS, palette_index
+        rgb, top, left = convert.load_img(image, self.height, self.width)
+        names, index, colors = convert.nearest_palette(rgb, COLORS)
+
+        cdef np.uint8_t[:] pens = np.array([PENS[name.lower()] for name in names], dtype=np.uint8)
+        cdef np.intp_t[:, :] entries = np.ascontiguousarray(index, dtype=np.intp)
+        cdef np.uint8_t[:, :] shades = np.ascontiguousarray(palette_index(colors))
+        cdef int offsetY = top, offsetX = left
+        cdef Rect region = makeRect(offsetY, offsetX, offsetY + entries.shape[0], offsetX + entries.shape[1])
+
+        # New particles draw from their own stream like painted ones
+        seedRandom(mixSeed(~self.seed, <unsigned int>self.tick, self.paintCount))
+        self.paintCount += 1
+
+        cdef Particle_t particle
+        cdef int i, j
+        with nogil:
+            for i in range(entries.shape[0]):
+                for j in range(entries.shape[1]):
+                    particle = makeParticle(<ParticleType>pens[entries[i, j]], offsetY + i, offsetX + j, False, True)
+                    particle.color = shades[i, j]
+                    self.board.board[offsetY + i][offsetX + j] = particle
+
+        markCells(self.chunks, self.chunkSize, &self.index, &self.board, &region, True)
+
+    def invalidate(self):
+        """Redraw the whole board on the next redraw"""
+        cdef Chunk* chunk
+        cdef int row, column
+        for row in range(self.chunkRows):
+            for column in range(self.chunkColumns):
+                chunk = &self.chunks[row][column]
+                markChunk(chunk, chunk.y, chunk.x, chunk.y + chunk.height, chunk.x + chunk.width, False)
+        fillIndex(&self.index, self.index.dirty, 1)
+
+    def pop_dirty_rects(self):
+        """
+        Cells that may have changed since the last call, Display.redraw pops them itself
+        :returns: (top, left, bottom, right) of each chunk with changes, bottom and right exclusive
+        """
+        rects = []
+        cdef Chunk* chunk
+        cdef int block, row, column
+        for block in range(self.blockRows * self.blockColumns):
+            if not self.index.dirty[block]:
+                continue
+            self.index.dirty[block] = 0
+            for row in range(self.blockRowStart(block), self.blockRowEnd(block)):
+                for column in range(self.blockColumnStart(block), self.blockColumnEnd(block)):
+                    chunk = &self.chunks[row][column]
+                    if not emptyRect(&chunk.drawRect):
+                        rects.append((chunk.drawRect.top, chunk.drawRect.left,
+                                      chunk.drawRect.bottom, chunk.drawRect.right))
+                        clearRect(&chunk.drawRect)
+        return rects
+
+    cdef void activateChunksOnStroke(self, ivec pos, ivec lastPos, Rect* stroke):
+        """
+        Wake the part of stroke inside every chunk the brush swept: the capsule around the segment
+        from lastPos to pos. Only chunks inside the stroke's bounding box are tested
+        """
+        cdef int top = max(stroke.top, 0), left = max(stroke.left, 0)
+        cdef int bottom = min(stroke.bottom, self.height), right = min(stroke.right, self.width)
+        if top >= bottom or left >= right:
+            return
+
+        cdef vec start = ivec2vec(&lastPos)
+        cdef vec end = ivec2vec(&pos)
+        # The rounded brush disc reaches a little past the pen size
+        cdef float reach = <float>(self.brush.penSize + 1)
+        cdef Chunk* chunk
+        cdef int row, column
+        for row in range(top // self.chunkSize, (bottom - 1) // self.chunkSize + 1):
+            for column in range(left // self.chunkSize, (right - 1) // self.chunkSize + 1):
+                chunk = &self.chunks[row][column]
+                # Cells of the chunk, first to last
+                if segmentBoxDistance(
+                    &start, &end, <float>chunk.y, <float>chunk.x,
+                    <float>(chunk.y + chunk.height - 1), <float>(chunk.x + chunk.width - 1)
+                ) <= reach:
+                    markChunk(chunk, stroke.top, stroke.left, stroke.bottom, stroke.right, True)
+                    markIndex(&self.index, row, column, True)
+
+    @property
+    def workers(self):
+        return self.pool.workers
+
+    def active_chunks(self):
+        """Chunks updated this tick"""
+        cdef int block, row, column, count = 0
+        for block in range(self.blockRows * self.blockColumns):
+            if self.index.active[block]:
+                for row in range(self.blockRowStart(block), self.blockRowEnd(block)):
+                    for column in range(self.blockColumnStart(block), self.blockColumnEnd(block)):
+                        count += self.chunks[row][column].updateThisFrame
+        return count
+
+    cdef int blockRowStart(self, int block) nogil:
+        return block // self.blockColumns * self.blockSize
+
+    cdef int blockRowEnd(self, int block) nogil:
+        return min(self.blockRowStart(block) + self.blockSize, self.chunkRows)
+
+    cdef int blockColumnStart(self, int block) nogil:
+        return block % self.blockColumns * self.blockSize
+
+    cdef int blockColumnEnd(self, int block) nogil:
+        return min(self.blockColumnStart(block) + self.blockSize, self.chunkColumns)
+
+    @property
+    def cross_writes(self):
+        """Writes that crossed into another worker's region, the update schedule keeps it at 0"""
+        return self.board.crossWrites
+
+    cpdef void update(self):
+        # Only blocks with chunks to update become tasks, in their checkerboard phase
+        cdef int phase, blockRow, blockColumn, block, task = 0
+        for phase in range(4):
+            self.phaseStart[phase] = task
+            for blockRow in range(phase >> 1, self.blockRows, 2):
+                for blockColumn in range(phase & 1, self.blockColumns, 2):
+                    block = blockRow * self.blockColumns + blockColumn
+                    if self.index.active[block]:
+                        self.blockArgs[block].tick = self.tick
+                        self.phaseTasks[task] = &self.blockArgs[block]
+                        task += 1
+        self.phaseStart[4] = task
+
+        cdef int i
+        with nogil:
+            for phase in range(4):
+                runPool(
+                    self.pool, &updateBlock,
+                    &self.phaseTasks[self.phaseStart[phase]],
+                    self.phaseStart[phase + 1] - self.phaseStart[phase]
+                )
+
+        self.moved_particles = 0
+        self.visited_cells = 0
+        for i in range(task):
+            self.moved_particles += (<UpdateArgs_t*>self.phaseTasks[i]).moved
+            self.visited_cells += (<UpdateArgs_t*>self.phaseTasks[i]).visited
+
+    cdef void resetRect(self, Rect* rect):
+        cdef int i, j
+        for i in range(rect.top, rect.bottom):
+            for j in range(rect.left, rect.right):
+                resetParticle(getParticle(&self.board, i, j))
+
+    cpdef void reset_chunks(self):
+        """
+        Promote chunks activated since the last tick and clear the update flag
+        of every particle that could have been touched by it.
+        Only blocks with chunks updated last tick or woken for this one are visited
+        """
+        cdef Chunk* chunk
+        cdef int block, row, column
+        cdef bint active
+        for block in range(self.blockRows * self.blockColumns):
+            if not (self.index.awake[block] or self.index.active[block]):
+                continue
+            active = False
+            for row in range(self.blockRowStart(block), self.blockRowEnd(block)):
+                for column in range(self.blockColumnStart(block), self.blockColumnEnd(block)):
+                    chunk = &self.chunks[row][column]
+                    # The cells updated last tick and the cells woken for this one
+                    self.resetRect(&chunk.rect)
+                    self.resetRect(&chunk.nextRect)
+                    updateChunk(chunk)
+                    active = active or chunk.updateThisFrame
+            self.index.awake[block] = 0
+            self.index.active[block] = active
+            # Whatever the update visits gets redrawn, see updateChunk
+            if active:
+                self.index.dirty[block] = 1
+
+    cpdef void step(self, int n=1):
+        profiler = self.profiler
+        cdef int i
+        for i in range(n):
+            with profiler.phase("reset_chunks"):
+                self.reset_chunks()
+            with profiler.phase("update"):
+                self.update()
+            self.tick += 1
+
+            if profiler.enabled:
+                profiler.record("active_chunks", self.active_chunks())
+                profiler.record("moved_particles", self.moved_particles)
+                profiler.record("visited_cells", self.visited_cells)
+
+
+# src.snapshot layout
+cdef int[6] TO_SNAPSHOT_TYPE      # indexed by ParticleType, src.particle.ParticleType values
+TO_SNAPSHOT_TYPE[:] = [1, 2, 4, 3, 5, 0]
+cdef ParticleType[6] FROM_SNAPSHOT_TYPE
+FROM_SNAPSHOT_TYPE[:] = [EMPTY, SAND, WATER, FIRE, WOOD, SMOKE]
+cdef int SNAPSHOT_FALLING = 0b01, SNAPSHOT_UPDATED = 0b10
+cdef int SNAPSHOT_CHUNK_ACTIVE = 0b01, SNAPSHOT_CHUNK_NEXT = 0b10
+
+
+cdef void markCells(Chunk** chunks, int chunkSize, ChunkIndex* index, Board* board, Rect* cells, bint wake) nogil:
+    """Mark cells in every chunk they overlap and the chunks in the index, see markChunk"""
+    cdef int top = max(cells.top, 0), left = max(cells.left, 0)
+    cdef int bottom = min(cells.bottom, board.height), right = min(cells.right, board.width)
+    if top >= bottom or left >= right:
+        return
+
+    cdef int row, column
+    for row in range(top // chunkSize, (bottom - 1) // chunkSize + 1):
+        for column in range(left // chunkSize, (right - 1) // chunkSize + 1):
+            markChunk(&chunks[row][column], top, left, bottom, right, wake)
+            markIndex(index, row, column, wake)
+
+@boundscheck(False)
+@wraparound(False)
+cdef int updateChunkParticles(Chunk* chunk, UpdateArgs_t* args) nogil:
+    """Update the particles in the chunk's rect bottom up, waking the cells around whatever they wrote"""
+    cdef Board* board = args.board
+    cdef Rect rect = chunk.rect
+    cdef Rect touched
+    cdef int moved = 0
+    cdef Particle_t* cell
+    cdef int y, x
+    args.visited += (rect.bottom - rect.top) * (rect.right - rect.left)
+    for y in reversed(range(rect.top, rect.bottom)):
+        for x in range(rect.left, rect.right):
+            cell = getParticle(board, y, x)
+            if cell.pType == EMPTY:
+                continue
+
+            clearWritten()
+            if onUpdate(cell, board):
+                moved += 1
+                # Burning fire changes without writing a cell
+                touched = written()
+                expandRect(&touched, y, x, y + 1, x + 1)
+            else:
+                touched = written()
+            if emptyRect(&touched):
+                continue
+
+            touched.top -= dirtyMargin
+            touched.left -= dirtyMargin
+            touched.bottom += dirtyMargin
+            touched.right += dirtyMargin
+            markCells(args.chunks, args.chunkSize, args.index, board, &touched, True)
+
+    return moved
+
+cdef void* updateBlock(void* argsPass) nogil:
+    cdef UpdateArgs_t* args = <UpdateArgs_t*>argsPass
+    cdef Chunk* chunk
+    cdef int row, column
+    cdef int rowStart = args.blockRow * args.blockSize
+    cdef int rowEnd = min(rowStart + args.blockSize, args.chunkRows)
+    cdef int columnStart = args.blockColumn * args.blockSize
+    cdef int columnEnd = min(columnStart + args.blockSize, args.chunkColumns)
+
+    # Same numbers for this block whichever thread picks it up
+    seedRandom(mixSeed(args.seed, <unsigned int>args.tick, <unsigned int>args.blockIndex))
+    # Blocks of a phase are a block apart, so their reach never overlaps and swaps need no lock
+    ownRegion(
+        rowStart * args.chunkSize - args.reach, columnStart * args.chunkSize - args.reach,
+        rowEnd * args.chunkSize + args.reach, columnEnd * args.chunkSize + args.reach
+    )
+
+    args.moved = 0
+    args.visited = 0
+    for row in reversed(range(rowStart, rowEnd)):
+        for column in range(columnStart, columnEnd):
+            chunk = &args.chunks[row][column]
+            if chunk.updateThisFrame:
+                args.moved += updateChunkParticles(chunk, args)
+
+    ownBoard()
+    return NULL
@@ -8,33 +8,103 @@ cdef extern from "<pthread.h>" nogil:
         pass
     ctypedef struct pthread_mutex_t:
        pass
+    ctypedef unsigned long pthread_t
+    ctypedef struct pthread_attr_t:
+        pass
     
     int pthread_mutex_init(pthread_mutex_t *mutex, pthread_mutexattr_t *mutexattr)
     int pthread_mutex_destroy(pthread_mutex_t *mutex)
     int pthread_mutex_lock(pthread_mutex_t *mutex)
     int pthread_mutex_unlock(pthread_mutex_t *mutex)
 
+    ctypedef struct pthread_condattr_t:
+        pass
+    ctypedef struct pthread_cond_t:
+        pass
+
+    int pthread_cond_init(pthread_cond_t *cond, pthread_condattr_t *condattr)
+    int pthread_cond_destroy(pthread_cond_t *cond)
+    int pthread_cond_wait(pthread_cond_t *cond, pthread_mutex_t *mutex)
+    int pthread_cond_signal(pthread_cond_t *cond)
+    int pthread_cond_broadcast(pthread_cond_t *cond)
+
+    int pthread_create(pthread_t *thread, pthread_attr_t *attr, void* (*start_routine) (void *), void *arg)
+    int pthread_join(pthread_t thread, void **retval)
+
+
+ctypedef void* (*Task_t)(void*) nogil
+
+cdef struct ThreadPool_t:
+    int workers  # threads taking tasks, the caller of runPool included
+    pthread_t* threads
+    pthread_mutex_t mutex
+    pthread_cond_t wake, done
+    # current batch
+    Task_t task
+    void** args
+    int tasks, next, pending
+    bint stop
+
+cdef ThreadPool_t* initPool(int workers)
+cdef void freePool(ThreadPool_t* pool)
+cdef void runPool(ThreadPool_t* pool, Task_t task, void** args, int tasks) nogil
+
+
+# Cells top <= y < bottom, left <= x < right
+cdef struct Rect:
+    int top, left, bottom, right
+
+cdef Rect makeRect(int top, int left, int bottom, int right) nogil
+cdef bint emptyRect(Rect* rect) nogil
+cdef void expandRect(Rect* rect, int top, int left, int bottom, int right) nogil
+cdef void clearRect(Rect* rect) nogil
+
 
 cdef struct Chunk:
     int y, x
     int height, width
     bint updateThisFrame
     bint shouldBeUpdatedNextFrame
+    # Cells updated this tick, cells woken for the next one and cells changed since the last redraw
+    Rect rect, nextRect, drawRect
 
 cdef Chunk makeChunk(int y, int x, int height, int width)
-cdef void updateChunk(Chunk* chunk)
+cdef void updateChunk(Chunk* chunk) nogil
+cdef void markChunk(Chunk* chunk, int top, int left, int bottom, int right, bint wake) nogil
 cdef void activateChunk(Chunk* chunk) nogil
+cdef void deactivateChunk(Chunk* chunk) nogil
 cdef void printChunk(Chunk* chunk)
 
 
+# Second level over the chunk grid: one flag of each kind per square block of chunks
+cdef struct ChunkIndex:
+    int blockSize, blockRows, blockColumns
+    # blocks with chunks woken for the next tick, updated this tick and changed since the last redraw
+    unsigned char* awake
+    unsigned char* active
+    unsigned char* dirty
+
+cdef ChunkIndex initChunkIndex(int chunkRows, int chunkColumns, int blockSize)
+cdef void freeChunkIndex(ChunkIndex* index)
+cdef void markIndex(ChunkIndex* index, int row, int column, bint wake) nogil
+cdef void fillIndex(ChunkIndex* index, unsigned char* flags, unsigned char value) nogil
+
+
 cdef struct Board:
     int height, width
     Particle_t** board
-    pthread_mutex_t mutex
+    # Writes outside the calling thread's owned region, the update schedule keeps it at 0
+    long crossWrites
 
 cdef Board initBoard(int height, int width)
 cdef void freeBoard(Board* board)
+cdef void ownRegion(int top, int left, int bottom, int right) nogil
+cdef void ownBoard() nogil
 cdef void swapParticles(Board* board, Particle_t* cell, int y, int x) nogil
+cdef void setParticle(Board* board, int y, int x, Particle_t* particle) nogil
+# Bounds of the cells the calling thread wrote since clearWritten, empty if none
+cdef void clearWritten() nogil
+cdef Rect written() nogil
 
 cdef inline bint inBounds(Board* board, int y, int x) nogil:
     return 0 <= y < board.height and 0 <= x < board.width
@@ -42,19 +112,17 @@ cdef inline bint inBounds(Board* board, int y, int x) nogil:
 cdef inline Particle_t* getParticle(Board* board, int y, int x) nogil:
     return &board.board[y][x]
 
-cdef inline void setParticle(Board* board, int y, int x, Particle_t* particle) nogil:
-    pthread_mutex_lock(&board.mutex)
-    board.board[y][x] = particle[0]
-    pthread_mutex_unlock(&board.mutex)
-
 
 cdef struct Brush:
-    ParticleType pen
+    int pen  # ParticleType, kept as int so the struct does not depend on cparticle's declaration order
     int penSize
 
 cdef Brush initBrush()
 cdef void paint(Brush* brush, Board* board, ivec mousePos, ivec lastMousePosition)
 
-cdef float linePointLen(vec lineStart, vec lineEnd, vec point)
+# Distance between the segment and the box top <= y <= bottom, left <= x <= right, 0 if it crosses the box
+cdef float segmentBoxDistance(vec* start, vec* end, float top, float left, float bottom, float right) nogil
 
 cdef ivec* interpolatePos(ivec* start, ivec* end, int depth) nogil
+# Cached cells from the origin to offset, start excluded, NULL with length 0 past TERMINAL_VELOCITY
+cdef ivec* castRay(ivec* offset, int* length) nogil
@@ -1,17 +1,43 @@
 from values import *
 
 from libc.stdio cimport printf
-from libc.stdlib cimport malloc, free
+from libc.stdlib cimport malloc, calloc, free
+from libc.string cimport memset
 
 from cver.tools cimport *
 from cver.cparticle cimport *
 
-cdef extern from "<math.h>":
+cdef extern from "<math.h>" nogil:
     const float INFINITY
     double sqrt(double)
     double round(double)
 
 
+#### RECT
+cdef Rect makeRect(int top, int left, int bottom, int right) nogil:
+    cdef Rect rect
+    rect.top = top
+    rect.left = left
+    rect.bottom = bottom
+    rect.right = right
+    return rect
+
+cdef bint emptyRect(Rect* rect) nogil:
+    return rect.top >= rect.bottom or rect.left >= rect.right
+
+cdef void expandRect(Rect* rect, int top, int left, int bottom, int right) nogil:
+    if emptyRect(rect):
+        rect.top, rect.left, rect.bottom, rect.right = top, left, bottom, right
+        return
+    rect.top = min(rect.top, top)
+    rect.left = min(rect.left, left)
+    rect.bottom = max(rect.bottom, bottom)
+    rect.right = max(rect.right, right)
+
+cdef void clearRect(Rect* rect) nogil:
+    rect.top = rect.left = rect.bottom = rect.right = 0
+
+
 #### CHUNK
 cdef Chunk makeChunk(int y, int x, int height, int width):
     cdef Chunk chunk
@@ -21,22 +47,169 @@ cdef Chunk makeChunk(int y, int x, int height, int width):
     chunk.width = width
     chunk.updateThisFrame = True
     chunk.shouldBeUpdatedNextFrame = True
+    chunk.rect = makeRect(y, x, y + height, x + width)
+    chunk.nextRect = chunk.rect
+    chunk.drawRect = chunk.rect
     return chunk
 
+cdef void markChunk(Chunk* chunk, int top, int left, int bottom, int right, bint wake) nogil:
+    """
+    Cells in top <= y < bottom, left <= x < right changed, the part inside the chunk gets redrawn
+    and with wake updated on the next tick too
+    """
+    top = max(top, chunk.y)
+    left = max(left, chunk.x)
+    bottom = min(bottom, chunk.y + chunk.height)
+    right = min(right, chunk.x + chunk.width)
+    if top >= bottom or left >= right:
+        return
+
+    if wake:
+        chunk.shouldBeUpdatedNextFrame = True
+        expandRect(&chunk.nextRect, top, left, bottom, right)
+    expandRect(&chunk.drawRect, top, left, bottom, right)
+
 cdef void activateChunk(Chunk* chunk) nogil:
-    chunk.shouldBeUpdatedNextFrame = True
+    markChunk(chunk, chunk.y, chunk.x, chunk.y + chunk.height, chunk.x + chunk.width, True)
 
-cdef void deactivateChunk(Chunk* chunk):
+cdef void deactivateChunk(Chunk* chunk) nogil:
     chunk.shouldBeUpdatedNextFrame = False
+    clearRect(&chunk.nextRect)
 
-cdef void updateChunk(Chunk* chunk):
+cdef void updateChunk(Chunk* chunk) nogil:
     chunk.updateThisFrame = chunk.shouldBeUpdatedNextFrame
     chunk.shouldBeUpdatedNextFrame = False
+    if chunk.updateThisFrame:
+        chunk.rect = chunk.nextRect
+        # Whatever the update visits may change without moving
+        expandRect(&chunk.drawRect, chunk.rect.top, chunk.rect.left, chunk.rect.bottom, chunk.rect.right)
+    else:
+        clearRect(&chunk.rect)
+    clearRect(&chunk.nextRect)
 
 cdef void printChunk(Chunk* chunk):
     printf("Chunk y=%d x=%d height=%d width=%d\n", chunk.y, chunk.x, chunk.height, chunk.width)
 
 
+#### CHUNK INDEX
+cdef ChunkIndex initChunkIndex(int chunkRows, int chunkColumns, int blockSize):
+    cdef ChunkIndex index
+    index.blockSize = blockSize
+    index.blockRows = (chunkRows + blockSize - 1) // blockSize
+    index.blockColumns = (chunkColumns + blockSize - 1) // blockSize
+    cdef int blocks = index.blockRows * index.blockColumns
+    index.awake = <unsigned char*>calloc(blocks, sizeof(unsigned char))
+    index.active = <unsigned char*>calloc(blocks, sizeof(unsigned char))
+    index.dirty = <unsigned char*>calloc(blocks, sizeof(unsigned char))
+    return index
+
+cdef void freeChunkIndex(ChunkIndex* index):
+    free(<void*>index.awake)
+    free(<void*>index.active)
+    free(<void*>index.dirty)
+
+cdef void markIndex(ChunkIndex* index, int row, int column, bint wake) nogil:
+    """
+    Chunk (row, column) was marked, see markChunk.
+    Workers updating neighbouring blocks may set the same flag at once, they all store 1
+    """
+    cdef int block = (row // index.blockSize) * index.blockColumns + column // index.blockSize
+    index.dirty[block] = 1
+    if wake:
+        index.awake[block] = 1
+
+cdef void fillIndex(ChunkIndex* index, unsigned char* flags, unsigned char value) nogil:
+    """Set one kind of flag of every block"""
+    memset(flags, value, index.blockRows * index.blockColumns * sizeof(unsigned char))
+
+
+#### THREAD POOL
+cdef ThreadPool_t* initPool(int workers):
+    cdef ThreadPool_t* pool = <ThreadPool_t*>malloc(sizeof(ThreadPool_t))
+    pool.workers = max(1, workers)
+    pool.threads = <pthread_t*>malloc(pool.workers * sizeof(pthread_t))
+    pthread_mutex_init(&pool.mutex, NULL)
+    pthread_cond_init(&pool.wake, NULL)
+    pthread_cond_init(&pool.done, NULL)
+
+    pool.task = NULL
+    pool.args = NULL
+    pool.tasks = 0
+    pool.next = 0
+    pool.pending = 0
+    pool.stop = False
+
+    # Thread 0 is whoever calls runPool
+    cdef int i
+    for i in range(1, pool.workers):
+        pthread_create(&pool.threads[i], NULL, &poolWorker, pool)
+    return pool
+
+cdef void freePool(ThreadPool_t* pool):
+    pthread_mutex_lock(&pool.mutex)
+    pool.stop = True
+    pthread_cond_broadcast(&pool.wake)
+    pthread_mutex_unlock(&pool.mutex)
+
+    cdef int i
+    for i in range(1, pool.workers):
+        pthread_join(pool.threads[i], NULL)
+
+    pthread_cond_destroy(&pool.done)
+    pthread_cond_destroy(&pool.wake)
+    pthread_mutex_destroy(&pool.mutex)
+    free(<void*>pool.threads)
+    free(<void*>pool)
+
+cdef void runTasks(ThreadPool_t* pool) nogil:
+    # Called and returns with the pool mutex held
+    cdef int i
+    while pool.next < pool.tasks:
+        i = pool.next
+        pool.next += 1
+        pthread_mutex_unlock(&pool.mutex)
+
+        pool.task(pool.args[i])
+
+        pthread_mutex_lock(&pool.mutex)
+        pool.pending -= 1
+        if pool.pending == 0:
+            pthread_cond_signal(&pool.done)
+
+cdef void* poolWorker(void* poolPass) nogil:
+    cdef ThreadPool_t* pool = <ThreadPool_t*>poolPass
+    pthread_mutex_lock(&pool.mutex)
+    while True:
+        while not pool.stop and pool.next >= pool.tasks:
+            pthread_cond_wait(&pool.wake, &pool.mutex)
+        if pool.stop:
+            break
+        runTasks(pool)
+    pthread_mutex_unlock(&pool.mutex)
+    return NULL
+
+cdef void runPool(ThreadPool_t* pool, Task_t task, void** args, int tasks) nogil:
+    """
+    Run task(args[i]) for every i < tasks on the pool threads and the calling one, returns when all are done
+    """
+    if tasks <= 0:
+        return
+
+    pthread_mutex_lock(&pool.mutex)
+    pool.task = task
+    pool.args = args
+    pool.tasks = tasks
+    pool.next = 0
+    pool.pending = tasks
+    if pool.workers > 1:
+        pthread_cond_broadcast(&pool.wake)
+
+    runTasks(pool)
+    while pool.pending > 0:
+        pthread_cond_wait(&pool.done, &pool.mutex)
+    pthread_mutex_unlock(&pool.mutex)
+
+
 ##### BOARD
 cdef Board initBoard(int height, int width):
     cdef Board board
@@ -49,9 +222,9 @@ cdef Board initBoard(int height, int width):
         board.board[i] = <Particle_t*>malloc(width * sizeof(Particle_t))
         for j in range(width):
             board.board[i][j] = Empty(i, j, False, True)
-    
-    pthread_mutex_init(&board.mutex, NULL)
-        
+
+    board.crossWrites = 0
+
     return board
 
 cdef void freeBoard(Board* board):
@@ -60,34 +233,81 @@ cdef void freeBoard(Board* board):
         free(<void*>board.board[i])
     free(<void*>board.board)
 
-    pthread_mutex_destroy(&board.mutex) 
-
-cdef void swapParticles(Board* board, Particle_t* cell, int y, int x) nogil:
+# Cells the calling thread may write (top <= y < bottom, left <= x < right).
+# The update schedule hands each worker a region no other worker touches during the phase, that alone keeps
+# the writes apart, there is no lock. Outside of an update a thread owns the whole board.
+cdef extern from *:
+    """
+    static __thread int ownedTop = 0, ownedLeft = 0;
+    static __thread int ownedBottom = 0x7FFFFFFF, ownedRight = 0x7FFFFFFF;
+    """
+    int ownedTop, ownedLeft, ownedBottom, ownedRight
+
+cdef void ownRegion(int top, int left, int bottom, int right) nogil:
+    global ownedTop, ownedLeft, ownedBottom, ownedRight
+    ownedTop = top
+    ownedLeft = left
+    ownedBottom = bottom
+    ownedRight = right
+
+cdef void ownBoard() nogil:
+    ownRegion(0, 0, 0x7FFFFFFF, 0x7FFFFFFF)
+
+cdef inline bint ownsCell(int y, int x) nogil:
+    return ownedTop <= y < ownedBottom and ownedLeft <= x < ownedRight
+
+# Bounds of the cells written by the calling thread, so the update knows what a particle touched
+cdef extern from *:
+    """
+    static __thread int writtenTop = 0, writtenLeft = 0, writtenBottom = 0, writtenRight = 0;
+    """
+    int writtenTop, writtenLeft, writtenBottom, writtenRight
+
+cdef void clearWritten() nogil:
+    global writtenTop, writtenLeft, writtenBottom, writtenRight
+    writtenTop = writtenLeft = writtenBottom = writtenRight = 0
+
+cdef Rect written() nogil:
+    return makeRect(writtenTop, writtenLeft, writtenBottom, writtenRight)
+
+cdef inline void noteWritten(int y, int x) nogil:
+    global writtenTop, writtenLeft, writtenBottom, writtenRight
+    if writtenTop >= writtenBottom:
+        writtenTop, writtenLeft, writtenBottom, writtenRight = y, x, y + 1, x + 1
+        return
+    if y < writtenTop:
+        writtenTop = y
+    elif y >= writtenBottom:
+        writtenBottom = y + 1
+    if x < writtenLeft:
+        writtenLeft = x
+    elif x >= writtenRight:
+        writtenRight = x + 1
+
+cdef inline void exchangeParticles(Board* board, Particle_t* cell, int y, int x) nogil:
     cdef Particle_t swapCell = getParticle(board, y, x)[0]  # Copying the Cell to swap
     cdef Particle_t cellCopy = cell[0]
 
     swapCell.pos = cellCopy.pos
-    # swapCell.pos = cell.pos
-
     cellCopy.pos.y = y
     cellCopy.pos.x = x
-    # cell.pos.y = y
-    # cell.pos.x = x
+    noteWritten(y, x)
+    noteWritten(swapCell.pos.y, swapCell.pos.x)
 
-    # printf("To Cell %p | From cell %p | pos %d %d | poss %d %d\n", &board.board[y][x], cell, y, x, cell.pos.y, cell.pos.x)
-    pthread_mutex_lock(&board.mutex)
-    
-    # board.board[y][x] = cell[0]
     board.board[y][x] = cellCopy
-    
-    # printf("%d %d (%d %d) is in bounds %d\n", y, x, board.height, board.width, inBounds(board, y, x))
-    # board.board[y % 10][x % 10] = cellCopy
-    # board.board[10][10] = cellCopy
-    # board.board[10][10].color = cellCopy.color
+    board.board[swapCell.pos.y][swapCell.pos.x] = swapCell
 
-    board.board[swapCell.pos.y][swapCell.pos.x] = swapCell    
-    
-    pthread_mutex_unlock(&board.mutex)
+cdef void swapParticles(Board* board, Particle_t* cell, int y, int x) nogil:
+    if not (ownsCell(cell.pos.y, cell.pos.x) and ownsCell(y, x)):
+        # A move crossing into a neighbour's region, only a broken schedule makes one
+        board.crossWrites += 1
+    exchangeParticles(board, cell, y, x)
+
+cdef void setParticle(Board* board, int y, int x, Particle_t* particle) nogil:
+    noteWritten(y, x)
+    if not ownsCell(y, x):
+        board.crossWrites += 1
+    board.board[y][x] = particle[0]
 
 ##### BRUSH
 cdef Brush initBrush():
@@ -96,103 +316,123 @@ cdef Brush initBrush():
     brush.penSize = <int>PAINT_SCALE
     return brush
 
-cdef void paintPoint(Brush* brush, Board* board, ivec* point):
-    if not inBounds(board, point.y, point.x):
-        return
-    cdef Particle_t newParticle
-    cdef Particle_t* pos = getParticle(board, point.y, point.x)
-    if isValid(brush.pen, pos.pType):
-        if brush.pen == SAND:
-            newParticle = Sand(point.y, point.x, False, True)
-        elif brush.pen == WATER:
-            newParticle = Water(point.y, point.x, False, True)
-        elif brush.pen == WOOD:
-            newParticle = Wood(point.y, point.x, False, True)
-        elif brush.pen == FIRE:
-            newParticle = Fire(point.y, point.x, False, True)
-        elif brush.pen == SMOKE:
-            newParticle = Smoke(point.y, point.x, False, True)
-        elif brush.pen == EMPTY:
-            newParticle = Empty(point.y, point.x, False, True)
-        setParticle(board, point.y, point.x, &newParticle)
-
-cdef void paintFromTo(Brush* brush, Board* board, ivec* start, ivec* end):
-    cdef ivec* point
-    with nogil:
-        point = interpolatePos(start, end, 0)
-    while point != NULL:
-        paintPoint(brush, board, point)
-        with nogil:
-            point = interpolatePos(NULL, end, 0)
+# Brush stamps by pen size: offsets of the cells within penSize of the center, built on first use
+DEF STAMP_SIZES = 64
+cdef ivec* stampCells[STAMP_SIZES]
+cdef int stampLengths[STAMP_SIZES]
+
+cdef ivec* brushStamp(int penSize, int* length):
+    cdef int y, x, count = 0
+    if stampCells[penSize] == NULL:
+        stampCells[penSize] = <ivec*>malloc((2 * penSize + 1) * (2 * penSize + 1) * sizeof(ivec))
+        for y in range(-penSize, penSize + 1):
+            for x in range(-penSize, penSize + 1):
+                if y * y + x * x <= penSize * penSize:
+                    stampCells[penSize][count].y = y
+                    stampCells[penSize][count].x = x
+                    count += 1
+        stampLengths[penSize] = count
+    length[0] = stampLengths[penSize]
+    return stampCells[penSize]
 
 cdef void paint(Brush* brush, Board* board, ivec mousePos, ivec lastMousePosition):
-    mousePos.y /= <int>SCALE
-    mousePos.x /= <int>SCALE
-    lastMousePosition.y /= <int>SCALE
-    lastMousePosition.x /= <int>SCALE
+    """Sweep the brush stamp from lastMousePosition to mousePos and paint every covered cell once"""
+    cdef int penSize = max(0, min(brush.penSize, STAMP_SIZES - 1))
+    cdef int stampLength
+    cdef ivec* stamp = brushStamp(penSize, &stampLength)
+
+    # Covered cells of the stroke's bounding box, the walk never leaves it
+    cdef int top = min(mousePos.y, lastMousePosition.y) - penSize
+    cdef int left = min(mousePos.x, lastMousePosition.x) - penSize
+    cdef int height = max(mousePos.y, lastMousePosition.y) + penSize + 1 - top
+    cdef int width = max(mousePos.x, lastMousePosition.x) + penSize + 1 - left
+    cdef unsigned char* covered = <unsigned char*>calloc(height * width, sizeof(unsigned char))
 
-    cdef vec fmousePos = ivec2vec(&mousePos)
-    cdef vec flastMousePosition = ivec2vec(&lastMousePosition)
-    
-    cdef vec slope = <vec>subv(&fmousePos, &flastMousePosition)
-    slope = normalize(&slope)
-
-    cdef ivec y, x
-    y.x = 0
-    x.y = 0
-    cdef ivec pointY, pointX
-    cdef ivec lastPointY, lastPointX
-    cdef int offset
-    for offset in range(-brush.penSize, brush.penSize):
-        y.y = offset
-        pointY = iaddv(&y, &mousePos)
-        lastPointY = iaddv(&y, &lastMousePosition)
-        paintFromTo(brush, board, &pointY, &lastPointY)
-
-        x.x = offset
-        pointX = iaddv(&x, &mousePos)
-        lastPointX = iaddv(&x, &lastMousePosition)
-        paintFromTo(brush, board, &pointX, &lastPointX)
-
-    cdef int cy, cx, radius
-    cdef ivec point, lastPoint, r_phi
-    for cy in range(-brush.penSize, brush.penSize):
-        radius = <int>round(sqrt(brush.penSize * brush.penSize - cy * cy))
-        for cx in range(-radius, radius):
-            r_phi.y = cy
-            r_phi.x = cx
-            
-            point = iaddv(&mousePos, &r_phi)
-            paintPoint(brush, board, &point)
-
-            lastPoint = iaddv(&lastMousePosition, &r_phi)
-            paintPoint(brush, board, &lastMousePosition)
-
-
-cdef float linePointLen(vec lineStart, vec lineEnd, vec point):
-    if equalVec(&lineStart, &lineEnd):
-        return INFINITY
-    cdef vec slope = subv(&lineEnd, &lineStart)
-    cdef float divisor = pow(slope.x, 2) + pow(slope.y, 2)
-
-    cdef float t = ((point.x - lineStart.x) * slope.x + (point.y - lineStart.y) * slope.y) / divisor
-    if not 0.0 <= t <= 1.0:  # Checking if p's projection lies on the line
-        return INFINITY
-
-    cdef float point_distance_from_line = abs(slope.x * (lineStart.y - point.y) - (lineStart.x - point.x) * slope.y)
-    point_distance_from_line /= sqrt(divisor)
-
-    return point_distance_from_line
+    cdef ivec* point
+    cdef int i
+    with nogil:
+        point = interpolatePos(&lastMousePosition, &mousePos, 0)
+        while point != NULL:
+            for i in range(stampLength):
+                covered[(point.y + stamp[i].y - top) * width + point.x + stamp[i].x - left] = 1
+            point = interpolatePos(NULL, &mousePos, 0)
+
+    cdef ParticleType pen = <ParticleType>brush.pen
+    cdef Particle_t newParticle
+    cdef Particle_t* spot
+    cdef int y, x
+    for y in range(max(top, 0), min(top + height, board.height)):
+        for x in range(max(left, 0), min(left + width, board.width)):
+            if not covered[(y - top) * width + x - left]:
+                continue
+            spot = getParticle(board, y, x)
+            if isValid(pen, spot.pType):
+                newParticle = makeParticle(pen, y, x, False, True)
+                setParticle(board, y, x, &newParticle)
+
+    free(<void*>covered)
+
+
+cdef inline float pointBoxDistance(float y, float x, float top, float left, float bottom, float right) nogil:
+    cdef float dy = max(max(top - y, y - bottom), 0.0)
+    cdef float dx = max(max(left - x, x - right), 0.0)
+    return <float>sqrt(dy * dy + dx * dx)
+
+cdef inline float pointSegmentDistance(float y, float x, vec* start, float dy, float dx, float length2) nogil:
+    cdef float t = ((y - start.y) * dy + (x - start.x) * dx) / length2
+    t = max(0.0, min(t, 1.0))
+    y -= start.y + t * dy
+    x -= start.x + t * dx
+    return <float>sqrt(y * y + x * x)
+
+cdef float segmentBoxDistance(vec* start, vec* end, float top, float left, float bottom, float right) nogil:
+    # Endpoints to the box
+    cdef float distance = min(
+        pointBoxDistance(start.y, start.x, top, left, bottom, right),
+        pointBoxDistance(end.y, end.x, top, left, bottom, right)
+    )
+    cdef float dy = end.y - start.y, dx = end.x - start.x
+    cdef float length2 = dy * dy + dx * dx
+    if length2 == 0.0 or distance == 0.0:
+        return distance
+
+    # Box corners to the segment
+    distance = min(distance, pointSegmentDistance(top, left, start, dy, dx, length2))
+    distance = min(distance, pointSegmentDistance(top, right, start, dy, dx, length2))
+    distance = min(distance, pointSegmentDistance(bottom, left, start, dy, dx, length2))
+    distance = min(distance, pointSegmentDistance(bottom, right, start, dy, dx, length2))
+
+    # Crossing: corners on both sides of the line and the segment's bounding box overlapping the box
+    cdef float side0 = dy * (left - start.x) - dx * (top - start.y)
+    cdef float side1 = dy * (right - start.x) - dx * (top - start.y)
+    cdef float side2 = dy * (left - start.x) - dx * (bottom - start.y)
+    cdef float side3 = dy * (right - start.x) - dx * (bottom - start.y)
+    if (min(min(side0, side1), min(side2, side3)) <= 0.0 <= max(max(side0, side1), max(side2, side3)) and
+            min(start.y, end.y) <= bottom and max(start.y, end.y) >= top and
+            min(start.x, end.x) <= right and max(start.x, end.x) >= left):
+        return 0.0
+    return distance
 
 
 # Interpolation
-cdef ivec[3] currentCell
-cdef ivec[3] cellDirection
+# Walk state of each depth, one copy per thread so workers can interpolate at the same time
+cdef extern from *:
+    """
+    static __thread ivec currentCell[3];
+    static __thread ivec cellDirection[3];
+
+    static __thread vec distances[3];
+    static __thread vec unitDistance[3];
 
-cdef vec[3] distances
-cdef vec[3] unitDistance
+    static __thread ivec out[3];
+    """
+    ivec[3] currentCell
+    ivec[3] cellDirection
 
-cdef ivec[3] out
+    vec[3] distances
+    vec[3] unitDistance
+
+    ivec[3] out
 
 cdef ivec* interpolatePos(ivec* start, ivec* end, int depth) nogil:
     global currentCell, cellDirection
@@ -245,3 +485,126 @@ cdef ivec* interpolatePos(ivec* start, ivec* end, int depth) nogil:
 
         out[depth] = start[0]
         return &out[depth]
+
+
+# Ray cache
+# Offsets of the cells interpolatePos walks from the origin to every offset within rayReach, start excluded.
+# Particle velocities are clamped to TERMINAL_VELOCITY so their rays are a lookup instead of a walk
+cdef int rayReach = <int>TERMINAL_VELOCITY
+cdef int raySide = 2 * rayReach + 1
+cdef int rayStride = 2 * rayReach  # longest ray, |y| + |x| cells
+cdef ivec* rayCells = NULL
+cdef int* rayLengths = NULL
+
+cdef void initRays():
+    global rayCells, rayLengths
+    rayCells = <ivec*>malloc(raySide * raySide * rayStride * sizeof(ivec))
+    rayLengths = <int*>malloc(raySide * raySide * sizeof(int))
+
+    cdef ivec origin, target
+    cdef ivec* cell
+    cdef int y, x, slot, length
+    origin.y = 0
+    origin.x = 0
+    for y in range(-rayReach, rayReach + 1):
+        for x in range(-rayReach, rayReach + 1):
+            slot = (y + rayReach) * raySide + x + rayReach
+            target.y = y
+            target.x = x
+
+            length = 0
+            interpolatePos(&origin, &target, 0)  # skipping the origin
+            cell = interpolatePos(NULL, &target, 0)
+            while cell != NULL and length < rayStride:
+                rayCells[slot * rayStride + length] = cell[0]
+                length += 1
+                cell = interpolatePos(NULL, &target, 0)
+            rayLengths[slot] = length
+
+initRays()
+
+cdef ivec* castRay(ivec* offset, int* length) nogil:
+    if not (-rayReach <= offset.y <= rayReach and -rayReach <= offset.x <= rayReach):
+        length[0] = 0
+        return NULL
+
+    cdef int slot = (offset.y + rayReach) * raySide + offset.x + rayReach
+    length[0] = rayLengths[slot]
+    return &rayCells[slot * rayStride]
+
+
+#### SWAP BENCHMARK
+cdef extern from "<stdlib.h>" nogil:
+    int rand_r(unsigned int* seedp)
+
+ctypedef struct SwapArgs_t:
+    Board* board
+    int top, bottom  # band of rows the task swaps in
+    int swaps
+    # Board wide lock every swap takes, NULL when the worker owns its band
+    pthread_mutex_t* lock
+
+cdef void* swapBand(void* argsPass) nogil:
+    cdef SwapArgs_t* args = <SwapArgs_t*>argsPass
+    cdef Board* board = args.board
+    cdef unsigned int state = <unsigned int>args.top + 1
+    cdef int rows = args.bottom - args.top
+    cdef int i, y, x, toY, toX
+
+    if args.lock == NULL:
+        ownRegion(args.top, 0, args.bottom, board.width)
+        for i in range(args.swaps):
+            y = args.top + rand_r(&state) % rows
+            x = rand_r(&state) % board.width
+            swapParticles(board, getParticle(board, y, x), args.top + rand_r(&state) % rows, rand_r(&state) % board.width)
+        ownBoard()
+        return NULL
+
+    # No schedule: any cell may be swapped with any other, so every swap holds the lock
+    for i in range(args.swaps):
+        y = rand_r(&state) % board.height
+        x = rand_r(&state) % board.width
+        toY = rand_r(&state) % board.height
+        toX = rand_r(&state) % board.width
+        pthread_mutex_lock(args.lock)
+        exchangeParticles(board, getParticle(board, y, x), toY, toX)
+        pthread_mutex_unlock(args.lock)
+    return NULL
+
+def swap_throughput(int workers, int swaps=1_000_000, bint owned=True, int height=256, int width=256):
+    """
+    Time random swaps on a board split in one band of rows per worker
+    :param owned: every worker swaps lock-free in its own band like the update schedule,
+        otherwise workers swap anywhere on the board and every swap takes one board wide lock
+    :returns: swaps per second
+    """
+    from time import perf_counter
+
+    cdef Board board = initBoard(height, width)
+    cdef pthread_mutex_t lock
+    pthread_mutex_init(&lock, NULL)
+    cdef ThreadPool_t* pool = initPool(workers)
+    cdef SwapArgs_t* args = <SwapArgs_t*>malloc(pool.workers * sizeof(SwapArgs_t))
+    cdef void** tasks = <void**>malloc(pool.workers * sizeof(void*))
+
+    cdef int i
+    for i in range(pool.workers):
+        args[i].board = &board
+        args[i].top = i * height // pool.workers
+        args[i].bottom = (i + 1) * height // pool.workers
+        args[i].swaps = swaps // pool.workers
+        args[i].lock = NULL if owned else &lock
+        tasks[i] = &args[i]
+
+    start = perf_counter()
+    with nogil:
+        runPool(pool, &swapBand, tasks, pool.workers)
+    elapsed = perf_counter() - start
+    done = (swaps // pool.workers) * pool.workers
+
+    free(<void*>tasks)
+    free(<void*>args)
+    freePool(pool)
+    freeBoard(&board)
+    pthread_mutex_destroy(&lock)
+    return done / elapsed
@@ -1,39 +1,72 @@
+from typing import Optional
+import argparse
+
 import pygame as py
 from values import *
+from src import config
+from src.config import Config
+from src.replay import Recorder
+from src.ticker import Lockstep, Ticker
 from src.draw import Display
 # from cver.cdraw import Display
+# from src.automaton import Display
 
 
 class SandSim:
-    def __init__(self) -> None:
+    def __init__(self, settings: Optional[Config] = None) -> None:
         py.init()
 
-        self.display = Display(WX, WY)
+        self.settings = Config() if settings is None else settings
+        self.display = Display(self.settings.window_width, self.settings.window_height, config=self.settings)
         self.clock = py.time.Clock()
+        # Steps the simulation once per frame, or at settings.tick_rate on its own thread
+        self.stepper = (Ticker(self.display, self.settings.tick_rate) if self.settings.tick_rate
+                        else Lockstep(self.display))
 
         self.sim = True
         self.is_running = True
 
-    def run(self) -> None:
-        while self.is_running:
-            self.clock.tick(FPS)
-
-            if self.sim:
-                self.display.onUpdate()
-
-            self.display.paint_particles()
-            self.display.redraw()
-            self.display.draw_cursor()
-
-            if self.sim:
-                self.display.reset_chunks()
-
-            py.display.flip()
-
-            self.handle_events()
-
-            # print(self.clock.get_fps())
-            py.display.set_caption(f"Sand Game | FPS {self.clock.get_fps():0.2f}")
+    def run(self, profile: bool = False, profile_output: Optional[str] = "profile.json",
+            record: Optional[str] = None) -> None:
+        """
+        :param profile: keep per phase timings and per tick counters in display.simulation.profiler
+        :param profile_output: where the profile is written on exit, None to keep it in memory only
+        :param record: write every brush stroke to this file on exit, replay it with src.replay
+        """
+        simulation = self.display.simulation
+        profiler = simulation.profiler
+        profiler.enabled = profile
+        if record is not None:
+            simulation.recorder = Recorder(simulation)
+
+        stepper = self.stepper
+        stepper.start()
+        try:
+            while self.is_running:
+                self.clock.tick(self.settings.fps)
+
+                with profiler.phase("paint"), stepper.lock:
+                    self.display.paint_particles()
+
+                stepper.advance(self.sim)
+                stepper.present()
+                self.display.draw_cursor()
+
+                with profiler.phase("flip"):
+                    py.display.flip()
+
+                with profiler.phase("events"):
+                    self.handle_events()
+
+                # print(self.clock.get_fps())
+                py.display.set_caption(f"Sand Game | FPS {self.clock.get_fps():0.2f}")
+        finally:
+            stepper.stop()
+            if profile and profile_output is not None:
+                profiler.dump(profile_output)
+            if record is not None:
+                simulation.recorder.save(record, simulation.tick - simulation.recorder.start_tick)
+                simulation.recorder = None
 
     def handle_events(self) -> None:
         for event in py.event.get():
@@ -47,14 +80,35 @@ class SandSim:
                 if event.key == py.K_p:
                     self.sim = False if self.sim else True
                 if event.key == py.K_n:
-                    self.display.map_colors()
+                    with self.stepper.lock:
+                        self.display.map_colors()
             elif event.type == py.MOUSEWHEEL:
                 self.display.resize_cursor(event.y)
 
 
 def main() -> None:
-    sand_sim = SandSim()
-    sand_sim.run()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--profile", nargs="?", const="profile.json", default=None, metavar="PATH",
+                        help="profile every phase and write the percentiles to PATH on exit")
+    parser.add_argument("--record", metavar="PATH", help="record brush input to PATH, replay it with src.replay")
+    config.add_arguments(parser)
+    parser.add_argument("--tune-scenario", default="water_flood", metavar="NAME",
+                        help="benchmarks.scenarios workload --chunk-size auto is measured on")
+    args = parser.parse_args()
+
+    chunk_size = None
+    if args.chunk_size == "auto":
+        from benchmarks.scenarios import SCENARIOS
+        from benchmarks.suite import ENGINES
+        from benchmarks.tune import tune
+        if args.tune_scenario not in SCENARIOS:
+            parser.error(f"--tune-scenario has to be one of {', '.join(SCENARIOS)}")
+        height, width = args.size
+        chunk_size, results = tune(ENGINES[Display.engine], SCENARIOS[args.tune_scenario], height, width)
+        print("chunk size", chunk_size, {size: round(ticks_per_sec, 1) for size, ticks_per_sec in results.items()})
+
+    sand_sim = SandSim(config.from_args(args, chunk_size))
+    sand_sim.run(profile=args.profile is not None, profile_output=args.profile, record=args.record)
 
 
 if __name__ == '__main__':
@@ -18,6 +18,10 @@ app = [
     Extension(
         "cver.tools", [path.join('cver', 'tools.pyx'), vector_path],
         libraries=["pthread"]
+    ),
+    Extension(
+        "cver.csimulation", [path.join('cver', 'csimulation.pyx'), vector_path],
+        libraries=["pthread"]
     )
 ]
 
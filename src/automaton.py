@@ -0,0 +1,200 @@
+"""
+Whole board cellular automaton: Sand, Water and Smoke step as NumPy operations on the typed CompactBoard arrays
+instead of one particle object at a time, so large boards run fast without a C compiler.
+
+    from src.automaton import Display  # in place of src.draw.Display
+
+A tick is a fixed list of passes over the rows of active chunks (Simulation.active_regions). Every pass moves all cells of one row
+(or column) parity by the same offset at once, so no two moves share a cell. Which kind may move into which
+follows Particle.is_valid. There is no velocity: sand and water fall a cell per pass and slide diagonally,
+water also spreads sideways and smoke drifts up through empty cells. Fire burns down and spreads
+through the heat field (src.heat) like in Simulation.
+"""
+from typing import List, Tuple
+
+import glm
+import numpy as np
+
+from values import *
+import src.particle as particle
+import src.tools as tools
+from src import draw, rng
+from src.board import CompactBoard
+from src.simulation import Simulation, PENS, DIRTY_MARGIN
+
+EMPTY = CompactBoard.EMPTY
+SAND, WATER, FIRE, SMOKE = particle.Sand.kind, particle.Water.kind, particle.Fire.kind, particle.Smoke.kind
+KINDS = len(particle.ParticleType)
+
+# Painted fire burns this many ticks, painted smoke lives a tick count in this range, like the particles
+FIRE_HEAT = 100
+SMOKE_LIFETIME = particle.Smoke.lifetime_range
+
+# VALID[a, b]: a pen of kind a may replace kind b, Particle.is_valid as a table
+VALID = np.zeros((KINDS, KINDS), dtype=bool)
+for _pen in PENS.values():
+    VALID[_pen.kind, EMPTY] = True
+    for _spot in PENS.values():
+        if _spot is not particle.Eraser:
+            # is_valid only calls spot.id(), the class answers it like an instance
+            VALID[_pen.kind, _spot.kind] = _pen.is_valid(_spot)
+
+# Moves of every pass, [kind moving, kind it swaps with]
+FALL = np.zeros((KINDS, KINDS), dtype=bool)
+FALL[[SAND, WATER]] = VALID[[SAND, WATER]]
+SPREAD = np.zeros((KINDS, KINDS), dtype=bool)
+SPREAD[WATER] = VALID[WATER]
+# Smoke only goes where nothing is, like Smoke._step
+RISE = np.zeros((KINDS, KINDS), dtype=bool)
+RISE[SMOKE, EMPTY] = True
+
+Slices = Tuple[slice, slice]
+Region = Tuple[int, int, int, int]
+
+
+class ArrayBrush(tools.Brush):
+    def paint(self, board: CompactBoard, pos: glm.ivec2, last_pos: glm.ivec2) -> None:
+        """Brush.paint writing the board arrays of every covered cell at once"""
+        ys, xs = self.stroke(glm.ivec2(pos), glm.ivec2(last_pos))
+        inside = (ys >= 0) & (ys < board.shape[0]) & (xs >= 0) & (xs < board.shape[1])
+        ys, xs = ys[inside], xs[inside]
+        replace = VALID[self.pen.kind, board.type[ys, xs]]
+        ys, xs = ys[replace], xs[replace]
+
+        for name in CompactBoard.FIELDS:
+            getattr(board, name)[ys, xs] = 0
+        if self.pen is particle.Eraser:
+            return
+
+        kind = self.pen.kind
+        colors = np.array(particle.SHADES[self.pen.__name__], dtype=np.uint8)
+        board.type[ys, xs] = kind
+        board.color[ys, xs] = colors[rng.stream.generator.integers(0, len(colors), len(ys))]
+        if kind == FIRE:
+            board.heat[ys, xs] = FIRE_HEAT
+        elif kind == SMOKE:
+            board.lifetime[ys, xs] = rng.stream.generator.integers(SMOKE_LIFETIME[0], SMOKE_LIFETIME[1] + 1, len(ys))
+
+
+class Automaton(Simulation):
+    """
+    Simulation stepping the whole active part of the board with array passes.
+    Painting, chunks, dirty rects, snapshots and the heat field work as in Simulation, always on a CompactBoard.
+    """
+
+    def __init__(self, height: int = BOARD_Y, width: int = BOARD_X, chunk_size: int = CHUNK_SIZE, **kwargs) -> None:
+        kwargs["board_type"] = CompactBoard
+        super(Automaton, self).__init__(height, width, chunk_size, **kwargs)
+        self.brush = ArrayBrush(particle.Sand)
+        # Cells changed during the current update
+        self.changed = np.zeros((height, width), dtype=bool)
+
+    def pass_slices(self, region: Region, dy: int, dx: int, parity: int) -> Tuple[Slices, Slices]:
+        """
+        Cells of one pass and the cells dy, dx away from them, both as slices of the board.
+        Vertical and diagonal passes take every other row, sideways ones every other column,
+        so no cell is both moved and moved into
+        """
+        top, left, bottom, right = region
+        y0, y1 = max(top, -dy), min(bottom, self.height - dy)
+        x0, x1 = max(left, -dx), min(right, self.width - dx)
+        if dy:
+            y0 += (y0 - parity) % 2
+        else:
+            x0 += (x0 - parity) % 2
+        ys, xs = (2, 1) if dy else (1, 2)
+        return ((slice(y0, y1, ys), slice(x0, x1, xs)),
+                (slice(y0 + dy, y1 + dy, ys), slice(x0 + dx, x1 + dx, xs)))
+
+    def move(self, regions: List[Region], moves: np.ndarray, dy: int, dx: int) -> None:
+        """
+        Swap every cell of the regions with the one dy, dx away where moves allows it, in two parity passes.
+        A parity pass only moves cells of that parity into the other one, so the regions can take turns in it
+        """
+        board = self.board
+        for parity in (0, 1):
+            for region in regions:
+                source, target = self.pass_slices(region, dy, dx, parity)
+                mask = moves[board.type[source], board.type[target]]
+                count = np.count_nonzero(mask)
+                if not count:
+                    continue
+                for name in CompactBoard.FIELDS:
+                    array = getattr(board, name)
+                    a, b = array[source], array[target]
+                    a[mask], b[mask] = b[mask], a[mask]
+                self.changed[source] |= mask
+                self.changed[target] |= mask
+                self.moved_particles += count
+
+    def burn(self, region: Region) -> None:
+        """Fire burns down its heat and smoke its lifetime, both vanish when they run out"""
+        cells = (slice(region[0], region[2]), slice(region[1], region[3]))
+        board = self.board
+        types, heat, lifetime = board.type[cells], board.heat[cells], board.lifetime[cells]
+
+        fire = types == FIRE
+        smoke = types == SMOKE
+        heat[fire] -= 1
+        gone = (fire & (heat <= 0)) | (smoke & (lifetime < 0))
+        lifetime[smoke] -= 1
+        for name in CompactBoard.FIELDS:
+            getattr(board, name)[cells][gone] = 0
+        self.changed[cells] |= fire | smoke
+
+    def wake_changed(self, region: Region) -> None:
+        """Mark the changed cells of every chunk around the region, like Simulation.update_chunk marks moves"""
+        chunk_size = self.chunk_size
+        # Moves reach a cell past the region
+        top = max(region[0] - 1, 0) // chunk_size * chunk_size
+        left = max(region[1] - 1, 0) // chunk_size * chunk_size
+        bottom, right = min(region[2] + 1, self.height), min(region[3] + 1, self.width)
+
+        changed = self.changed[top:bottom, left:right]
+        rows = np.arange(0, changed.shape[0], chunk_size)
+        columns = np.arange(0, changed.shape[1], chunk_size)
+        touched = np.logical_or.reduceat(np.logical_or.reduceat(changed, rows, axis=0), columns, axis=1)
+        for row, column in np.argwhere(touched).tolist():
+            y, x = rows[row], columns[column]
+            block = changed[y:y + chunk_size, x:x + chunk_size]
+            ys, xs = np.flatnonzero(block.any(axis=1)), np.flatnonzero(block.any(axis=0))
+            self.mark(
+                top + y + ys[0] - DIRTY_MARGIN, left + x + xs[0] - DIRTY_MARGIN,
+                top + y + ys[-1] + DIRTY_MARGIN + 1, left + x + xs[-1] + DIRTY_MARGIN + 1
+            )
+
+    def update(self) -> None:
+        self.moved_particles = 0
+        self.visited_cells = 0
+        regions = self.active_regions()
+        if not regions:
+            return
+
+        for top, left, bottom, right in regions:
+            self.visited_cells += (bottom - top) * (right - left)
+            self.changed[max(top - 1, 0):bottom + 1, max(left - 1, 0):right + 1] = False
+
+        for region in regions:
+            self.burn(region)
+        # One side per tick for everything sliding sideways, the other one the next time it comes up
+        side = 1 if rng.stream.random() < 0.5 else -1
+        self.move(regions, FALL, 1, 0)
+        self.move(regions, FALL, 1, side)
+        self.move(regions, FALL, 1, -side)
+        self.move(regions, SPREAD, 0, side)
+        self.move(regions, RISE, -1, 0)
+        self.move(regions, RISE, 0, 1 if rng.stream.random() < 0.5 else -1)
+        for region in regions:
+            self.wake_changed(region)
+        self.update_heat()
+
+    def reset_chunk(self, chunk: tools.Chunk) -> None:
+        """Cells carry no update flag here, every pass moves a cell at most once"""
+
+
+class Display(draw.Display):
+    engine = "numpy"
+
+    def make_simulation(self) -> Automaton:
+        config = self.config
+        return Automaton(config.board_height, config.board_width, config.chunk_size)
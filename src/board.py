@@ -0,0 +1,187 @@
+from typing import Tuple, Optional, Dict, Type
+
+import glm
+import numpy as np
+
+import src.particle as particle
+
+
+class VelocityView(np.ndarray):
+    """
+    Velocity of a single cell, a (x, y) view into CompactBoard.vel.
+    glm functions accept it like a glm.vec2, writes go straight to the board.
+    """
+
+    @property
+    def x(self) -> float:
+        return float(self[0])
+
+    @x.setter
+    def x(self, value: float) -> None:
+        self[0] = value
+
+    @property
+    def y(self) -> float:
+        return float(self[1])
+
+    @y.setter
+    def y(self, value: float) -> None:
+        self[1] = value
+
+
+class CellView:
+    """
+    Particle bound to a cell of a CompactBoard.
+    Per cell state lives in the board arrays, per material constants are class attributes.
+    """
+    __slots__ = ('board', 'y', 'x')
+
+    def __init__(self, board: 'CompactBoard', y: int, x: int) -> None:
+        self.board = board
+        self.y = y
+        self.x = x
+
+    @property
+    def vel(self) -> VelocityView:
+        return self.board.vel[self.y, self.x].view(VelocityView)
+
+    @vel.setter
+    def vel(self, value: glm.vec2) -> None:
+        self.board.vel[self.y, self.x] = value
+
+    @property
+    def color(self) -> int:
+        return int(self.board.color[self.y, self.x])
+
+    @color.setter
+    def color(self, value: int) -> None:
+        self.board.color[self.y, self.x] = value
+
+    @property
+    def is_falling(self) -> bool:
+        return bool(self.board.flags[self.y, self.x] & CompactBoard.FALLING)
+
+    @is_falling.setter
+    def is_falling(self, value: bool) -> None:
+        self.board.set_flag(self.y, self.x, CompactBoard.FALLING, value)
+
+    @property
+    def been_updated(self) -> bool:
+        return bool(self.board.flags[self.y, self.x] & CompactBoard.UPDATED)
+
+    @been_updated.setter
+    def been_updated(self, value: bool) -> None:
+        self.board.set_flag(self.y, self.x, CompactBoard.UPDATED, value)
+
+    @property
+    def lifetime(self) -> float:
+        return float(self.board.lifetime[self.y, self.x])
+
+    @lifetime.setter
+    def lifetime(self, value: float) -> None:
+        self.board.lifetime[self.y, self.x] = value
+
+    @property
+    def heat(self) -> float:
+        return float(self.board.heat[self.y, self.x])
+
+    @heat.setter
+    def heat(self, value: float) -> None:
+        self.board.heat[self.y, self.x] = value
+
+
+# Attributes that never change after a particle is created
+MATERIAL_CONSTANTS = ('flammable', 'friction', 'inertial_resistance', 'bounciness', 'density', 'dispersion', 'mass')
+
+
+def make_view(cls: Type[particle.Particle]) -> Type[CellView]:
+    prototype = cls(0, 0)
+    constants = {name: getattr(prototype, name) for name in MATERIAL_CONSTANTS}
+    # Same name as the particle, so Particle.id() keeps working
+    return type(cls.__name__, (CellView, cls), {'__slots__': (), **constants})
+
+
+VIEWS: Dict[int, Type[CellView]] = {
+    cls.id().value: make_view(cls)
+    for cls in (particle.Sand, particle.Water, particle.Wood, particle.Fire, particle.Smoke)
+}
+
+
+class CompactBoard:
+    """
+    Struct-of-arrays board: one typed array per particle field instead of one Python object per cell.
+    Indexing returns a CellView, so Sand, Water, Fire and Smoke step on it unchanged.
+    """
+    EMPTY = particle.ParticleType.Particle.value
+
+    # flags bitfield
+    FALLING = 0b01
+    UPDATED = 0b10
+
+    # per cell arrays
+    FIELDS = ('type', 'color', 'vel', 'flags', 'lifetime', 'heat')
+
+    def __init__(self, y: int, x: int) -> None:
+        self.shape = (y, x)
+
+        self.type = np.zeros((y, x), dtype=np.uint8)
+        self.color = np.zeros((y, x), dtype=np.uint8)  # particle.PALETTE index
+        self.vel = np.zeros((y, x, 2), dtype=np.float32)  # (x, y) like glm.vec2
+        self.flags = np.zeros((y, x), dtype=np.uint8)
+        self.lifetime = np.zeros((y, x), dtype=np.float32)
+        self.heat = np.zeros((y, x), dtype=np.float32)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in self.FIELDS)
+
+    def in_bounds(self, y: int, x: int) -> bool:
+        return 0 <= y < self.shape[0] and 0 <= x < self.shape[1]
+
+    def set_flag(self, y: int, x: int, flag: int, value: bool) -> None:
+        if value:
+            self.flags[y, x] |= flag
+        else:
+            self.flags[y, x] &= 0xFF ^ flag
+
+    def __getitem__(self, pos: Tuple[int, int]) -> Optional[CellView]:
+        y, x = pos
+        cell_type = self.type[y, x]
+        if cell_type == self.EMPTY:
+            return None
+        return VIEWS[cell_type](self, y, x)
+
+    def __setitem__(self, pos: Tuple[int, int], cell: Optional[particle.Particle]) -> None:
+        y, x = pos
+        if cell is None:
+            self.type[y, x] = self.EMPTY
+            self.color[y, x] = 0
+            self.vel[y, x] = 0.0
+            self.flags[y, x] = 0
+            self.lifetime[y, x] = 0.0
+            self.heat[y, x] = 0.0
+            return
+
+        self.type[y, x] = cell.id().value
+        self.color[y, x] = cell.color
+        self.vel[y, x] = cell.vel
+        self.flags[y, x] = (self.FALLING if cell.is_falling else 0) | (self.UPDATED if cell.been_updated else 0)
+        self.lifetime[y, x] = cell.lifetime
+        self.heat[y, x] = cell.heat
+
+    def swap(self, cell: CellView, y: int, x: int) -> None:
+        cy, cx = cell.y, cell.x
+        for array in (self.type, self.color, self.flags, self.lifetime, self.heat):
+            array[cy, cx], array[y, x] = array[y, x], array[cy, cx]
+        self.vel[cy, cx], self.vel[y, x] = self.vel[y, x].copy(), self.vel[cy, cx].copy()
+
+        cell.y = y
+        cell.x = x
+
+    def reset(self, y: slice, x: slice) -> None:
+        self.flags[y, x] &= 0xFF ^ self.UPDATED
+
+    def adopt(self, state: Dict[str, np.ndarray]) -> None:
+        """Use the FIELDS arrays of state (Simulation.get_state) as they are, without copying"""
+        for name in self.FIELDS:
+            setattr(self, name, state[name])
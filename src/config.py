@@ -0,0 +1,90 @@
+"""
+Runtime settings of a game: board size, how many pixels a cell takes on screen, frame rate, debug overlay,
+chunk size and tick rate. values.py holds the defaults, main.py builds a Config from its command line
+and the displays of every engine take one.
+"""
+from typing import Optional, Tuple, Union
+import argparse
+
+from values import *
+
+
+class Config:
+    def __init__(self, board_height: int = BOARD_Y, board_width: int = BOARD_X, scale: int = SCALE,
+                 fps: int = FPS, debug: bool = DEBUG, chunk_size: int = CHUNK_SIZE, tick_rate: int = TICK_RATE) -> None:
+        """
+        :param scale: window pixels per board cell on each axis
+        :param debug: outline the chunks, green when updated
+        :param tick_rate: simulation ticks per second on a thread of their own (src.ticker), 0 ticks once per frame
+        """
+        if board_height <= 0 or board_width <= 0 or scale <= 0 or chunk_size <= 0:
+            raise ValueError(f"board {board_height}x{board_width}, scale {scale} and chunk size {chunk_size} "
+                             f"have to be positive")
+        if tick_rate < 0:
+            raise ValueError(f"tick rate {tick_rate} can't be negative")
+        self.board_height = board_height
+        self.board_width = board_width
+        self.scale = scale
+        self.fps = fps
+        self.debug = debug
+        self.chunk_size = chunk_size
+        self.tick_rate = tick_rate
+
+    @property
+    def window_width(self) -> int:
+        return self.board_width * self.scale
+
+    @property
+    def window_height(self) -> int:
+        return self.board_height * self.scale
+
+    def __repr__(self) -> str:
+        return (f"Config(board={self.board_height}x{self.board_width}, scale={self.scale}, fps={self.fps}, "
+                f"debug={self.debug}, chunk_size={self.chunk_size}, tick_rate={self.tick_rate})")
+
+
+def parse_size(text: str) -> Tuple[int, int]:
+    """HEIGHTxWIDTH to (height, width)"""
+    try:
+        height, width = text.lower().split("x")
+        return int(height), int(width)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"{text!r} is not HEIGHTxWIDTH")
+
+
+def parse_chunk_size(text: str) -> Union[int, str]:
+    """A positive int or "auto" """
+    if text == "auto":
+        return text
+    try:
+        chunk_size = int(text)
+    except ValueError:
+        chunk_size = 0
+    if chunk_size <= 0:
+        raise argparse.ArgumentTypeError(f"{text!r} is neither a positive number nor auto")
+    return chunk_size
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """Options of every Config field, read them back with from_args"""
+    parser.add_argument("--size", type=parse_size, default=(BOARD_Y, BOARD_X), metavar="HEIGHTxWIDTH",
+                        help="board size in cells")
+    parser.add_argument("--scale", type=int, default=SCALE, help="window pixels per cell")
+    parser.add_argument("--fps", type=int, default=FPS)
+    parser.add_argument("--debug", action=argparse.BooleanOptionalAction, default=DEBUG, help="outline the chunks")
+    parser.add_argument("--chunk-size", type=parse_chunk_size, default=CHUNK_SIZE, metavar="N|auto",
+                        help="cells per chunk side, auto benchmarks the candidates on this board first")
+    parser.add_argument("--tick-rate", type=int, default=TICK_RATE, metavar="N",
+                        help="step the simulation N times a second on its own thread, 0 once per frame")
+
+
+def from_args(args: argparse.Namespace, chunk_size: Optional[int] = None) -> Config:
+    """
+    :param chunk_size: used instead of args.chunk_size, which is only a number when it isn't "auto"
+    """
+    if chunk_size is None:
+        if args.chunk_size == "auto":
+            raise ValueError("chunk size auto has to be tuned into a number first")
+        chunk_size = args.chunk_size
+    height, width = args.size
+    return Config(height, width, args.scale, args.fps, args.debug, chunk_size, args.tick_rate)
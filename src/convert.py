@@ -1,23 +1,55 @@
-from typing import Tuple, Union
+from typing import Tuple, Union, Optional, Dict, Sequence, List
 
-from values import *
 import numpy as np
 from PIL import Image
-from tkinter import filedialog, Tk
 
+# Image file path or (height, width, 3) RGB array
+Source = Union[str, np.ndarray]
 
-def convert_img(width: int, height: int) -> Union[Tuple[np.ndarray, int, int], None]:
+
+def ask_image() -> Optional[str]:
+    """Pick an image in a Tk file dialog, None if cancelled"""
+    from tkinter import filedialog, Tk
     Tk().withdraw()
-    filename = filedialog.askopenfilename()
-    if not filename:
-        return
-    img = Image.open(filename, mode="r")
-    img.thumbnail((width//SCALE, height//SCALE))
-    img.convert("RGB")
-
-    offset_y, offset_x = img.size
-    offset_y = ((height//SCALE)-offset_y)//2
-    offset_x = ((width//SCALE)-offset_x)//2
-    img = np.asarray(img, dtype=np.uint32)
-
-    return img, offset_y, offset_x
+    return filedialog.askopenfilename() or None
+
+
+def load_img(source: Source, height: int, width: int) -> Tuple[np.ndarray, int, int]:
+    """
+    Scale an image down to fit height x width cells, keeping its aspect ratio
+    :returns: (height, width, 3) uint8 RGB array and the offsets centering it on the board
+    """
+    if isinstance(source, str):
+        img = Image.open(source, mode="r")
+    else:
+        img = Image.fromarray(np.ascontiguousarray(source, dtype=np.uint8))
+    img = img.convert("RGB")
+    img.thumbnail((width, height))
+
+    rgb = np.asarray(img, dtype=np.uint8)
+    offset_y = (height - rgb.shape[0]) // 2
+    offset_x = (width - rgb.shape[1]) // 2
+    return rgb, offset_y, offset_x
+
+
+def palette(colors: Dict[str, Sequence[int]]) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    """
+    :param colors: particle name to its 24 bit colors, like src.particle.COLORS
+    :returns: name of every palette entry, their (N, 3) RGB and their 24 bit colors
+    """
+    names = [name for name, shades in colors.items() for _ in shades]
+    packed = np.array([color for shades in colors.values() for color in shades], dtype=np.uint32)
+    rgb = np.stack([packed >> 16 & 0xFF, packed >> 8 & 0xFF, packed & 0xFF], axis=-1).astype(np.int32)
+    return names, rgb, packed
+
+
+def nearest_palette(rgb: np.ndarray, colors: Dict[str, Sequence[int]]) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    """
+    Closest palette color of every pixel by squared RGB distance
+    :param rgb: (..., 3) RGB array
+    :returns: palette names, index into them of every pixel and the matched 24 bit colors
+    """
+    names, palette_rgb, packed = palette(colors)
+    distance = ((rgb[..., None, :].astype(np.int32) - palette_rgb) ** 2).sum(axis=-1)
+    index = distance.argmin(axis=-1)
+    return names, index, packed[index]
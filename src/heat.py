@@ -0,0 +1,125 @@
+"""
+Temperature of every cell, kept apart from the particles.
+
+Each tick the field is blurred over 3x3 cells and cooled, only over the rows of chunks updated this tick;
+Simulation keeps cells hotter than IGNITION_TEMPERATURE awake until they cool down.
+Fire holds its cells at FIRE_TEMPERATURE, water takes all heat from the cells around it,
+fire in a cold cell goes out and anything hotter than IGNITION_TEMPERATURE catches fire
+one roll against its flammable value at a time, all as array tests over the region.
+"""
+from typing import List, Tuple
+
+import numpy as np
+
+from src.rng import stream as rng
+from src.particle import ParticleType, Fire, Smoke
+from src.board import VIEWS
+
+FIRE_TEMPERATURE = 100.0
+IGNITION_TEMPERATURE = 10.0
+EXTINGUISH_TEMPERATURE = 1.0
+# Kept per tick on top of the blur
+DECAY = 0.98
+# Chance a burning cell puffs smoke into a random neighbour per tick
+SMOKE_CHANCE = 8 / 52
+
+EMPTY = ParticleType.Particle.value
+FIRE = ParticleType.Fire.value
+WATER = ParticleType.Water.value
+SMOKE = ParticleType.Smoke.value
+
+# flammable of every kind by ParticleType value, a material constant, so ignition never visits the particles
+FLAMMABLE = np.zeros(max(VIEWS) + 1, dtype=np.float64)
+for _kind, _view in VIEWS.items():
+    FLAMMABLE[_kind] = _view.flammable
+
+NEIGHBOURS = np.array([(y, x) for y in range(-1, 2) for x in range(-1, 2) if y or x])
+
+# (top, left, bottom, right), bottom and right exclusive
+Region = Tuple[int, int, int, int]
+
+
+def box_sum(padded: np.ndarray) -> np.ndarray:
+    """Sum of every 3x3 window of padded, two cells smaller on each axis"""
+    rows = padded[:-2] + padded[1:-1] + padded[2:]
+    return rows[:, :-2] + rows[:, 1:-1] + rows[:, 2:]
+
+
+def padded(array: np.ndarray, region: Region, fill: float = 0) -> np.ndarray:
+    """region of array with one cell around it, fill outside the array"""
+    top, left, bottom, right = region
+    height, width = array.shape
+    out = np.full((bottom - top + 2, right - left + 2), fill, dtype=array.dtype)
+    out[max(top - 1, 0) - top + 1:min(bottom + 1, height) - top + 1,
+        max(left - 1, 0) - left + 1:min(right + 1, width) - left + 1] = \
+        array[max(top - 1, 0):min(bottom + 1, height), max(left - 1, 0):min(right + 1, width)]
+    return out
+
+
+class HeatField:
+    def __init__(self, height: int, width: int, temperature=None) -> None:
+        """
+        :param temperature: (height, width) float32 array to keep the field in, like PagedBoard.temperature
+        """
+        self.temperature = np.zeros((height, width), dtype=np.float32) if temperature is None else temperature
+        # Cells lit, put out or smoked during the last update
+        self.changed: List[Tuple[int, int]] = []
+
+    def update(self, board, regions: List[Region]) -> None:
+        """
+        Exchange heat in regions and apply what it does to the board
+        :param board: tools.Board or CompactBoard, both keep a type array
+        """
+        self.changed = []
+        temperature = self.temperature
+        # Fire heats its cell before anything spreads, so fresh fire doesn't start out cold
+        for top, left, bottom, right in regions:
+            heated = temperature[top:bottom, left:right]
+            heated[board.type[top:bottom, left:right] == FIRE] = FIRE_TEMPERATURE
+            # A view already wrote it, a paged temperature handed out a copy
+            temperature[top:bottom, left:right] = heated
+        # Every region is blurred from the same field, regions share a row of cells at most
+        blurred = [box_sum(padded(temperature, region)) * (DECAY / 9) for region in regions]
+        for region, heat in zip(regions, blurred):
+            top, left, bottom, right = region
+            types = board.type[top:bottom, left:right]
+
+            # Water takes all heat from the cells around it
+            heat[box_sum(padded(board.type, region) == WATER)] = 0.0
+            fire = types == FIRE
+            cold = fire & (heat < EXTINGUISH_TEMPERATURE)
+            self.extinguish(board, np.argwhere(cold) + (top, left))
+            burning = fire & ~cold
+            heat[burning] = FIRE_TEMPERATURE
+
+            # Hot enough for anything but what is already burning, flammable decides
+            hot = np.argwhere((heat > IGNITION_TEMPERATURE) & (types != EMPTY) & (types != FIRE) & (types != SMOKE))
+            if len(hot):
+                lit = hot[rng.generator.random(len(hot)) * 100.0 > FLAMMABLE[types[hot[:, 0], hot[:, 1]]]]
+                self.ignite(board, lit + (top, left))
+                heat[lit[:, 0], lit[:, 1]] = FIRE_TEMPERATURE
+
+            self.smoke(board, np.argwhere(burning) + (top, left))
+            temperature[top:bottom, left:right] = heat
+
+    def extinguish(self, board, cells: np.ndarray) -> None:
+        for y, x in cells.tolist():
+            board[y, x] = None
+            self.changed.append((y, x))
+
+    def ignite(self, board, cells: np.ndarray) -> None:
+        for y, x in cells.tolist():
+            board[y, x] = Fire(y, x, True)
+            self.changed.append((y, x))
+
+    def smoke(self, board, fires: np.ndarray) -> None:
+        """Every fire puffs smoke into a random empty neighbour with SMOKE_CHANCE"""
+        fires = fires[rng.generator.random(len(fires)) < SMOKE_CHANCE]
+        if not len(fires):
+            return
+        targets = fires + NEIGHBOURS[rng.generator.integers(0, len(NEIGHBOURS), len(fires))]
+        height, width = board.type.shape
+        targets = targets[(targets[:, 0] >= 0) & (targets[:, 0] < height) & (targets[:, 1] >= 0) & (targets[:, 1] < width)]
+        for y, x in targets[board.type[targets[:, 0], targets[:, 1]] == EMPTY].tolist():
+            board[y, x] = Smoke(y, x, False)
+            self.changed.append((y, x))
@@ -0,0 +1,340 @@
+"""
+CompactBoard whose cells live in square pages, so a huge mostly sleeping world fits a small memory budget.
+
+    board_type = functools.partial(PagedBoard, page_size=chunk_size, max_bytes=64 << 20)
+    Simulation(20000, 20000, chunk_size, board_type=board_type)
+
+Pages are paged in from a memory mapped backing file the first time a cell of theirs is read or written:
+a woken chunk clears its update flags, a particle moves in from a neighbour or the brush paints over it.
+Once a tick (PagedBoard.evict, from Simulation.reset_chunks) pages nobody touched for sleep_ticks ticks
+are written back and dropped, least recently used first, until the resident ones fit max_bytes.
+Pages never written are zeros in a sparse file, empty cells that take no memory and no disk.
+"""
+from typing import Dict, List, Optional, Tuple, Any, IO
+from operator import index
+from time import perf_counter
+import tempfile
+
+import numpy as np
+
+from values import *
+from src.board import CompactBoard
+from src.profiler import RingBuffer
+
+# (page row, page column)
+PageKey = Tuple[int, int]
+
+
+class PagedArray:
+    """
+    One field of a PagedBoard looking like a (height, width, ...) array.
+    Cell indexing returns the value (a view for vel, writes go to the page), slices and index arrays
+    return copies and assigning to them writes the pages. np.asarray reads the whole field without paging in.
+    """
+
+    def __init__(self, board: 'PagedBoard', slot: int, dtype: np.dtype, extra: Tuple[int, ...]) -> None:
+        self.board = board
+        self.slot = slot
+        self.dtype = dtype
+        self.shape = board.shape + extra
+        self.ndim = len(self.shape)
+
+    def __getitem__(self, key):
+        y, x = key
+        if type(y) is int and type(x) is int:
+            board = self.board
+            size = board.page_size
+            page_key = y // size, x // size
+            page = board.resident.get(page_key)
+            if page is None:
+                page = board.page_in(page_key)
+            else:
+                board.hits += 1
+            board.used[page_key] = board.clock
+            return page[self.slot][y % size, x % size]
+        return self.read(y, x)
+
+    def __setitem__(self, key, value) -> None:
+        y, x = key
+        if type(y) is int and type(x) is int:
+            board = self.board
+            size = board.page_size
+            page_key = y // size, x // size
+            page = board.resident.get(page_key)
+            if page is None:
+                page = board.page_in(page_key)
+            else:
+                board.hits += 1
+            board.used[page_key] = board.clock
+            page[self.slot][y % size, x % size] = value
+            return
+        self.write(y, x, value)
+
+    def read(self, y, x) -> np.ndarray:
+        if isinstance(y, np.ndarray) or isinstance(x, np.ndarray):
+            ys, xs = np.broadcast_arrays(y, x)
+            out = np.empty((ys.size,) + self.shape[2:], dtype=self.dtype)
+            for page, cells, page_ys, page_xs in self.board.cells_in(ys.ravel(), xs.ravel()):
+                out[cells] = page[self.slot][page_ys, page_xs]
+            return out.reshape(ys.shape + self.shape[2:])
+        (top, bottom, y_step), (left, right, x_step), squeeze = self.bounds(y, x)
+        out = np.empty((bottom - top, right - left) + self.shape[2:], dtype=self.dtype)
+        for page, cells, region in self.board.pages_in(top, left, bottom, right):
+            out[region] = page[self.slot][cells]
+        return out[::y_step, ::x_step][squeeze]
+
+    def write(self, y, x, value) -> None:
+        if isinstance(y, np.ndarray) or isinstance(x, np.ndarray):
+            ys, xs = np.broadcast_arrays(y, x)
+            values = np.broadcast_to(value, ys.shape + self.shape[2:]).reshape((-1,) + self.shape[2:])
+            for page, cells, page_ys, page_xs in self.board.cells_in(ys.ravel(), xs.ravel()):
+                page[self.slot][page_ys, page_xs] = values[cells]
+            return
+        (top, bottom, y_step), (left, right, x_step), squeeze = self.bounds(y, x)
+        if y_step == 1 and x_step == 1:
+            values = np.empty((bottom - top, right - left) + self.shape[2:], dtype=self.dtype)
+        else:
+            # Cells between the strided ones keep what they hold
+            values = self.read(slice(top, bottom), slice(left, right))
+        values[::y_step, ::x_step][squeeze] = value
+        for page, cells, region in self.board.pages_in(top, left, bottom, right):
+            page[self.slot][cells] = values[region]
+
+    def bounds(self, y, x) -> Tuple[Tuple[int, int, int], Tuple[int, int, int], tuple]:
+        """
+        (start, stop, step) of both axes with stop exclusive and the slice of the read rectangle's result
+        that drops integer axes, steps have to be positive
+        """
+        axes, squeeze = [], []
+        for key, length in ((y, self.shape[0]), (x, self.shape[1])):
+            if isinstance(key, slice):
+                start, stop, step = key.indices(length)
+                if step <= 0:
+                    raise IndexError("paged arrays only take positive slice steps")
+                axes.append((start, max(stop, start), step))
+                squeeze.append(slice(None))
+            else:
+                position = index(key)
+                if not -length <= position < length:
+                    raise IndexError(f"index {position} is out of bounds for an axis of size {length}")
+                position %= length
+                axes.append((position, position + 1, 1))
+                squeeze.append(0)
+        return axes[0], axes[1], tuple(squeeze)
+
+    def copy(self) -> np.ndarray:
+        return np.asarray(self)
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        """The whole field, evicted pages are read from the backing file without paging them in"""
+        board = self.board
+        size = board.page_size
+        height, width = board.shape
+        out = np.empty(self.shape, dtype=self.dtype)
+        for row in range(board.page_rows):
+            for column in range(board.page_columns):
+                top, left = row * size, column * size
+                bottom, right = min(top + size, height), min(left + size, width)
+                page = board.resident.get((row, column))
+                tile = page[self.slot] if page is not None else board.store[self.slot][row, column]
+                out[top:bottom, left:right] = tile[:bottom - top, :right - left]
+        return out if dtype is None else out.astype(dtype)
+
+
+class PagedBoard(CompactBoard):
+    """
+    CompactBoard split into page_size x page_size pages, only recently used ones held in memory.
+    The Simulation's heat field keeps its temperature here too, so it pages with the cells.
+    """
+    # Every field of a page, in the order of a page's arrays and of the backing file
+    PAGED_FIELDS: Tuple[Tuple[str, Any, Tuple[int, ...]], ...] = (
+        ('type', np.uint8, ()),
+        ('color', np.uint8, ()),
+        ('vel', np.float32, (2,)),
+        ('flags', np.uint8, ()),
+        ('lifetime', np.float32, ()),
+        ('heat', np.float32, ()),
+        ('temperature', np.float32, ()),
+    )
+
+    def __init__(self, y: int, x: int, page_size: int = CHUNK_SIZE, max_bytes: int = 64 << 20,
+                 sleep_ticks: int = 60, path: Optional[str] = None, latency_samples: int = 1024) -> None:
+        """
+        :param page_size: cells per page side, a multiple of the Simulation's chunk size so pages sleep with chunks
+        :param max_bytes: memory the resident pages may take, pages touched within sleep_ticks stay regardless
+        :param sleep_ticks: ticks a page has to go untouched before it may be evicted
+        :param path: backing file, created or truncated, an anonymous temporary file when None
+        :param latency_samples: page in times kept for stats()
+        """
+        if page_size <= 0 or max_bytes < 0 or sleep_ticks < 0:
+            raise ValueError(f"page size {page_size}, max bytes {max_bytes} and sleep ticks {sleep_ticks} "
+                             f"can't be negative")
+        self.shape = (y, x)
+        self.page_size = page_size
+        self.page_rows = (y - 1) // page_size + 1
+        self.page_columns = (x - 1) // page_size + 1
+        self.sleep_ticks = sleep_ticks
+
+        dtypes = [(np.dtype(dtype), extra) for _, dtype, extra in self.PAGED_FIELDS]
+        self.page_bytes = sum(dtype.itemsize * page_size ** 2 * int(np.prod(extra, dtype=np.int64))
+                              for dtype, extra in dtypes)
+        self.max_pages = max_bytes // self.page_bytes
+
+        # Backing file: every field as (page row, page column, page_size, page_size, ...), one after the other
+        self.file: IO[bytes] = tempfile.TemporaryFile() if path is None else open(path, "w+b")
+        self.file.truncate(self.page_rows * self.page_columns * self.page_bytes)
+        self.store: List[np.memmap] = []
+        offset = 0
+        for dtype, extra in dtypes:
+            shape = (self.page_rows, self.page_columns, page_size, page_size) + extra
+            self.store.append(np.memmap(self.file, dtype=dtype, mode="r+", offset=offset, shape=shape))
+            offset += dtype.itemsize * int(np.prod(shape, dtype=np.int64))
+
+        # Pages in memory, their arrays in PAGED_FIELDS order, and the clock of their last use
+        self.resident: Dict[PageKey, List[np.ndarray]] = {}
+        self.used: Dict[PageKey, int] = {}
+        # evict() calls so far, a tick each
+        self.clock = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.page_in_ms = RingBuffer(latency_samples)
+
+        for slot, (name, _, _) in enumerate(self.PAGED_FIELDS):
+            setattr(self, name, PagedArray(self, slot, *dtypes[slot]))
+
+    @property
+    def nbytes(self) -> int:
+        return self.resident_pages() * self.page_bytes
+
+    def resident_pages(self) -> int:
+        return len(self.resident)
+
+    def page_in(self, key: PageKey) -> List[np.ndarray]:
+        """Copy an evicted page from the backing file into memory"""
+        start = perf_counter()
+        row, column = key
+        page = self.resident[key] = [np.array(store[row, column]) for store in self.store]
+        self.misses += 1
+        self.page_in_ms.append(1000 * (perf_counter() - start))
+        return page
+
+    def page_out(self, key: PageKey) -> None:
+        """Write a resident page back to the backing file and drop it"""
+        row, column = key
+        for store, array in zip(self.store, self.resident.pop(key)):
+            store[row, column] = array
+        del self.used[key]
+        self.evictions += 1
+
+    def pages_in(self, top: int, left: int, bottom: int, right: int):
+        """
+        Pages overlapping [top, bottom) x [left, right), paged in
+        :returns: (page arrays, cells of the page, the same cells relative to top, left) for each
+        """
+        size = self.page_size
+        clock = self.clock
+        for row in range(top // size, (bottom - 1) // size + 1 if bottom > top else top // size):
+            y0, y1 = max(top, row * size), min(bottom, (row + 1) * size)
+            for column in range(left // size, (right - 1) // size + 1 if right > left else left // size):
+                x0, x1 = max(left, column * size), min(right, (column + 1) * size)
+                key = row, column
+                page = self.resident.get(key)
+                if page is None:
+                    page = self.page_in(key)
+                else:
+                    self.hits += 1
+                self.used[key] = clock
+                yield (page,
+                       (slice(y0 - row * size, y1 - row * size), slice(x0 - column * size, x1 - column * size)),
+                       (slice(y0 - top, y1 - top), slice(x0 - left, x1 - left)))
+
+    def cells_in(self, ys: np.ndarray, xs: np.ndarray):
+        """
+        Pages holding the cells (ys[i], xs[i]), paged in, each once however many of its cells are asked for
+        :returns: (page arrays, positions into ys of its cells in their order, their y and x in the page) for each
+        """
+        height, width = self.shape
+        ys = np.where(ys < 0, ys + height, ys)
+        xs = np.where(xs < 0, xs + width, xs)
+        if ys.size and (ys.min() < 0 or ys.max() >= height or xs.min() < 0 or xs.max() >= width):
+            raise IndexError(f"cell index out of bounds for a {height}x{width} board")
+        size = self.page_size
+        keys = ys // size * self.page_columns + xs // size
+        # Stable, so cells of a page keep their order and the last of repeated writes wins like in NumPy
+        order = np.argsort(keys, kind="stable")
+        starts = np.flatnonzero(np.diff(keys[order], prepend=-1))
+        clock = self.clock
+        for start, end in zip(starts.tolist(), np.append(starts[1:], len(order)).tolist()):
+            cells = order[start:end]
+            key = divmod(int(keys[cells[0]]), self.page_columns)
+            page = self.resident.get(key)
+            if page is None:
+                page = self.page_in(key)
+            else:
+                self.hits += 1
+            self.used[key] = clock
+            yield page, cells, ys[cells] % size, xs[cells] % size
+
+    def evict(self) -> int:
+        """
+        Advance the clock a tick and write back pages idle for sleep_ticks, least recently used first,
+        until the resident ones fit max_bytes
+        :returns: pages evicted
+        """
+        self.clock += 1
+        over = len(self.resident) - self.max_pages
+        if over <= 0:
+            return 0
+        used = self.used
+        idle = [key for key in self.resident if self.clock - used[key] > self.sleep_ticks]
+        idle.sort(key=used.__getitem__)
+        for key in idle[:over]:
+            self.page_out(key)
+        if idle:
+            for store in self.store:
+                store.flush()
+        return min(len(idle), over)
+
+    def adopt(self, state: Dict[str, np.ndarray]) -> None:
+        """Write the FIELDS arrays of state to the backing file, every page starts evicted"""
+        for key in list(self.resident):
+            self.page_out(key)
+        size = self.page_size
+        height, width = self.shape
+        for slot, (name, _, _) in enumerate(self.PAGED_FIELDS):
+            if name not in self.FIELDS:
+                continue
+            array, store = state[name], self.store[slot]
+            for row in range(self.page_rows):
+                for column in range(self.page_columns):
+                    top, left = row * size, column * size
+                    bottom, right = min(top + size, height), min(left + size, width)
+                    store[row, column, :bottom - top, :right - left] = array[top:bottom, left:right]
+        for store in self.store:
+            store.flush()
+
+    def stats(self) -> Dict[str, float]:
+        """Page hits, misses (page ins), hit rate, evictions, resident pages and bytes and page in ms"""
+        latency = self.page_in_ms.values()
+        lookups = self.hits + self.misses
+        p50, p95 = np.percentile(latency, (50, 95)) if latency.size else (0.0, 0.0)
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "resident_pages": self.resident_pages(),
+            "resident_bytes": self.nbytes,
+            "page_in_p50_ms": float(p50),
+            "page_in_p95_ms": float(p95),
+            "page_in_max_ms": float(latency.max()) if latency.size else 0.0,
+        }
+
+    def close(self) -> None:
+        """Drop the backing file, the board is unusable afterwards"""
+        self.resident.clear()
+        self.used.clear()
+        self.store.clear()
+        self.file.close()
@@ -1,11 +1,12 @@
-from typing import Set, Optional
+from typing import Set, Optional, Dict, List
 from enum import Enum, auto
-import random
 import math
 
 import glm
+import numpy as np
 
 import src.tools as tools
+from src.rng import stream as rng
 from values import *
 
 
@@ -28,13 +29,22 @@ class ParticleType(Enum):
 class Particle:
     priority: Set[ParticleType] = set()
     state: StateOfAggregation = None
+    # ParticleType value, boards keep it per cell
+    kind: int = ParticleType.Particle.value
+
+    def __init_subclass__(cls, **kwargs) -> None:
+        super().__init_subclass__(**kwargs)
+        cls.kind = getattr(ParticleType, cls.__name__).value
 
     def __init__(self, y: int, x: int, is_falling: bool = True, been_updated: bool = False) -> None:
         self.been_updated: bool = been_updated
         self.is_falling: bool = is_falling
 
+        # Index into PALETTE
         self.color: int = 0
-        self.pos: glm.ivec2 = glm.ivec2(x, y)
+        # Plain ints, steps compare and move them without building vectors
+        self.y: int = y
+        self.x: int = x
         self.vel: glm.vec2 = glm.vec2()
 
         self.lifetime: float = 0.0
@@ -47,6 +57,15 @@ class Particle:
         self.dispersion: int = 0
         self.mass: float = 0.0
 
+    @property
+    def pos(self) -> glm.ivec2:
+        return glm.ivec2(self.x, self.y)
+
+    @pos.setter
+    def pos(self, value: glm.ivec2) -> None:
+        self.y = value.y
+        self.x = value.x
+
     def _step(self, board: tools.Board) -> bool:
         pass
 
@@ -62,17 +81,17 @@ class Particle:
     def reset(self) -> None:
         self.been_updated = False
 
-    def push_neighbours(self, board: tools.Board, from_location: glm.ivec2) -> None:
-        if board.in_bounds(from_location.y, from_location.x - 1):
-            left = board[from_location.y, from_location.x - 1]
+    def push_neighbours(self, board: tools.Board, y: int, x: int) -> None:
+        if board.in_bounds(y, x - 1):
+            left = board[y, x - 1]
             if left is not None and self.id() == left.id():
-                if random.random() > left.inertial_resistance:
+                if rng.random() > left.inertial_resistance:
                     left.is_falling = True
 
-        if board.in_bounds(from_location.y, from_location.x + 1):
-            right = board[from_location.y, from_location.x + 1]
+        if board.in_bounds(y, x + 1):
+            right = board[y, x + 1]
             if right is not None and self.id() == right.id():
-                if random.random() > right.inertial_resistance:
+                if rng.random() > right.inertial_resistance:
                     right.is_falling = True
 
     @classmethod
@@ -91,10 +110,10 @@ class Particle:
     def __eq__(self, other):
         if other is None:
             return False
-        return self.pos == other.pos
+        return self.y == other.y and self.x == other.x
 
     def __repr__(self):
-        return f"{self.__class__,}(y={self.pos.y}, x={self.pos.x})"
+        return f"{self.__class__,}(y={self.y}, x={self.x})"
 
     @staticmethod
     def _round_shift(v: float) -> float:
@@ -104,6 +123,21 @@ class Particle:
             return math.ceil(v)
         return 0
 
+    @staticmethod
+    def _round(v: float) -> int:
+        """Half away from zero like glm.round"""
+        return int(v + 0.5) if v >= 0.0 else -int(0.5 - v)
+
+    @staticmethod
+    def _shift(v: float, length: float) -> int:
+        """
+        Step along one axis of a vector like the components of glm.normalize rounded with a 0.1 dead zone
+        :param length: length of the whole vector
+        """
+        if -0.1 * length < v < 0.1 * length:
+            return 0
+        return -1 if v < 0.0 else 1
+
 
 class Sand(Particle):
     priority = {ParticleType.Wood}
@@ -111,7 +145,7 @@ class Sand(Particle):
 
     def __init__(self, y: int, x: int) -> None:
         super(Sand, self).__init__(y, x)
-        self.color = random.choice(COLORS["Sand"])
+        self.color = rng.choice(SHADES["Sand"])
 
         self.vel = glm.vec2(0., 0.)
 
@@ -121,86 +155,76 @@ class Sand(Particle):
         self.mass = 54.0
 
     def _step(self, board: tools.Board) -> bool:
-        move = glm.ivec2(self.pos)
+        y, x = self.y, self.x
+        move_y, move_x = y, x
+        vel = self.vel
 
-        self.vel.y += GRAVITY
+        vel.y += GRAVITY
         if self.is_falling:
-            self.vel.x *= AIR_FRICTION
+            vel.x *= AIR_FRICTION
 
-        target_position = self.pos + glm.ivec2(glm.round(self.vel))
-        direction = tools.interpolate_pos_dda(self.pos, target_position)
-        next(direction)  # skipping current position
-
-        for pos in direction:
-            if not board.in_bounds(pos.y, pos.x):
-                self.vel = glm.vec2()
+        target_y, target_x = y + self._round(vel.y), x + self._round(vel.x)
+        for dy, dx in tools.steps(target_y - y, target_x - x):
+            if not board.in_bounds(y + dy, x + dx):
+                vel.x = vel.y = 0.0
                 break
 
-            neighbor = board[pos.y, pos.x]
+            neighbor = board[y + dy, x + dx]
             if self.is_valid(neighbor):
-                move = pos
-                self.push_neighbours(board, move)
+                move_y, move_x = y + dy, x + dx
+                self.push_neighbours(board, move_y, move_x)
             else:
                 if self.is_falling:
-                    vel_on_hit = max(self.vel.y * self.bounciness, 3.0)
-                    if self.vel.x:
-                        self.vel.x = vel_on_hit if self.vel.x > 0.0 else -vel_on_hit
+                    vel_on_hit = max(vel.y * self.bounciness, 3.0)
+                    if vel.x:
+                        vel.x = vel_on_hit if vel.x > 0.0 else -vel_on_hit
                     else:
-                        d = -1.0 if random.randint(0, 1) else 1.0
-                        self.vel.x = vel_on_hit * d
+                        d = -1.0 if rng.random() < 0.5 else 1.0
+                        vel.x = vel_on_hit * d
 
-                additional_pos = glm.normalize(self.vel)
+                length = math.hypot(vel.x, vel.y)
+                shift_y, shift_x = self._shift(vel.y, length), self._shift(vel.x, length)
 
-                self.vel.x *= self.friction * neighbor.friction
-                avg_vel = (self.vel.y + neighbor.vel.y) / 2
+                vel.x *= self.friction * neighbor.friction
+                avg_vel = (vel.y + neighbor.vel.y) / 2
                 if avg_vel < GRAVITY:
-                    self.vel.y = GRAVITY
+                    vel.y = GRAVITY
                 else:
-                    self.vel.y = avg_vel
-
-                neighbor.vel.y = self.vel.y
+                    vel.y = avg_vel
 
-                if -0.1 < additional_pos.y < 0.1:
-                    additional_pos.y = 0
-                else:
-                    additional_pos.y = -1 if additional_pos.y < 0 else 1
-                if -0.1 < additional_pos.x < 0.1:
-                    additional_pos.x = 0
-                else:
-                    additional_pos.x = -1 if additional_pos.x < 0 else 1
-                additional_pos = glm.ivec2(glm.round(additional_pos))
+                neighbor.vel.y = vel.y
 
-                diagonal_neighbor_pos = move + additional_pos
-                if board.in_bounds(diagonal_neighbor_pos.y, diagonal_neighbor_pos.x):
-                    diagonal_neighbor = board[diagonal_neighbor_pos.y, diagonal_neighbor_pos.x]
+                diagonal_y, diagonal_x = move_y + shift_y, move_x + shift_x
+                if board.in_bounds(diagonal_y, diagonal_x):
+                    diagonal_neighbor = board[diagonal_y, diagonal_x]
                     if self.is_valid(diagonal_neighbor):
                         # self.is_falling = True
-                        move = diagonal_neighbor_pos
+                        move_y, move_x = diagonal_y, diagonal_x
                         break
 
-                next_neighbor_pos = move + glm.ivec2(additional_pos.x, 0)
-                if next_neighbor_pos != diagonal_neighbor_pos:
-                    if board.in_bounds(next_neighbor_pos.y, next_neighbor_pos.x):
-                        next_neighbor = board[next_neighbor_pos.y, next_neighbor_pos.x]
+                next_x = move_x + shift_x
+                if shift_y:  # otherwise the next neighbour is the diagonal one
+                    if board.in_bounds(move_y, next_x):
+                        next_neighbor = board[move_y, next_x]
                         if self.is_valid(next_neighbor):
                             self.is_falling = False
-                            move = next_neighbor_pos
+                            move_x = next_x
                             break
                         else:
-                            self.vel.x *= -1
+                            vel.x *= -1
 
                 self.is_falling = False
                 break
         else:
-            neighbor = board[target_position.y, target_position.x]
+            neighbor = board[target_y, target_x]
             if self.is_valid(neighbor):
                 self.is_falling = True
 
-        if move == self.pos:
+        if move_y == y and move_x == x:
             self.is_falling = False
             return False
 
-        board.swap(self, move.y, move.x)
+        board.swap(self, move_y, move_x)
         return True
 
 
@@ -210,7 +234,7 @@ class Water(Particle):
 
     def __init__(self, y: int, x: int) -> None:
         super(Water, self).__init__(y, x)
-        self.color = random.choice(COLORS["Water"])
+        self.color = rng.choice(SHADES["Water"])
 
         self.vel = glm.vec2()
 
@@ -221,25 +245,25 @@ class Water(Particle):
         self.mass = 30.0
 
     def _step(self, board: tools.Board) -> bool:
-        move = glm.ivec2(self.pos)
+        y, x = self.y, self.x
+        move_y, move_x = y, x
+        vel = self.vel
 
-        self.vel.y += GRAVITY
+        vel.y += GRAVITY
         if self.is_falling:
-            self.vel.x *= AIR_FRICTION
+            vel.x *= AIR_FRICTION
 
-        target_position = self.pos + glm.ivec2(glm.round(self.vel))
-        direction = tools.interpolate_pos_dda(self.pos, target_position)
-        next(direction)  # skipping current position
-
-        for pos in direction:
-            if not board.in_bounds(pos.y, pos.x):
-                self.vel *= glm.vec2(-0.5, 0)
+        target_y, target_x = y + self._round(vel.y), x + self._round(vel.x)
+        for dy, dx in tools.steps(target_y - y, target_x - x):
+            if not board.in_bounds(y + dy, x + dx):
+                vel.x *= -0.5
+                vel.y = 0.0
                 break
 
-            neighbor = board[pos.y, pos.x]
+            neighbor = board[y + dy, x + dx]
             if self.is_valid(neighbor):
-                move = pos
-                self.push_neighbours(board, move)
+                move_y, move_x = y + dy, x + dx
+                self.push_neighbours(board, move_y, move_x)
             else:
                 # if neighbor.state == StateOfAggregation.Liquid:
                 #     if self.density > neighbor.density:
@@ -251,38 +275,28 @@ class Water(Particle):
                 #         continue
 
                 if self.is_falling:
-                    vel_on_hit = max(self.vel.y * self.bounciness, 4.0)
-                    if self.vel.x:
-                        self.vel.x = vel_on_hit if self.vel.x > 0.0 else -vel_on_hit
+                    vel_on_hit = max(vel.y * self.bounciness, 4.0)
+                    if vel.x:
+                        vel.x = vel_on_hit if vel.x > 0.0 else -vel_on_hit
                     else:
-                        d = -1.0 if random.randint(0, 1) else 1.0
-                        self.vel.x = vel_on_hit * d
+                        d = -1.0 if rng.random() < 0.5 else 1.0
+                        vel.x = vel_on_hit * d
 
-                additional_pos = glm.normalize(self.vel)
+                length = math.hypot(vel.x, vel.y)
+                shift_y, shift_x = self._shift(vel.y, length), self._shift(vel.x, length)
 
-                self.vel.x *= self.friction * neighbor.friction
-                self.vel.y = 0.0
-
-                if -0.1 < additional_pos.y < 0.1:
-                    additional_pos.y = 0
-                else:
-                    additional_pos.y = -1 if additional_pos.y < 0 else 1
-                if -0.1 < additional_pos.x < 0.1:
-                    additional_pos.x = 0
-                else:
-                    additional_pos.x = -1 if additional_pos.x < 0 else 1
-                additional_pos = glm.ivec2(glm.round(additional_pos))
+                vel.x *= self.friction * neighbor.friction
+                vel.y = 0.0
 
                 go_out = False
-                diagonal_neighbor_pos = move + additional_pos
-                new_target = glm.ivec2(diagonal_neighbor_pos)
-                new_target.x += additional_pos.x * self.dispersion
-                for new_pos in tools.interpolate_pos_dda(diagonal_neighbor_pos, new_target):
-                    if board.in_bounds(new_pos.y, new_pos.x):
-                        diagonal_neighbor = board[new_pos.y, new_pos.x]
+                diagonal_y, diagonal_x = move_y + shift_y, move_x + shift_x
+                spread = tools.ray(0, shift_x * self.dispersion)
+                for dy, dx in spread:
+                    if board.in_bounds(diagonal_y + dy, diagonal_x + dx):
+                        diagonal_neighbor = board[diagonal_y + dy, diagonal_x + dx]
                         if self.is_valid(diagonal_neighbor):
                             self.is_falling = True
-                            move = new_pos
+                            move_y, move_x = diagonal_y + dy, diagonal_x + dx
                         else:
                             break
                     else:
@@ -294,18 +308,16 @@ class Water(Particle):
                 if go_out:
                     break
 
-                next_neighbor_pos = move + glm.ivec2(additional_pos.x, 0)
-                new_target = glm.ivec2(next_neighbor_pos)
-                new_target.x += additional_pos.x * self.dispersion
-                if next_neighbor_pos != diagonal_neighbor_pos:
-                    for new_pos in tools.interpolate_pos_dda(next_neighbor_pos, new_target):
-                        if board.in_bounds(new_pos.y, new_pos.x):
-                            next_neighbor = board[new_pos.y, new_pos.x]
+                next_y, next_x = move_y, move_x + shift_x
+                if next_y != diagonal_y or next_x != diagonal_x:
+                    for dy, dx in spread:
+                        if board.in_bounds(next_y + dy, next_x + dx):
+                            next_neighbor = board[next_y + dy, next_x + dx]
                             if self.is_valid(next_neighbor):
                                 self.is_falling = False
-                                move = new_pos
+                                move_y, move_x = next_y + dy, next_x + dx
                             else:
-                                self.vel.x *= -1
+                                vel.x *= -1
                                 break
                         else:
                             break
@@ -315,15 +327,15 @@ class Water(Particle):
                 self.is_falling = False
                 break
         else:
-            neighbor = board[target_position.y, target_position.x]
+            neighbor = board[target_y, target_x]
             if self.is_valid(neighbor):
                 self.is_falling = True
 
-        if move == self.pos:
+        if move_y == y and move_x == x:
             self.is_falling = False
             return False
 
-        board.swap(self, move.y, move.x)
+        board.swap(self, move_y, move_x)
         return True
 
 
@@ -332,7 +344,7 @@ class Wood(Particle):
 
     def __init__(self, y: int, x: int) -> None:
         super(Wood, self).__init__(y, x)
-        self.color = random.choice(COLORS["Wood"])
+        self.color = rng.choice(SHADES["Wood"])
 
         self.flammable = 96
         self.friction = 0.5
@@ -347,88 +359,58 @@ class Fire(Particle):
 
     def __init__(self, y: int, x: int, been_updated: bool = False) -> None:
         super(Fire, self).__init__(y, x, been_updated=been_updated)
-        self.original_color = random.choice(COLORS["Fire"])
+        self.original_color = rng.choice(SHADES["Fire"])
         self.color = self.original_color
         self.heat = 100
         self.flammable = 1
 
-    def receive_heat(self, cell: Optional[Particle]) -> None:
-        if cell is None:
-            self.heat *= 0.99
-            return
-
-        if cell.id() == ParticleType.Fire:
-            self.heat = (self.heat + cell.heat)/2
-
-        elif cell.id() == ParticleType.Water:
-            self.heat = 0
-
-        if self.heat > 100:
-            self.heat = 100
-
     def on_update(self, board: tools.Board) -> bool:
+        """Burns down its heat, spreading, smoke and water are the simulation's heat field (src.heat)"""
         if self.been_updated:
             return False
         self.been_updated = True
 
-        if self.heat <= 0:
-            board[self.pos.y, self.pos.x] = None
-            return True
-
-        for i in range(-1, 2):
-            for j in range(-1, 2):
-                if i == 0 == j or not board.in_bounds(self.pos.y + i, self.pos.x + j):
-                    continue
-
-                cell = board[self.pos.y + i, self.pos.x + j]
-                self.receive_heat(cell)
-
-                # self.pos = self.pos.round()
-                if cell is None:
-                    if not random.randint(0, 51):
-                        board[self.pos.y + i, self.pos.x + j] = Smoke(self.pos.y + i, self.pos.x + j, False)
-                elif cell.id() == ParticleType.Wood:
-                    if random.randint(0, 100) > cell.flammable:
-                        board[self.pos.y + i, self.pos.x + j] = Fire(self.pos.y + i, self.pos.x + j, True)
-
-        # self.color = self.original_color - (abs(self.heat)//100)
         self.heat -= 1
+        if self.heat <= 0:
+            board[self.y, self.x] = None
         return True
 
 
 class Smoke(Particle):
     priority = {ParticleType.Sand, ParticleType.Water, ParticleType.Wood}
     state = StateOfAggregation.Gas
+    # Ticks new smoke lives, both ends included
+    lifetime_range = (10, 80)
 
     def __init__(self, y: int, x: int, been_updated: bool = False) -> None:
         super(Smoke, self).__init__(y, x, been_updated=been_updated)
-        self.color = random.choice(COLORS["Smoke"])
-        self.lifetime = random.randint(10, 80)
+        self.color = rng.choice(SHADES["Smoke"])
+        self.lifetime = rng.randint(*self.lifetime_range)
 
         self.vel = glm.ivec2(-1., 0.)
 
     def _step(self, board: tools.Board) -> bool:
         if self.lifetime < 0:
-            board[self.pos.y, self.pos.x] = None
+            board[self.y, self.x] = None
             return False
         self.lifetime -= 1
 
-        move = glm.ivec2(self.pos)
+        move_y, move_x = self.y, self.x
 
-        if board.in_bounds(move.y - 1, move.x) and board[move.y - 1, move.x] is None:
-            move.y -= 1
+        if board.in_bounds(move_y - 1, move_x) and board[move_y - 1, move_x] is None:
+            move_y -= 1
 
-        d = random.randint(-1, 1)
+        d = rng.randint(-1, 1)
         if not d:
-            board.swap(self, move.y, move.x)
+            board.swap(self, move_y, move_x)
             return True
 
-        if board.in_bounds(move.y, move.x - d) and board[move.y, move.x - d] is None:
-            move.x = move.x - d
-        elif board.in_bounds(move.y, move.x + d) and board[move.y, move.x + d] is None:
-            move.x = self.pos.x + d
+        if board.in_bounds(move_y, move_x - d) and board[move_y, move_x - d] is None:
+            move_x = move_x - d
+        elif board.in_bounds(move_y, move_x + d) and board[move_y, move_x + d] is None:
+            move_x = self.x + d
 
-        board.swap(self, move.y, move.x)
+        board.swap(self, move_y, move_x)
         return True
 
 
@@ -448,3 +430,26 @@ COLORS = {  # R G B  24bits
     "Fire": [0xFF0000, 0xFF4500, 0xE25822],
     "Smoke": [0x0A0A0A, 0x232323, 0x2C2424]
 }
+
+# Every color of COLORS once after the black of empty cells. Particles, boards and the displays keep 8 bit
+# indexes into it, so recoloring a material is a palette change
+PALETTE = np.array([0x000000] + [color for shades in COLORS.values() for color in shades], dtype=np.uint32)
+# PALETTE indexes of the COLORS of every particle
+SHADES: Dict[str, List[int]] = {}
+_start = 1
+for _name, _shades in COLORS.items():
+    SHADES[_name] = list(range(_start, _start + len(_shades)))
+    _start += len(_shades)
+
+
+def palette_index(colors) -> np.ndarray:
+    """
+    PALETTE index of every 24 bit color
+    :raises ValueError: for a color that isn't in the palette
+    """
+    colors = np.asarray(colors, dtype=np.uint32)
+    order = np.argsort(PALETTE, kind="stable")
+    index = order[np.searchsorted(PALETTE[order], colors).clip(0, len(PALETTE) - 1)]
+    if (PALETTE[index] != colors).any():
+        raise ValueError("colors outside the particle palette")
+    return index.astype(np.uint8)
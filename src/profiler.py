@@ -0,0 +1,128 @@
+from typing import Dict, Optional
+from time import perf_counter
+import json
+
+import numpy as np
+
+
+class RingBuffer:
+    """Last `capacity` samples of a metric"""
+
+    def __init__(self, capacity: int) -> None:
+        self.samples = np.zeros(capacity, dtype=np.float64)
+        self.index = 0
+        self.count = 0
+
+    def append(self, value: float) -> None:
+        self.samples[self.index] = value
+        self.index = (self.index + 1) % self.samples.size
+        self.count = min(self.count + 1, self.samples.size)
+
+    def values(self) -> np.ndarray:
+        """Samples from the oldest to the newest"""
+        if self.count < self.samples.size:
+            return self.samples[:self.count].copy()
+        return np.roll(self.samples, -self.index)
+
+
+class Phase:
+    """Times the block it wraps into the profiler, in ms"""
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler: 'Profiler', name: str) -> None:
+        self.profiler = profiler
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self) -> 'Phase':
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.profiler.record(self.name, 1000 * (perf_counter() - self.start))
+
+
+class NullPhase:
+    """Phase of a disabled profiler"""
+    __slots__ = ()
+
+    def __enter__(self) -> 'NullPhase':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+
+NULL_PHASE = NullPhase()
+
+
+class Profiler:
+    """
+    Per phase timings (ms) and per tick counters kept in fixed size ring buffers.
+    Disabled it hands out a shared no-op phase and drops records, so it can stay wired in.
+
+        with profiler.phase("update"):
+            simulation.update()
+        profiler.record("active_chunks", simulation.active_chunks())
+        profiler.stats("update")["p95"]
+    """
+
+    def __init__(self, capacity: int = 1024, enabled: bool = False) -> None:
+        self.capacity = capacity
+        self.enabled = enabled
+        self.metrics: Dict[str, RingBuffer] = {}
+        self.phases: Dict[str, Phase] = {}
+
+    def phase(self, name: str):
+        if not self.enabled:
+            return NULL_PHASE
+        phase = self.phases.get(name)
+        if phase is None:
+            phase = self.phases[name] = Phase(self, name)
+        return phase
+
+    def record(self, name: str, value: float) -> None:
+        if not self.enabled:
+            return
+        metric = self.metrics.get(name)
+        if metric is None:
+            metric = self.metrics[name] = RingBuffer(self.capacity)
+        metric.append(value)
+
+    def values(self, name: str) -> np.ndarray:
+        metric = self.metrics.get(name)
+        return np.zeros(0) if metric is None else metric.values()
+
+    def stats(self, name: str) -> Dict[str, float]:
+        """
+        :returns: count, mean, p50, p95, p99 and max of the buffered samples
+        """
+        values = self.values(name)
+        if not values.size:
+            return {"count": 0, "mean": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+        p50, p95, p99 = np.percentile(values, (50, 95, 99))
+        return {
+            "count": int(values.size),
+            "mean": float(values.mean()),
+            "p50": float(p50),
+            "p95": float(p95),
+            "p99": float(p99),
+            "max": float(values.max()),
+        }
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        return {name: self.stats(name) for name in self.metrics}
+
+    def dump(self, path: str, samples: bool = False) -> None:
+        """
+        Write the summary as JSON
+        :param samples: include the raw buffered samples of every metric
+        """
+        data: Dict[str, Optional[dict]] = {"capacity": self.capacity, "summary": self.summary()}
+        if samples:
+            data["samples"] = {name: self.values(name).tolist() for name in self.metrics}
+        with open(path, "w") as file:
+            json.dump(data, file, indent=2)
+
+    def reset(self) -> None:
+        self.metrics.clear()
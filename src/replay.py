@@ -0,0 +1,133 @@
+"""
+Record brush input per tick and replay it headless with a fixed seed.
+
+    python main.py --record stroke.json
+    python -m src.replay stroke.json --engine cver --profile profile.json
+
+A recording is JSON: the board it was made on, the seed, how many ticks it lasted and one event per paint call,
+[tick, x, y, last_x, last_y, button, pen, pen_size] with pens named as in Simulation.PENS.
+"""
+from typing import Any, Dict, List, Optional, Sequence
+from time import perf_counter
+import argparse
+import json
+
+VERSION = 1
+
+# mouse button behind an event
+LEFT = 1
+RIGHT = 2
+
+
+class Recorder:
+    def __init__(self, simulation: Any) -> None:
+        self.height = simulation.height
+        self.width = simulation.width
+        self.chunk_size = getattr(simulation, "chunk_size", None) or simulation.chunkSize
+        self.seed = simulation.seed or 0
+        self.start_tick = simulation.tick
+        self.events: List[list] = []
+
+    def record(self, tick: int, pos: Sequence[int], last_pos: Sequence[int], pen: str, pen_size: int) -> None:
+        """Called by Simulation.paint before painting"""
+        button = RIGHT if pen == "eraser" else LEFT
+        self.events.append([
+            tick - self.start_tick, int(pos[0]), int(pos[1]), int(last_pos[0]), int(last_pos[1]),
+            button, pen, int(pen_size)
+        ])
+
+    def save(self, path: str, ticks: int) -> None:
+        """
+        :param ticks: how long the recording lasted, replay keeps stepping after the last event
+        """
+        with open(path, "w") as file:
+            json.dump({
+                "version": VERSION,
+                "height": self.height, "width": self.width, "chunk_size": self.chunk_size,
+                "seed": self.seed,
+                "ticks": ticks,
+                "events": self.events,
+            }, file)
+
+
+def load(path: str) -> Dict[str, Any]:
+    with open(path) as file:
+        recording = json.load(file)
+    if recording.get("version") != VERSION:
+        raise ValueError(f"{path} is recording version {recording.get('version')}, only {VERSION} is supported")
+    return recording
+
+
+def events_by_tick(recording: Dict[str, Any]) -> Dict[int, List[list]]:
+    events: Dict[int, List[list]] = {}
+    for event in recording["events"]:
+        events.setdefault(event[0], []).append(event)
+    return events
+
+
+def paint(simulation: Any, event: list, pens: Dict[str, Any]) -> None:
+    _, x, y, last_x, last_y, _, pen, pen_size = event
+    simulation.pen_size = pen_size
+    simulation.paint((x, y), (last_x, last_y), pens[pen])
+
+
+def replay(recording: Dict[str, Any], simulation: Any, pens: Dict[str, Any]) -> Any:
+    """
+    Paint every recorded event at its tick and step the simulation through the whole recording
+    :param simulation: fresh simulation of the recorded size and seed
+    :param pens: pen name to the simulation's pen, src.simulation.PENS or cver.csimulation.PENS
+    :returns: the simulation
+    """
+    events = events_by_tick(recording)
+    for tick in range(recording["ticks"]):
+        for event in events.get(tick, ()):
+            paint(simulation, event, pens)
+        simulation.step()
+    return simulation
+
+
+def make_simulation(engine: str, recording: Dict[str, Any], seed: Optional[int] = None) -> Any:
+    """
+    :returns: simulation the recording can be replayed on and its pens
+    """
+    seed = recording["seed"] if seed is None else seed
+    size = (recording["height"], recording["width"], recording["chunk_size"])
+    if engine == "cver":
+        from cver.csimulation import Simulation, PENS
+        return Simulation(*size, seed=seed), PENS
+    if engine == "numpy":
+        from src.automaton import Automaton
+        from src.simulation import PENS
+        return Automaton(*size, seed=seed), PENS
+
+    from src.simulation import Simulation, PENS
+    return Simulation(*size, seed=seed), PENS
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("recording")
+    parser.add_argument("--engine", choices=("src", "cver", "numpy"), default="src")
+    parser.add_argument("--seed", type=int, default=None, help="defaults to the recorded seed")
+    parser.add_argument("--profile", metavar="PATH", help="profile the replay and write it to PATH")
+    parser.add_argument("--snapshot", metavar="PATH", help="save the final board, see src.snapshot")
+    args = parser.parse_args()
+
+    recording = load(args.recording)
+    simulation, pens = make_simulation(args.engine, recording, args.seed)
+    simulation.profiler.enabled = args.profile is not None
+
+    start = perf_counter()
+    replay(recording, simulation, pens)
+    elapsed = perf_counter() - start
+    print(f"{args.engine}: {recording['ticks']} ticks in {elapsed:.3f} s, {recording['ticks'] / elapsed:.1f} ticks/sec")
+
+    if args.profile:
+        simulation.profiler.dump(args.profile)
+    if args.snapshot:
+        from src import snapshot
+        snapshot.save(simulation, args.snapshot)
+
+
+if __name__ == "__main__":
+    main()
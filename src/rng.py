@@ -0,0 +1,40 @@
+"""
+Seeded random numbers for the particle hot paths.
+NumPy fills a batch of floats at a time, handing one out is a single C level next() on a list iterator,
+so rolls cost about as much as random.random() and randint/choice skip random's Python level range checks.
+"""
+from typing import Iterator, List, Optional, Sequence, TypeVar
+from itertools import chain
+
+import numpy as np
+
+T = TypeVar('T')
+
+BATCH = 1 << 14
+
+
+class RandomStream:
+    def __init__(self, seed: Optional[int] = None, batch: int = BATCH) -> None:
+        self.batch = batch
+        self.seed(seed)
+
+    def seed(self, seed: Optional[int] = None) -> None:
+        """Restart the stream, None seeds from the OS"""
+        self.generator = np.random.default_rng(seed)
+        # float in [0, 1)
+        self.random = chain.from_iterable(self.batches()).__next__
+
+    def batches(self) -> Iterator[List[float]]:
+        while True:
+            yield self.generator.random(self.batch).tolist()
+
+    def randint(self, a: int, b: int) -> int:
+        """int in [a, b] like random.randint"""
+        return a + int(self.random() * (b - a + 1))
+
+    def choice(self, seq: Sequence[T]) -> T:
+        return seq[int(self.random() * len(seq))]
+
+
+# Shared by every particle, Simulation(seed=...) reseeds it
+stream = RandomStream()
@@ -0,0 +1,415 @@
+from typing import Type, Optional, Union, Dict, Any, List, Tuple, Callable
+
+import glm
+import numpy as np
+
+from values import *
+import src.particle as particle
+import src.tools as tools
+from src.board import CompactBoard
+from src.paging import PagedBoard
+from src.profiler import Profiler
+from src import rng
+from src.heat import HeatField, IGNITION_TEMPERATURE
+
+
+PARTICLES: Dict[int, Type[particle.Particle]] = {
+    cls.id().value: cls for cls in (particle.Sand, particle.Water, particle.Wood, particle.Fire, particle.Smoke)
+}
+
+# Engine independent pen names, used by recordings and benchmarks
+PENS: Dict[str, Type[particle.Particle]] = {
+    "sand": particle.Sand, "water": particle.Water, "wood": particle.Wood,
+    "fire": particle.Fire, "smoke": particle.Smoke, "eraser": particle.Eraser,
+}
+PEN_NAMES: Dict[Type[particle.Particle], str] = {pen: name for name, pen in PENS.items()}
+
+# chunks bitfield of get_state
+CHUNK_ACTIVE = 0b01
+CHUNK_NEXT = 0b10
+
+# Cells around a move that wake up with it: the neighbours of every cell it passed or changed
+DIRTY_MARGIN = 1
+
+# Chunks per side of a ChunkIndex block
+BLOCK_SIZE = 8
+
+
+class Simulation:
+    """
+    Headless simulation core: owns the board, the chunks and the brush.
+    Nothing in here touches the pygame window, so it can be stepped as fast as the physics allows.
+    """
+
+    def __init__(self, height: int = BOARD_Y, width: int = BOARD_X, chunk_size: int = CHUNK_SIZE,
+                 board_type: Callable[[int, int], Union[tools.Board, CompactBoard]] = tools.Board,
+                 profiler: Optional[Profiler] = None, seed: Optional[int] = None) -> None:
+        """
+        :param board_type: makes the board from height and width, a functools.partial for PagedBoard options
+        :param seed: seeds the random stream the particles draw from (src.rng), None leaves it alone
+        """
+        self.height = height
+        self.width = width
+        self.tick = 0
+        self.seed = seed
+        if seed is not None:
+            rng.stream.seed(seed)
+        # Particles that moved and cells visited during the last update
+        self.moved_particles = 0
+        self.visited_cells = 0
+        self.profiler = Profiler() if profiler is None else profiler
+        # src.replay.Recorder fed by paint()
+        self.recorder = None
+
+        # Board
+        self.board = board_type(height, width)
+        # A page can only go to sleep when every chunk in it does
+        if isinstance(self.board, PagedBoard) and self.board.page_size % chunk_size:
+            raise ValueError(f"page size {self.board.page_size} has to be a multiple of the chunk size {chunk_size}")
+        # A paged board pages the temperature with the cells
+        self.heat = HeatField(height, width, self.board.temperature if isinstance(self.board, PagedBoard) else None)
+        self.brush = tools.Brush(particle.Sand)
+
+        # Chunks
+        self.chunk_size = chunk_size  # 10 x 10
+        temp_chunks = []
+        for row in range(0, height, self.chunk_size):
+            temp_chunk_row = []
+            # max chunk size or chunk loss
+            chunk_height = self.chunk_size if height - row > self.chunk_size else height - row
+            for column in range(0, width, self.chunk_size):
+                # max chunk size or chunk loss
+                chunk_width = self.chunk_size if width - column > self.chunk_size else width - column
+                temp_chunk_row.append(tools.Chunk(
+                    row, column,
+                    chunk_height, chunk_width,
+                    False, True
+                ))
+            temp_chunks.append(temp_chunk_row)
+
+        self.chunks = np.array(temp_chunks)
+        # Blocks of chunks worth visiting, every chunk starts woken up
+        self.index = tools.ChunkIndex(self.chunks, BLOCK_SIZE)
+        self.index.awake = self.index.blocks()
+        # Chunks updated this tick in update order, bottom row first
+        self.active: List[tools.Chunk] = []
+        self.invalidate()
+
+    @property
+    def pen(self) -> Type[particle.Particle]:
+        return self.brush.pen
+
+    @pen.setter
+    def pen(self, value: Type[particle.Particle]) -> None:
+        self.brush.pen = value
+
+    @property
+    def pen_size(self) -> int:
+        return self.brush.pen_size
+
+    @pen_size.setter
+    def pen_size(self, value: int) -> None:
+        self.brush.pen_size = value
+
+    def active_chunks(self) -> int:
+        """Chunks updated this tick"""
+        return len(self.active)
+
+    def get_state(self) -> Dict[str, Any]:
+        """
+        Copy of the board and chunk state as CompactBoard arrays (see src.snapshot)
+        """
+        if isinstance(self.board, CompactBoard):
+            board = self.board
+        else:
+            board = CompactBoard(self.height, self.width)
+            for y, x in zip(*np.nonzero(self.board != None)):
+                board[y, x] = self.board[y, x]
+
+        chunks = np.zeros(self.chunks.shape, dtype=np.uint8)
+        for (row, column), chunk in np.ndenumerate(self.chunks):
+            chunks[row, column] = ((CHUNK_ACTIVE if chunk.updated_this_frame else 0) |
+                                   (CHUNK_NEXT if chunk.should_be_updated_next_frame else 0))
+
+        state = {name: getattr(board, name).copy() for name in CompactBoard.FIELDS}
+        state.update(tick=self.tick, seed=self.seed or 0, chunk_size=self.chunk_size, chunks=chunks)
+        return state
+
+    def set_state(self, state: Dict[str, Any]) -> None:
+        """
+        Restore get_state() output.
+        A CompactBoard adopts the arrays as they are, so memory mapped ones are only read when touched,
+        a PagedBoard writes them to its backing file.
+        """
+        if state["type"].shape != (self.height, self.width):
+            raise ValueError(f"board is {self.height}x{self.width}, state is {state['type'].shape}")
+
+        if isinstance(self.board, CompactBoard):
+            self.board.adopt(state)
+        else:
+            for y, x in np.ndindex(self.height, self.width):
+                cell_type = int(state["type"][y, x])
+                if cell_type not in PARTICLES:
+                    self.board[y, x] = None
+                    continue
+                cell = PARTICLES[cell_type](y, x)
+                cell.color = int(state["color"][y, x])
+                cell.vel = glm.vec2(*state["vel"][y, x])
+                cell.is_falling = bool(state["flags"][y, x] & CompactBoard.FALLING)
+                cell.been_updated = bool(state["flags"][y, x] & CompactBoard.UPDATED)
+                cell.lifetime = float(state["lifetime"][y, x])
+                cell.heat = float(state["heat"][y, x])
+                self.board[y, x] = cell
+
+        chunks = state["chunks"]
+        for (row, column), chunk in np.ndenumerate(self.chunks):
+            # A different chunk grid can't be mapped, everything wakes up instead
+            flags = chunks[row, column] if chunks.shape == self.chunks.shape else CHUNK_ACTIVE | CHUNK_NEXT
+            chunk.updated_this_frame = bool(flags & CHUNK_ACTIVE)
+            chunk.rect[:] = chunk.bounds() if chunk.updated_this_frame else (0, 0, 0, 0)
+            chunk.deactivate()
+            if flags & CHUNK_NEXT:
+                chunk.activate()
+        # Everything gets looked at on the next reset_chunks
+        self.index.awake = self.index.blocks()
+        self.index.active = self.index.blocks()
+        self.active = [chunk for chunk_row in reversed(self.chunks) for chunk in chunk_row if chunk.is_active()]
+
+        self.tick = int(state.get("tick", 0))
+        self.invalidate()
+
+    def paint(self, pos: glm.ivec2, last_pos: Optional[glm.ivec2] = None,
+              pen: Optional[Type[particle.Particle]] = None) -> None:
+        """
+        Paint a brush stroke and wake up the chunks it touches
+        :param pos: current brush position (x, y) in board coordinates
+        :param last_pos: previous brush position, the stroke is a single dab if omitted
+        :param pen: particle to paint with, defaults to the brush pen
+        """
+        pos = glm.ivec2(pos)
+        last_pos = glm.ivec2(pos if last_pos is None else last_pos)
+
+        if self.recorder is not None:
+            self.recorder.record(self.tick, pos, last_pos, PEN_NAMES[pen or self.brush.pen], self.brush.pen_size)
+
+        temp_pen = self.brush.pen
+        if pen is not None:
+            self.brush.pen = pen
+        self.brush.paint(self.board, pos, last_pos)
+        self.brush.pen = temp_pen
+
+        # Everything the brush could have reached
+        low = glm.min(pos, last_pos) - self.brush.pen_size
+        high = glm.max(pos, last_pos) + self.brush.pen_size + 1
+        stroke = (low.y, low.x, high.y, high.x)
+        self.mark(*stroke, wake=False)
+        self.activate_chunks_on_stroke(pos, last_pos, stroke)
+
+    def map_colors(self, image: Union[str, np.ndarray]) -> None:
+        """
+        Fill the board under an image with the particles of the closest palette colors, keeping those colors
+        :param image: image file path or (height, width, 3) RGB array, scaled down to fit and centered
+        """
+        from src import convert
+        rgb, top, left = convert.load_img(image, self.height, self.width)
+        names, index, colors = convert.nearest_palette(rgb, particle.COLORS)
+        shades = particle.palette_index(colors)
+
+        board = self.board
+        if isinstance(board, tools.Board):
+            pens = [getattr(particle, name) for name in names]
+            for y, (entries, row_colors) in enumerate(zip(index.tolist(), shades.tolist()), top):
+                for x, (entry, color) in enumerate(zip(entries, row_colors), left):
+                    cell = pens[entry](y, x)
+                    cell.color = color
+                    board[y, x] = cell
+        else:
+            # Typed boards take the region as whole array slices, every cell starts like a new particle of its pen
+            prototypes = {name: getattr(particle, name)(0, 0) for name in dict.fromkeys(names)}
+            entries = [prototypes[name] for name in names]
+            cells = (slice(top, top + rgb.shape[0]), slice(left, left + rgb.shape[1]))
+            board.type[cells] = np.array([cell.kind for cell in entries], dtype=np.uint8)[index]
+            board.color[cells] = shades
+            board.vel[cells] = np.array([tuple(cell.vel) for cell in entries], dtype=np.float32)[index]
+            board.flags[cells] = np.array([CompactBoard.FALLING if cell.is_falling else 0 for cell in entries],
+                                          dtype=np.uint8)[index]
+            board.heat[cells] = np.array([cell.heat for cell in entries], dtype=np.float32)[index]
+            lifetime = np.array([cell.lifetime for cell in entries], dtype=np.float32)[index]
+            smoke = board.type[cells] == particle.Smoke.kind
+            lifetime[smoke] = rng.stream.generator.integers(particle.Smoke.lifetime_range[0],
+                                                            particle.Smoke.lifetime_range[1] + 1,
+                                                            np.count_nonzero(smoke))
+            board.lifetime[cells] = lifetime
+
+        self.mark(top, left, top + rgb.shape[0], left + rgb.shape[1])
+
+    def mark(self, top: int, left: int, bottom: int, right: int, wake: bool = True) -> None:
+        """
+        Cells in [top, bottom) x [left, right) changed, redraw them
+        :param wake: and update them on the next tick
+        """
+        top, left = max(top, 0), max(left, 0)
+        bottom, right = min(bottom, self.height), min(right, self.width)
+        if top >= bottom or left >= right:
+            return
+
+        chunk_size = self.chunk_size
+        for row in range(top // chunk_size, (bottom - 1) // chunk_size + 1):
+            for column in range(left // chunk_size, (right - 1) // chunk_size + 1):
+                self.chunks[row, column].mark(top, left, bottom, right, wake)
+                self.index.mark(row, column, wake)
+
+    def invalidate(self) -> None:
+        """Redraw the whole board on the next pop_dirty_rects"""
+        for chunk in self.chunks.flat:
+            tools.expand(chunk.draw_rect, *chunk.bounds())
+        self.index.dirty = self.index.blocks()
+
+    def pop_dirty_rects(self) -> List[Tuple[int, int, int, int]]:
+        """
+        Cells that may have changed since the last call
+        :returns: (top, left, bottom, right) of each chunk with changes, bottom and right exclusive
+        """
+        rects = []
+        for block in sorted(self.index.dirty):
+            for _, _, chunk in self.index.chunks_in(block):
+                if not tools.is_empty(chunk.draw_rect):
+                    rects.append(tuple(chunk.draw_rect))
+                    tools.clear(chunk.draw_rect)
+        self.index.dirty.clear()
+        return rects
+
+    def activate_chunks_on_stroke(self, pos: glm.ivec2, last_pos: glm.ivec2,
+                                  stroke: Tuple[int, int, int, int]) -> None:
+        """
+        Wake the chunks the brush swept: the capsule around the segment from last_pos to pos.
+        Only chunks inside the stroke's bounding box are tested, so the cost follows the brush, not the board
+        :param stroke: (top, left, bottom, right) the brush could have reached, the part of it inside
+            a touched chunk is woken up
+        """
+        top, left = max(stroke[0], 0), max(stroke[1], 0)
+        bottom, right = min(stroke[2], self.height), min(stroke[3], self.width)
+        if top >= bottom or left >= right:
+            return
+
+        chunk_size = self.chunk_size
+        rows = np.arange(top // chunk_size, (bottom - 1) // chunk_size + 1)
+        columns = np.arange(left // chunk_size, (right - 1) // chunk_size + 1)
+        # Cells of every chunk, first to last
+        tops = (rows * chunk_size)[:, None]
+        lefts = (columns * chunk_size)[None, :]
+        bottoms = np.minimum(tops + chunk_size, self.height) - 1
+        rights = np.minimum(lefts + chunk_size, self.width) - 1
+
+        distance = tools.segment_box_distance((last_pos.y, last_pos.x), (pos.y, pos.x), tops, lefts, bottoms, rights)
+        # The rounded brush disc reaches a little past the pen size
+        for row, column in np.argwhere(distance <= self.brush.pen_size + 1):
+            self.chunks[rows[row], columns[column]].mark(*stroke)
+            self.index.mark(rows[row], columns[column])
+
+    def update_chunk(self, chunk: tools.Chunk) -> None:
+        """Update the particles in the chunk's dirty rect, bottom up"""
+        top, left, bottom, right = chunk.rect
+        self.visited_cells += (bottom - top) * (right - left)
+        for y in reversed(range(top, bottom)):
+            for x in range(left, right):
+                cell = self.board[y, x]
+                if cell is not None:
+                    have_moved = cell.on_update(self.board)
+                    if have_moved:
+                        self.moved_particles += 1
+                    # Moved, or vanished like burnt out smoke. Compact boards hand out a new view on every
+                    # read, so the stored type tells whether the cell still holds this particle
+                    if have_moved or self.board.type[y, x] != cell.kind:
+                        # From where it was to where it is now
+                        self.mark(
+                            min(y, cell.y) - DIRTY_MARGIN, min(x, cell.x) - DIRTY_MARGIN,
+                            max(y, cell.y) + DIRTY_MARGIN + 1, max(x, cell.x) + DIRTY_MARGIN + 1
+                        )
+
+    def update(self) -> None:
+        self.moved_particles = 0
+        self.visited_cells = 0
+        for chunk in self.active:
+            self.update_chunk(chunk)
+        self.update_heat()
+
+    def active_regions(self) -> List[Tuple[int, int, int, int]]:
+        """
+        (top, left, bottom, right) around the dirty rects of every row of active chunks, bottom row first.
+        Rows of chunks never share a cell, so the regions don't either
+        """
+        regions = []
+        region, row = [0, 0, 0, 0], None
+        for chunk in reversed(self.active):
+            if chunk.x != row and not tools.is_empty(region):
+                regions.append(tuple(region))
+                tools.clear(region)
+            row = chunk.x
+            tools.expand(region, *chunk.rect)
+        if not tools.is_empty(region):
+            regions.append(tuple(region))
+        return regions
+
+    def update_heat(self) -> None:
+        """
+        Run the heat field over the cells updated this tick, one region per row of chunks.
+        Cells still hot enough to light anything stay awake, so their heat keeps cooling instead of
+        waiting in a sleeping chunk for something to wake it
+        """
+        regions = self.active_regions()
+        self.heat.update(self.board, regions)
+        for top, left, bottom, right in regions:
+            hot = np.asarray(self.heat.temperature[top:bottom, left:right]) > IGNITION_TEMPERATURE
+            if hot.any():
+                ys, xs = np.flatnonzero(hot.any(axis=1)), np.flatnonzero(hot.any(axis=0))
+                self.mark(top + ys[0], left + xs[0], top + ys[-1] + 1, left + xs[-1] + 1)
+        for y, x in self.heat.changed:
+            self.mark(y - DIRTY_MARGIN, x - DIRTY_MARGIN, y + DIRTY_MARGIN + 1, x + DIRTY_MARGIN + 1)
+
+    def reset_chunk(self, chunk: tools.Chunk) -> None:
+        """Clear the update flag in the cells updated last tick and the cells woken for this one"""
+        for top, left, bottom, right in (chunk.rect, chunk.next_rect):
+            self.board.reset(slice(top, bottom), slice(left, right))
+
+    def reset_chunks(self) -> None:
+        """
+        Promote chunks activated since the last tick and clear the update flag
+        of every particle that could have been touched by it.
+        Only blocks with chunks updated last tick or woken for this one are visited.
+        A PagedBoard evicts the pages that slept long enough first
+        """
+        if isinstance(self.board, PagedBoard):
+            self.board.evict()
+        index = self.index
+        blocks = index.awake | index.active
+        index.awake, index.active = set(), set()
+        active = []
+        for block in blocks:
+            for row, column, chunk in index.chunks_in(block):
+                if chunk.updated_this_frame or chunk.should_be_updated_next_frame:
+                    self.reset_chunk(chunk)
+                chunk.update()
+                if chunk.is_active():
+                    active.append((-row, column, chunk))
+                    index.active.add(block)
+        # Whatever the update visits gets redrawn, see Chunk.update
+        index.dirty |= index.active
+        active.sort(key=lambda entry: entry[:2])
+        self.active = [chunk for _, _, chunk in active]
+
+    def step(self, n: int = 1) -> None:
+        profiler = self.profiler
+        for _ in range(n):
+            with profiler.phase("reset_chunks"):
+                self.reset_chunks()
+            with profiler.phase("update"):
+                self.update()
+            self.tick += 1
+
+            if profiler.enabled:
+                profiler.record("active_chunks", self.active_chunks())
+                profiler.record("moved_particles", self.moved_particles)
+                profiler.record("visited_cells", self.visited_cells)
+                if isinstance(self.board, PagedBoard):
+                    profiler.record("resident_pages", self.board.resident_pages())
@@ -0,0 +1,166 @@
+"""
+Binary snapshots of a simulation, for both engines.
+
+Layout (little endian), version 2:
+    header   64 bytes: magic, version, flags, height, width, chunk_size, chunk_rows, chunk_columns, tick, seed
+    type     uint8   (height, width)   src.particle.ParticleType values
+    color    uint8   (height, width)   src.particle.PALETTE indexes
+    vel      float32 (height, width, 2)  (x, y)
+    flags    uint8   (height, width)   CompactBoard.FALLING | CompactBoard.UPDATED
+    lifetime float32 (height, width)
+    heat     float32 (height, width)
+    chunks   uint8   (chunk_rows, chunk_columns)  CHUNK_ACTIVE | CHUNK_NEXT
+
+Version 1 stored color as uint32 0xRRGGBB, read() turns it into palette indexes.
+Uncompressed sections start on 64 byte boundaries so they can be memory mapped in place.
+Compressed files store the zlib compressed size of every section after the header, then the sections.
+"""
+from typing import Dict, Any, List, Tuple, Optional
+import struct
+import zlib
+
+import numpy as np
+
+MAGIC = b"SNDB"
+VERSION = 2
+# Versions read() understands
+VERSIONS = (1, 2)
+HEADER = struct.Struct("<4sHHiiiiiqI")
+HEADER_SIZE = 64
+ALIGN = 64
+
+# header flags
+COMPRESSED = 0b1
+
+SECTIONS: Tuple[Tuple[str, str, Tuple[int, ...]], ...] = (
+    ("type", "<u1", ()),
+    ("color", "<u1", ()),
+    ("vel", "<f4", (2,)),
+    ("flags", "<u1", ()),
+    ("lifetime", "<f4", ()),
+    ("heat", "<f4", ()),
+)
+
+
+def layout(header: Dict[str, int]) -> List[Tuple[str, np.dtype, Tuple[int, ...]]]:
+    board = (header["height"], header["width"])
+    sections = [(name, np.dtype("<u4" if name == "color" and header.get("version") == 1 else dtype), board + extra)
+                for name, dtype, extra in SECTIONS]
+    return sections + [
+        ("chunks", np.dtype("<u1"), (header["chunk_rows"], header["chunk_columns"]))
+    ]
+
+
+def aligned(offset: int) -> int:
+    return (offset + ALIGN - 1) // ALIGN * ALIGN
+
+
+def write(path: str, state: Dict[str, Any], compress: bool = False, level: int = 6) -> None:
+    """
+    :param state: Simulation.get_state() output
+    :param compress: zlib every section, smaller files but no memory mapped loading
+    """
+    height, width = state["type"].shape
+    header = {
+        "version": VERSION, "height": height, "width": width, "chunk_size": state["chunk_size"],
+        "chunk_rows": state["chunks"].shape[0], "chunk_columns": state["chunks"].shape[1],
+    }
+    sections = [np.ascontiguousarray(state[name], dtype=dtype).reshape(shape)
+                for name, dtype, shape in layout(header)]
+
+    with open(path, "wb") as file:
+        file.write(HEADER.pack(
+            MAGIC, VERSION, COMPRESSED if compress else 0,
+            height, width, header["chunk_size"], header["chunk_rows"], header["chunk_columns"],
+            int(state.get("tick", 0)), int(state.get("seed", 0))
+        ).ljust(HEADER_SIZE, b"\0"))
+
+        if compress:
+            blobs = [zlib.compress(section.tobytes(), level) for section in sections]
+            file.write(struct.pack(f"<{len(blobs)}Q", *map(len, blobs)))
+            for blob in blobs:
+                file.write(blob)
+            return
+
+        for section in sections:
+            file.write(b"\0" * (aligned(file.tell()) - file.tell()))
+            file.write(section.tobytes())
+
+
+def read_header(path: str) -> Dict[str, int]:
+    with open(path, "rb") as file:
+        data = file.read(HEADER_SIZE)
+    if len(data) < HEADER.size:
+        raise ValueError(f"{path} is not a snapshot")
+
+    magic, version, flags, height, width, chunk_size, chunk_rows, chunk_columns, tick, seed = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a snapshot")
+    if version not in VERSIONS:
+        raise ValueError(f"{path} is snapshot version {version}, only {', '.join(map(str, VERSIONS))} are supported")
+
+    return {
+        "version": version, "flags": flags, "height": height, "width": width, "chunk_size": chunk_size,
+        "chunk_rows": chunk_rows, "chunk_columns": chunk_columns, "tick": tick, "seed": seed,
+    }
+
+
+def read(path: str, mmap: bool = True) -> Dict[str, Any]:
+    """
+    :param mmap: map uncompressed sections copy-on-write instead of reading them,
+        writes to the arrays never reach the file
+    :returns: state for Simulation.set_state
+    """
+    header = read_header(path)
+    state: Dict[str, Any] = {"tick": header["tick"], "seed": header["seed"], "chunk_size": header["chunk_size"]}
+    sections = layout(header)
+
+    if header["flags"] & COMPRESSED:
+        with open(path, "rb") as file:
+            file.seek(HEADER_SIZE)
+            sizes = struct.unpack(f"<{len(sections)}Q", file.read(8 * len(sections)))
+            for (name, dtype, shape), size in zip(sections, sizes):
+                data = bytearray(zlib.decompress(file.read(size)))
+                state[name] = np.frombuffer(data, dtype=dtype).reshape(shape)
+        return upgraded(header, state)
+
+    offset = HEADER_SIZE
+    with open(path, "rb") as file:
+        for name, dtype, shape in sections:
+            offset = aligned(offset)
+            nbytes = dtype.itemsize * int(np.prod(shape))
+            if mmap:
+                state[name] = np.memmap(path, dtype=dtype, mode="c", offset=offset, shape=shape)
+            else:
+                file.seek(offset)
+                state[name] = np.frombuffer(bytearray(file.read(nbytes)), dtype=dtype).reshape(shape)
+            offset += nbytes
+    return upgraded(header, state)
+
+
+def upgraded(header: Dict[str, int], state: Dict[str, Any]) -> Dict[str, Any]:
+    """state read from an older version in the current layout"""
+    if header["version"] == 1:
+        from src.particle import palette_index
+        state["color"] = palette_index(state["color"])
+    return state
+
+
+def save(simulation: Any, path: str, compress: bool = False) -> None:
+    """Snapshot a src.simulation.Simulation or a cver.csimulation.Simulation"""
+    write(path, simulation.get_state(), compress)
+
+
+def load(path: str, simulation: Optional[Any] = None, mmap: bool = True) -> Any:
+    """
+    Restore a snapshot into simulation, by default a new src Simulation on a CompactBoard of the saved size
+    :returns: the simulation
+    """
+    state = read(path, mmap)
+    if simulation is None:
+        from src.simulation import Simulation
+        from src.board import CompactBoard
+        height, width = state["type"].shape
+        simulation = Simulation(height, width, state["chunk_size"], board_type=CompactBoard)
+    simulation.set_state(state)
+    return simulation
@@ -0,0 +1,127 @@
+"""
+What SandSim.run does with the simulation between painting and flipping the window, for any of the displays.
+
+Lockstep steps once and redraws every frame, the physics and the frame rate hold each other back.
+Ticker steps at a fixed tick rate on a thread of its own: a slow frame leaves the physics alone and slow
+physics never stall the window. After every batch of ticks the thread copies what changed into a back buffer
+of its own and, when anything did, publishes it into the display's surface (the front buffer) the window presents.
+Painting, image import and everything else touching the simulation from the window go through `lock`.
+"""
+from contextlib import nullcontext
+from typing import Callable, Optional
+from time import perf_counter
+import threading
+
+import numpy as np
+
+# Ticks a late Ticker runs back to back before giving up on the rest of the backlog
+MAX_CATCH_UP = 5
+
+
+class Lockstep:
+    """A tick, then a redraw, every frame"""
+
+    def __init__(self, display) -> None:
+        self.display = display
+        self.lock = nullcontext()
+
+    def start(self) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
+
+    def advance(self, running: bool) -> None:
+        """
+        :param running: step the simulation, a paused one still shows what gets painted
+        """
+        if running:
+            self.display.simulation.step()
+        self.display.draw_frame()
+
+    def present(self) -> None:
+        self.display.present()
+
+
+class Ticker(threading.Thread):
+    """
+    Steps the display's simulation tick_rate times a second.
+    When it falls behind it runs up to max_catch_up ticks back to back and then draws one frame for all of them;
+    a bigger backlog is dropped (counted in `dropped`) rather than chased. The window presents the last published
+    frame whenever it gets to it, frames published in between are never shown.
+    """
+
+    def __init__(self, display, tick_rate: int, max_catch_up: int = MAX_CATCH_UP,
+                 clock: Callable[[], float] = perf_counter) -> None:
+        """
+        :param clock: seconds, when the ticks are due
+        """
+        if tick_rate <= 0 or max_catch_up <= 0:
+            raise ValueError(f"tick rate {tick_rate} and catch up {max_catch_up} have to be positive")
+        super(Ticker, self).__init__(name="simulation", daemon=True)
+        self.display = display
+        self.period = 1.0 / tick_rate
+        self.max_catch_up = max_catch_up
+        self.clock = clock
+        # When the next tick is due, from the first catch_up on
+        self.next_tick: Optional[float] = None
+        # Held while the simulation or the back buffer is in use
+        self.lock = threading.Lock()
+        # Held while the front buffer is written or presented
+        self.frame_lock = threading.Lock()
+        # Same layout as the surface pixels, so publishing is one straight copy
+        self.back = display.surface_array.copy(order="K")
+
+        self.running = True
+        # Frames published and ticks given up on
+        self.frames = 0
+        self.dropped = 0
+        self.stopped = threading.Event()
+
+    def advance(self, running: bool) -> None:
+        """
+        :param running: step the simulation, a paused one still publishes what gets painted
+        """
+        self.running = running
+
+    def present(self) -> None:
+        with self.frame_lock:
+            self.display.present()
+
+    def stop(self) -> None:
+        """Finish the current batch and end the thread"""
+        self.stopped.set()
+        if self.is_alive():
+            self.join()
+
+    def catch_up(self, now: float) -> float:
+        """
+        Run the ticks due by now as one batch and publish its frame, what the thread does in a loop
+        :returns: seconds until the next tick is due, 0 after a batch
+        """
+        if self.next_tick is None:
+            self.next_tick = now
+        late = now - self.next_tick
+        if late < 0:
+            return -late
+        display = self.display
+        due = int(late / self.period) + 1
+        ticks = min(due, self.max_catch_up)
+        with self.lock:
+            if self.running:
+                display.simulation.step(ticks)
+                self.dropped += due - ticks
+            drawn = display.draw_frame(self.back)
+        if drawn:
+            with self.frame_lock:
+                np.copyto(display.surface_array, self.back)
+                display.changed = True
+                self.frames += 1
+        self.next_tick += due * self.period
+        return 0.0
+
+    def run(self) -> None:
+        while not self.stopped.is_set():
+            wait = self.catch_up(self.clock())
+            if wait > 0:
+                self.stopped.wait(wait)
@@ -1,7 +1,6 @@
-from typing import Type, Callable, Iterator, Optional, Any, Union
-from functools import wraps
-from time import perf_counter
+from typing import Type, Iterator, Optional, Any, Union, Dict, Tuple, List, Set
 import math
+from itertools import chain
 
 import glm
 import numpy as np
@@ -11,6 +10,33 @@ from values import *
 Particle = Type['Particle']
 
 
+# [top, left, bottom, right) in board cells, empty when top >= bottom or left >= right
+Rect = List[int]
+
+
+def is_empty(rect: Rect) -> bool:
+    return rect[0] >= rect[2] or rect[1] >= rect[3]
+
+
+def expand(rect: Rect, top: int, left: int, bottom: int, right: int) -> None:
+    """Grow rect in place to cover [top, bottom) x [left, right)"""
+    if is_empty(rect):
+        rect[0], rect[1], rect[2], rect[3] = top, left, bottom, right
+        return
+    if top < rect[0]:
+        rect[0] = top
+    if left < rect[1]:
+        rect[1] = left
+    if bottom > rect[2]:
+        rect[2] = bottom
+    if right > rect[3]:
+        rect[3] = right
+
+
+def clear(rect: Rect) -> None:
+    rect[0] = rect[1] = rect[2] = rect[3] = 0
+
+
 class Chunk:
     def __init__(self,
                  x: int, y: int,
@@ -23,11 +49,38 @@ class Chunk:
         self.updated_this_frame = updated_this_frame
         self.should_be_updated_next_frame = should_be_updated_next_frame
 
+        # Cells updated this tick, cells woken for the next one and cells changed since the last redraw
+        self.rect: Rect = list(self.bounds()) if updated_this_frame else [0, 0, 0, 0]
+        self.next_rect: Rect = list(self.bounds()) if should_be_updated_next_frame else [0, 0, 0, 0]
+        self.draw_rect: Rect = [0, 0, 0, 0]
+
+    def bounds(self) -> Tuple[int, int, int, int]:
+        """The whole chunk as (top, left, bottom, right)"""
+        return self.x, self.y, self.x + self.width, self.y + self.height
+
+    def mark(self, top: int, left: int, bottom: int, right: int, wake: bool = True) -> None:
+        """
+        Cells in [top, bottom) x [left, right) changed, the part inside the chunk gets redrawn
+        :param wake: update that part on the next tick too
+        """
+        top = max(top, self.x)
+        left = max(left, self.y)
+        bottom = min(bottom, self.x + self.width)
+        right = min(right, self.y + self.height)
+        if top >= bottom or left >= right:
+            return
+
+        if wake:
+            self.should_be_updated_next_frame = True
+            expand(self.next_rect, top, left, bottom, right)
+        expand(self.draw_rect, top, left, bottom, right)
+
     def activate(self) -> None:
-        self.should_be_updated_next_frame = True
+        self.mark(*self.bounds())
 
     def deactivate(self) -> None:
         self.should_be_updated_next_frame = False
+        clear(self.next_rect)
 
     def is_active(self) -> bool:
         return self.updated_this_frame
@@ -36,32 +89,105 @@ class Chunk:
         if self.should_be_updated_next_frame:
             self.updated_this_frame = True
             self.should_be_updated_next_frame = False
+            self.rect[:] = self.next_rect
+            clear(self.next_rect)
+            # Whatever the update visits may change without moving, fading smoke for one
+            expand(self.draw_rect, *self.rect)
         else:
             self.updated_this_frame = False
+            clear(self.rect)
 
     def __repr__(self) -> str:
         return f"Chunk(y={self.x},x={self.y},h={self.width},w={self.height})"
 
-    def draw_debug_chunk(self, win) -> None:
+    def draw_debug_chunk(self, win, scale: int = SCALE) -> None:
         color = 0x00FF00 if self.updated_this_frame else 0xFF0000
-        py.draw.rect(win, color, ((self.y*SCALE, self.x*SCALE), (self.height*SCALE, self.width*SCALE)), 1)
+        py.draw.rect(win, color, ((self.y*scale, self.x*scale), (self.height*scale, self.width*scale)), 1)
+
+
+# (row, column) of a block of chunks in a ChunkIndex
+Block = Tuple[int, int]
+
+
+class ChunkIndex:
+    """
+    Second level over a chunk grid: square blocks of chunks, each remembered while any of its chunks is woken,
+    updated or waiting for a redraw. Stepping and redrawing only visit the chunks of remembered blocks,
+    so a sleeping world costs nothing however large it is.
+    """
+
+    def __init__(self, chunks: np.ndarray, size: int) -> None:
+        """
+        :param chunks: 2D array of Chunk, indexed by chunk row and column
+        :param size: chunks per block side
+        """
+        self.chunks = chunks
+        self.size = size
+        # Blocks with chunks woken for the next tick, updated this tick and changed since the last redraw
+        self.awake: Set[Block] = set()
+        self.active: Set[Block] = set()
+        self.dirty: Set[Block] = set()
+
+    def blocks(self) -> Set[Block]:
+        rows, columns = self.chunks.shape
+        return {(row, column) for row in range(0, (rows - 1) // self.size + 1)
+                for column in range(0, (columns - 1) // self.size + 1)}
+
+    def mark(self, row: int, column: int, wake: bool = True) -> None:
+        """Chunk (row, column) was marked, see Chunk.mark"""
+        block = row // self.size, column // self.size
+        self.dirty.add(block)
+        if wake:
+            self.awake.add(block)
+
+    def chunks_in(self, block: Block) -> Iterator[Tuple[int, int, Chunk]]:
+        """(row, column, chunk) of every chunk in the block, row by row"""
+        top, left = block[0] * self.size, block[1] * self.size
+        for (row, column), chunk in np.ndenumerate(self.chunks[top:top + self.size, left:left + self.size]):
+            yield top + row, left + column, chunk
 
 
 class Board(np.ndarray):
     def __new__(cls, y: int, x: int) -> 'Board':
-        return super(Board, cls).__new__(cls, (y, x), dtype=object)
+        board = super(Board, cls).__new__(cls, (y, x), dtype=object)
+        # Color (particle.PALETTE index) and ParticleType value of every cell, kept in sync on each write
+        # so drawing and the heat field never have to visit the particles
+        board.color = np.zeros((y, x), dtype=np.uint8)
+        board.type = np.zeros((y, x), dtype=np.uint8)
+        return board
+
+    def __array_finalize__(self, obj: Optional[np.ndarray]) -> None:
+        # Slices and other views don't own the buffers
+        self.color = None
+        self.type = None
+
+    def __setitem__(self, key: Any, value: Optional[Particle]) -> None:
+        super(Board, self).__setitem__(key, value)
+        if self.color is not None:
+            if value is None:
+                self.color[key] = 0
+                self.type[key] = 0
+            else:
+                self.color[key] = value.color
+                self.type[key] = value.kind
 
     def in_bounds(self, y: int, x: int) -> bool:
         return 0 <= y < self.shape[0] and 0 <= x < self.shape[1]
 
     def swap(self, cell: Particle, y: int, x: int) -> None:
-        self[cell.pos.y, cell.pos.x] = self[y, x]
+        other = self[y, x]
+        self[cell.y, cell.x] = other
         self[y, x] = cell
 
-        if self[cell.pos.y, cell.pos.x] is not None:
-            self[cell.pos.y, cell.pos.x].pos = cell.pos
+        if other is not None:
+            other.y, other.x = cell.y, cell.x
+
+        cell.y, cell.x = y, x
 
-        cell.pos = glm.ivec2(x, y)
+    def reset(self, y: slice, x: slice) -> None:
+        for cell in self[y, x].flat:
+            if cell is not None:
+                cell.reset()
 
 
 class Brush:
@@ -69,7 +195,6 @@ class Brush:
         self._pen: Type[Particle] = pen
         self._pen_size: int = PAINT_SCALE
         self.PendDifference: int = self._pen_size
-        self.last_mouse_on_board_position: Optional[glm.ivec2] = None
 
     @property
     def pen(self) -> Type[Particle]:
@@ -89,53 +214,41 @@ class Brush:
             self._pen_size = value
             self.PendDifference = value
 
-    def paint_point(self, board: Board, point: glm.ivec2) -> None:
-        if not board.in_bounds(point.y, point.x):
-            return
-        if self.pen.is_valid(board[point.y, point.x]):
-            board[point.y, point.x] = self.pen(point.y, point.x)
-
-    def paint_from_to(self, board: Board, start: Union[glm.vec2, glm.ivec2], end: Union[glm.vec2, glm.ivec2],
-                      slope: Optional[glm.vec2] = None) -> None:
-        for pos in interpolate_pos(start, end, slope):
-            self.paint_point(board, pos)
-
-    def paint(self, board: Board, pos: glm.ivec2) -> None:
-        pos = glm.ivec2(pos)
+    def stroke(self, pos: glm.ivec2, last_pos: glm.ivec2) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Cells the brush covers sweeping its stamp from last_pos to pos, each one once
+        :returns: y and x of every cell, row by row, not clipped to any board
+        """
+        mask = stamp(self.pen_size)
+        # One spare cell around, interpolated points may round past the ends
+        reach = self.pen_size + 1
+        top, left = min(pos.y, last_pos.y) - reach, min(pos.x, last_pos.x) - reach
+        canvas = np.zeros((abs(pos.y - last_pos.y) + 2 * reach + 1, abs(pos.x - last_pos.x) + 2 * reach + 1), dtype=bool)
+
+        for point in chain(interpolate_pos(last_pos, pos), (pos,)):
+            y, x = point.y - self.pen_size - top, point.x - self.pen_size - left
+            canvas[y:y + mask.shape[0], x:x + mask.shape[1]] |= mask
+
+        ys, xs = np.nonzero(canvas)
+        return ys + top, xs + left
+
+    def paint(self, board: Board, pos: glm.ivec2, last_pos: glm.ivec2) -> None:
+        """Paint every cell of the stroke on the board once, keeping those the pen can't replace"""
+        ys, xs = self.stroke(glm.ivec2(pos), glm.ivec2(last_pos))
+        inside = (ys >= 0) & (ys < board.shape[0]) & (xs >= 0) & (xs < board.shape[1])
+
+        pen = self.pen
+        # is_valid only looks at the kind of particle in the spot
+        valid: Dict[Any, bool] = {}
+        for y, x in zip(ys[inside].tolist(), xs[inside].tolist()):
+            spot = board[y, x]
+            kind = None if spot is None else spot.id()
+            replace = valid.get(kind)
+            if replace is None:
+                replace = valid[kind] = pen.is_valid(spot)
+            if replace:
+                board[y, x] = pen(y, x)
 
-        pos /= SCALE
-
-        if self.last_mouse_on_board_position is None:
-            self.last_mouse_on_board_position = glm.ivec2(pos)
-        slope = glm.vec2(pos - self.last_mouse_on_board_position)
-        if slope != glm.vec2():
-            slope = glm.normalize(slope)
-
-        # drawing cross that expends over the gap between the brush positions
-        for offset in range(-self.pen_size, self.pen_size):
-            y = glm.ivec2(0, offset)
-            point_y = pos + y
-            last_point_y = self.last_mouse_on_board_position + y
-            self.paint_from_to(board, last_point_y, point_y, slope)
-
-            x = glm.ivec2(offset, 0)
-            point_x = pos + x
-            last_point_x = self.last_mouse_on_board_position + x
-            self.paint_from_to(board, last_point_x, point_x, slope)
-
-        # drawing a circle at the previous point and the current point
-        for y in range(-self.pen_size, self.pen_size):
-            offset = pow((pow(self.pen_size, 2) - pow(y, 2)), 0.5)
-            offset = round(offset)
-            for x in range(-offset, offset):
-                r_phi = glm.ivec2(y, x)
-                point = pos + r_phi
-                last_point = self.last_mouse_on_board_position + r_phi
-                self.paint_point(board, point)
-                self.paint_point(board, last_point)
-
-        self.last_mouse_on_board_position = pos
-        
 
 def interpolate_pos(start: Union[glm.vec2, glm.ivec2], end: Union[glm.vec2, glm.ivec2],
                     slope: Optional[glm.vec2] = None) -> Iterator[glm.ivec2]:
@@ -191,46 +304,80 @@ def interpolate_pos_dda(start: Union[glm.vec2, glm.ivec2], end: Union[glm.vec2,
         yield glm.ivec2(current_cell)
 
 
-# Debug
-class Timeit:
-    def __init__(self, log: str = "", max_time: bool = False, min_time: bool = False, avg_time: bool = False) -> None:
-        self.log = f"[{log:<15}] | AT"
-
-        self.max_time = max_time
-        self.min_time = min_time
-        self.avg_time = avg_time
-        
-        self.avg_counter = 0.0
-
-        self.max_time_spent = 0
-        self.min_time_spent = 1_000_000
-        self.avg_time_spent = 0.0
-
-    def __call__(self, f: Callable[[Any, ...], Any]) -> Callable[[Any, ...], Any]:
-        self.log += f"[{f.__name__:<15}]" + " | {:7.03f} ms"
-
-        @wraps(f)
-        def wrapper(*args: Any, **kwargs: Any) -> Any:
-            # Function
-            start = perf_counter()
-            result = f(*args, **kwargs)
-            end = perf_counter()
-            end = 1000 * (end - start)
-
-            # Logging
-            log = self.log.format(end)
-            if self.max_time:
-                self.max_time_spent = max(end, self.max_time_spent)
-                log += f" | Max {self.max_time_spent: 7.03f}"
-            if self.min_time:
-                self.min_time_spent = min(end, self.min_time_spent)
-                log += f" | Min {self.min_time_spent: 7.03f}"
-            if self.avg_time:
-                self.avg_counter += 1.0
-                self.avg_time_spent += end
-                avg = self.avg_time_spent / self.avg_counter
-                log += f" | Avg {avg: 7.03f}"
-            print(log)
-
-            return result
-        return wrapper
+def segment_box_distance(start: Tuple[float, float], end: Tuple[float, float],
+                         top: np.ndarray, left: np.ndarray, bottom: np.ndarray, right: np.ndarray) -> np.ndarray:
+    """
+    Distance between the segment from start to end, both (y, x), and every box [top, bottom] x [left, right]
+    :returns: array shaped like the boxes, 0 where the segment crosses a box
+    """
+    (y0, x0), (y1, x1) = start, end
+
+    # Endpoints to the boxes
+    distance = np.minimum(
+        np.hypot(np.maximum(np.maximum(top - y0, y0 - bottom), 0), np.maximum(np.maximum(left - x0, x0 - right), 0)),
+        np.hypot(np.maximum(np.maximum(top - y1, y1 - bottom), 0), np.maximum(np.maximum(left - x1, x1 - right), 0))
+    )
+    dy, dx = y1 - y0, x1 - x0
+    length2 = dy * dy + dx * dx
+    if not length2:
+        return distance
+
+    # Box corners to the segment, and on which side of its line they lie
+    low_side = np.full(distance.shape, np.inf)
+    high_side = np.full(distance.shape, -np.inf)
+    for corner_y, corner_x in ((top, left), (top, right), (bottom, left), (bottom, right)):
+        t = np.clip(((corner_y - y0) * dy + (corner_x - x0) * dx) / length2, 0.0, 1.0)
+        distance = np.minimum(distance, np.hypot(corner_y - (y0 + t * dy), corner_x - (x0 + t * dx)))
+        side = dy * (corner_x - x0) - dx * (corner_y - y0)
+        low_side = np.minimum(low_side, side)
+        high_side = np.maximum(high_side, side)
+
+    # Crossing: corners on both sides of the line and the segment's bounding box overlapping the box
+    crosses = ((low_side <= 0) & (high_side >= 0) &
+               (min(y0, y1) <= bottom) & (max(y0, y1) >= top) & (min(x0, x1) <= right) & (max(x0, x1) >= left))
+    distance[crosses] = 0.0
+    return distance
+
+
+# Brush stamps by pen size: the cells within pen_size of the center
+STAMPS: Dict[int, np.ndarray] = {}
+
+
+def stamp(pen_size: int) -> np.ndarray:
+    """
+    :returns: read only (2 * pen_size + 1) square bool mask centered on the brush
+    """
+    mask = STAMPS.get(pen_size)
+    if mask is None:
+        offsets = np.arange(-pen_size, pen_size + 1)
+        mask = STAMPS[pen_size] = offsets[:, None] ** 2 + offsets[None, :] ** 2 <= pen_size ** 2
+        mask.flags.writeable = False
+    return mask
+
+
+# Offsets of the cells interpolate_pos_dda walks from (0, 0) to (y, x), start included.
+# Velocities take few distinct values, so every ray is walked once and particles iterate plain int pairs
+Ray = Tuple[Tuple[int, int], ...]
+RAYS: Dict[Tuple[int, int], Ray] = {}
+STEPS: Dict[Tuple[int, int], Ray] = {}
+
+
+def ray(y: int, x: int) -> Ray:
+    offsets = RAYS.get((y, x))
+    if offsets is None:
+        offsets = RAYS[y, x] = tuple((cell.y, cell.x) for cell in interpolate_pos_dda(glm.ivec2(), glm.ivec2(x, y)))
+    return offsets
+
+
+def steps(y: int, x: int) -> Ray:
+    """ray(y, x) without the start"""
+    offsets = STEPS.get((y, x))
+    if offsets is None:
+        offsets = STEPS[y, x] = ray(y, x)[1:]
+    return offsets
+
+
+# Every ray up to terminal velocity, faster ones are walked on first use
+for _y in range(-int(TERMINAL_VELOCITY), int(TERMINAL_VELOCITY) + 1):
+    for _x in range(-int(TERMINAL_VELOCITY), int(TERMINAL_VELOCITY) + 1):
+        steps(_y, _x)
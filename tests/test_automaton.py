@@ -0,0 +1,90 @@
+import pytest
+from src.automaton import *
+
+
+@pytest.fixture
+def automaton():
+    return Automaton(40, 30, chunk_size=10, seed=0)
+
+
+def kinds(automaton: Automaton) -> np.ndarray:
+    return np.bincount(automaton.board.type.ravel(), minlength=KINDS)
+
+
+def test_valid_follows_particles() -> None:
+    assert VALID[SAND, WATER] and not VALID[SAND, particle.Wood.kind]
+    assert VALID[WATER, EMPTY] and not VALID[WATER, SAND]
+    assert VALID[particle.Eraser.kind, [EMPTY, SAND, WATER, FIRE, SMOKE]].all()
+
+
+def test_pass_slices_never_overlap(automaton: Automaton) -> None:
+    for dy, dx in ((1, 0), (1, 1), (1, -1), (0, 1), (0, -1), (-1, 0)):
+        for parity in (0, 1):
+            source, target = automaton.pass_slices((3, 2, 37, 28), dy, dx, parity)
+            cells = np.zeros((40, 30), dtype=int)
+            cells[source] += 1
+            cells[target] += 1
+            assert cells.max() == 1
+            assert automaton.board.type[source].shape == automaton.board.type[target].shape
+
+
+def test_sand_settles(automaton: Automaton) -> None:
+    automaton.pen_size = 3
+    automaton.paint(glm.ivec2(15, 5), pen=particle.Sand)
+    painted = kinds(automaton)
+
+    automaton.step(120)
+
+    assert (kinds(automaton) == painted).all()
+    assert not (automaton.board.type[:30] == SAND).any()
+    assert automaton.active_chunks() == 0
+
+
+def test_sand_sinks_in_water(automaton: Automaton) -> None:
+    automaton.pen_size = 1
+    automaton.paint(glm.ivec2(0, 38), glm.ivec2(29, 38), pen=particle.Water)
+    automaton.paint(glm.ivec2(15, 30), pen=particle.Sand)
+    painted = kinds(automaton)
+
+    automaton.step(30)
+
+    assert (kinds(automaton) == painted).all()
+    assert (automaton.board.type[-1] == SAND).any()
+    assert (automaton.board.type[:37] == WATER).any()
+
+
+def test_smoke_rises_and_fades(automaton: Automaton) -> None:
+    automaton.paint(glm.ivec2(15, 35), pen=particle.Smoke)
+    automaton.step(1)
+    assert (automaton.board.type[:35] == SMOKE).any()
+
+    automaton.step(SMOKE_LIFETIME[1] + 2)
+    assert not (automaton.board.type == SMOKE).any()
+
+
+def test_redraws_changed_cells(automaton: Automaton) -> None:
+    automaton.pop_dirty_rects()
+    automaton.paint(glm.ivec2(15, 5), pen=particle.Sand)
+    automaton.pop_dirty_rects()
+    shown = automaton.board.color.copy()
+
+    for _ in range(10):
+        automaton.step()
+        for top, left, bottom, right in automaton.pop_dirty_rects():
+            shown[top:bottom, left:right] = automaton.board.color[top:bottom, left:right]
+        assert (shown == automaton.board.color).all()
+
+
+def test_passes_skip_the_space_between_active_chunks() -> None:
+    automaton = Automaton(100, 100, chunk_size=10, seed=0)
+    automaton.step(3)
+    automaton.paint(glm.ivec2(5, 5), pen=particle.Sand)
+    automaton.paint(glm.ivec2(90, 80), pen=particle.Sand)
+    before = automaton.board.type.copy()
+
+    automaton.step()
+
+    assert 0 < automaton.visited_cells < 100 * 100 // 10
+    assert automaton.moved_particles > 0
+    moved = np.argwhere(automaton.board.type != before)
+    assert (moved[:, 0] < 30).any() and (moved[:, 0] > 70).any()
@@ -0,0 +1,52 @@
+import pytest
+from benchmarks.suite import *
+
+
+@pytest.mark.parametrize("scenario", list(SCENARIOS))
+def test_run_reports_every_phase(scenario: str) -> None:
+    result = run(ENGINES["src"], SCENARIOS[scenario], 40, 60, ticks=3, seed=0, redraw=False)
+
+    assert result["ticks"] == 3
+    assert result["ticks_per_sec"] > 0
+    assert set(result["phases_ms"]) == set(PHASES)
+    assert result["active_chunks"]["total"] == 4 * 6
+    json.dumps(result)
+
+
+def test_compare_flags_slower_runs() -> None:
+    result = {"engine": "src", "scenario": "idle", "height": 40, "width": 60, "ticks_per_sec": 50.0}
+    baseline = {"results": [dict(result, ticks_per_sec=100.0)]}
+
+    assert compare([result], baseline, tolerance=0.1)
+    assert not compare([result], baseline, tolerance=0.6)
+
+
+def test_allocations_are_traced() -> None:
+    from benchmarks.allocations import measure
+    result = measure(SCENARIOS["water_flood"], 40, 60, ticks=2, warmup=1)
+
+    assert result["peak_bytes"] >= result["retained_bytes"] >= 0
+    assert result["blocks"] >= 0
+    assert result["ms"] > 0
+
+
+def test_allocations_against_a_baseline(tmp_path, monkeypatch, capsys) -> None:
+    from benchmarks import allocations
+    arguments = ["allocations", "--scenarios", "water_flood", "--size", "40x60", "--ticks", "2", "--warmup", "1"]
+    monkeypatch.setattr(sys, "argv", arguments + ["--output", str(tmp_path / "before.json")])
+    allocations.main()
+    monkeypatch.setattr(sys, "argv", arguments + ["--baseline", str(tmp_path / "before.json")])
+    allocations.main()
+
+    assert "before -> after" in capsys.readouterr().out
+    monkeypatch.setattr(sys, "argv", arguments[:-1] + ["2", "--baseline", str(tmp_path / "before.json")])
+    with pytest.raises(SystemExit):
+        allocations.main()
+
+
+def test_tune_picks_a_measured_chunk_size() -> None:
+    from benchmarks.tune import tune
+    best, results = tune(ENGINES["src"], SCENARIOS["sand_avalanche"], 40, 60, candidates=(10, 20, 80), ticks=2)
+
+    assert set(results) == {10, 20}
+    assert results[best] == max(results.values())
@@ -0,0 +1,76 @@
+import pytest
+from src.board import *
+from src.simulation import Simulation
+
+
+@pytest.fixture
+def board():
+    return CompactBoard(20, 10)
+
+
+def test_set_and_get(board: CompactBoard) -> None:
+    board[3, 4] = particle.Water(3, 4)
+
+    cell = board[3, 4]
+    assert cell.id() == particle.ParticleType.Water
+    assert cell.pos == glm.ivec2(4, 3)
+    assert cell.dispersion == 4
+    assert board[3, 5] is None
+
+    board[3, 4] = None
+    assert board[3, 4] is None
+
+
+def test_cell_view_writes_through(board: CompactBoard) -> None:
+    board[0, 0] = particle.Sand(0, 0)
+
+    cell = board[0, 0]
+    cell.vel.y += 1.5
+    cell.is_falling = False
+    cell.been_updated = True
+
+    again = board[0, 0]
+    assert again.vel.y == pytest.approx(1.5)
+    assert not again.is_falling
+    assert again.been_updated
+
+
+def test_swap(board: CompactBoard) -> None:
+    board[0, 0] = particle.Sand(0, 0)
+    board[5, 5] = particle.Water(5, 5)
+    color = board[0, 0].color
+
+    cell = board[0, 0]
+    board.swap(cell, 5, 5)
+
+    assert cell.pos == glm.ivec2(5, 5)
+    assert board[5, 5].id() == particle.ParticleType.Sand
+    assert board[5, 5].color == color
+    assert board[0, 0].id() == particle.ParticleType.Water
+
+
+def test_memory_per_cell(board: CompactBoard) -> None:
+    assert board.nbytes / (board.shape[0] * board.shape[1]) < 32
+
+
+def test_particles_step_on_compact_board() -> None:
+    simulation = Simulation(40, 30, board_type=CompactBoard)
+    simulation.paint(glm.ivec2(15, 5), pen=particle.Sand)
+    painted = int((simulation.board.type != CompactBoard.EMPTY).sum())
+
+    simulation.step(60)
+
+    assert int((simulation.board.type != CompactBoard.EMPTY).sum()) == painted
+    assert (simulation.board.type[:30] == CompactBoard.EMPTY).all()
+
+
+def test_settled_particles_sleep_on_compact_board() -> None:
+    simulation = Simulation(40, 30, chunk_size=10, board_type=CompactBoard)
+    simulation.paint(glm.ivec2(15, 5), pen=particle.Sand)
+    simulation.board[20, 5] = particle.Wood(20, 5)
+    simulation.mark(19, 4, 22, 7)
+
+    simulation.step(60)
+
+    assert simulation.active_chunks() == 0
+    assert simulation.visited_cells == 0
@@ -0,0 +1,29 @@
+import pytest
+from src.config import *
+
+
+def test_window_follows_board_and_scale() -> None:
+    config = Config(100, 250, scale=3)
+
+    assert (config.window_width, config.window_height) == (750, 300)
+    with pytest.raises(ValueError):
+        Config(100, 250, chunk_size=0)
+
+
+def test_from_args() -> None:
+    parser = argparse.ArgumentParser()
+    add_arguments(parser)
+
+    config = from_args(parser.parse_args(["--size", "400x720", "--scale", "2", "--no-debug", "--chunk-size", "16"]))
+    assert (config.board_height, config.board_width, config.scale) == (400, 720, 2)
+    assert not config.debug and config.chunk_size == 16
+    assert config.fps == FPS and config.tick_rate == TICK_RATE
+    assert from_args(parser.parse_args(["--tick-rate", "120"])).tick_rate == 120
+
+    tuned = from_args(parser.parse_args(["--chunk-size", "auto"]), chunk_size=32)
+    assert tuned.chunk_size == 32
+    with pytest.raises(SystemExit):
+        parser.parse_args(["--size", "400"])
+    for chunk_size in ("foo", "0", "-8"):
+        with pytest.raises(SystemExit):
+            parser.parse_args(["--chunk-size", chunk_size])
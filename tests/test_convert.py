@@ -0,0 +1,54 @@
+import pytest
+from PIL import Image
+from src.convert import *
+from src.simulation import Simulation, CompactBoard, particle
+
+
+def test_nearest_palette() -> None:
+    rgb = np.array([[[0xE4, 0xEB, 0x15], [0x10, 0x60, 0xA0], [0, 0, 0]]], dtype=np.uint8)
+    names, index, colors = nearest_palette(rgb, particle.COLORS)
+
+    assert [names[entry] for entry in index[0]] == ["Sand", "Water", "Smoke"]
+    assert colors[0, 0] == 0xE4EB15 and colors[0, 1] == 0x0F5E9C
+
+
+def test_load_img_fits_and_centers() -> None:
+    rgb, offset_y, offset_x = load_img(np.zeros((20, 80, 3), dtype=np.uint8), 40, 40)
+
+    assert rgb.shape == (10, 40, 3)
+    assert (offset_y, offset_x) == (15, 0)
+
+
+def test_map_colors(tmp_path) -> None:
+    image = np.zeros((10, 20, 3), dtype=np.uint8)
+    image[:, :10] = (0x46, 0x1F, 0x00)  # wood
+    image[:, 10:] = (0xE4, 0xEB, 0x15)  # sand
+    path = str(tmp_path / "image.png")
+    Image.fromarray(image).save(path)
+
+    simulation = Simulation(30, 20, chunk_size=10)
+    simulation.map_colors(path)
+
+    assert all(isinstance(cell, particle.Wood) for cell in simulation.board[10:20, :10].flat)
+    assert all(isinstance(cell, particle.Sand) for cell in simulation.board[10:20, 10:].flat)
+    assert (particle.PALETTE[simulation.board.color[10:20, 10:]] == 0xE4EB15).all()
+    assert simulation.board[0, 0] is None
+    assert simulation.chunks[1, 0].should_be_updated_next_frame
+
+
+def test_map_colors_on_typed_boards() -> None:
+    image = np.zeros((10, 20, 3), dtype=np.uint8)
+    image[:, :10] = (0xFF, 0x00, 0x00)  # fire
+    image[:, 10:] = (0x0A, 0x0A, 0x0A)  # smoke
+
+    objects = Simulation(30, 20, chunk_size=10)
+    objects.map_colors(image)
+    compact = Simulation(30, 20, chunk_size=10, board_type=CompactBoard)
+    compact.map_colors(image)
+
+    assert (compact.board.type == objects.board.type).all()
+    assert (compact.board.color == objects.board.color).all()
+    assert (compact.board.heat[10:20, :10] == 100).all()
+    assert compact.board[15, 5].is_falling and not compact.board[15, 5].been_updated
+    lifetime = compact.board.lifetime[10:20, 10:]
+    assert ((lifetime >= 10) & (lifetime <= 80)).all() and len(np.unique(lifetime)) > 1
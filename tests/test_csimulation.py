@@ -0,0 +1,111 @@
+import pytest
+import numpy as np
+import src.particle as particle
+
+csimulation = pytest.importorskip("cver.csimulation")
+
+# cver.cparticle.ParticleType
+SAND, WATER, WOOD, FIRE, SMOKE, EMPTY = range(6)
+
+
+def run(workers: int, ticks: int = 80) -> "csimulation.Simulation":
+    simulation = csimulation.Simulation(120, 160, chunk_size=10, workers=workers, seed=7)
+    for tick in range(ticks):
+        if tick % 4 == 0 and tick < 40:
+            for pen, x in ((SAND, 20), (WATER, 70), (WOOD, 110), (FIRE, 120)):
+                simulation.pen = pen
+                simulation.paint((x + tick, 10), (x + tick + 15, 25))
+        simulation.step()
+    return simulation
+
+
+def test_schedule_blocks_cover_particle_reach() -> None:
+    simulation = csimulation.Simulation(120, 160, chunk_size=10)
+
+    # particles reach 17 cells and wake 1 more around them
+    assert simulation.blockSize * simulation.chunkSize >= 2 * 18
+    assert simulation.blockRows * simulation.blockSize >= simulation.chunkRows
+    assert simulation.blockColumns * simulation.blockSize >= simulation.chunkColumns
+
+
+@pytest.mark.parametrize("workers", [2, 3, 4])
+def test_parallel_update_matches_serial(workers: int) -> None:
+    serial = run(1)
+    parallel = run(workers)
+
+    assert parallel.tick == serial.tick
+    assert (serial.types() != EMPTY).any()
+    assert np.array_equal(parallel.types(), serial.types())
+    assert np.array_equal(parallel.colors(), serial.colors())
+
+
+def test_parallel_update_needs_no_lock() -> None:
+    simulation = run(4)
+
+    assert simulation.cross_writes == 0
+
+
+def test_settled_board_sleeps() -> None:
+    simulation = csimulation.Simulation(120, 160, chunk_size=10, seed=7)
+    simulation.pen = SAND
+    simulation.paint((80, 20))
+    simulation.step(200)
+
+    # the pile rests, nothing is left to visit or redraw
+    simulation.pop_dirty_rects()
+    simulation.step()
+    assert simulation.active_chunks() == 0
+    assert simulation.visited_cells == 0
+    assert simulation.pop_dirty_rects() == []
+
+
+def test_swap_throughput() -> None:
+    tools = pytest.importorskip("cver.tools")
+
+    assert tools.swap_throughput(2, 10_000, owned=True) > 0
+    assert tools.swap_throughput(2, 10_000, owned=False) > 0
+
+
+def test_stroke_wakes_chunks_under_the_brush() -> None:
+    simulation = csimulation.Simulation(200, 200, chunk_size=10)
+    simulation.step(2)
+    simulation.pen = WOOD
+    simulation.pen_size = 3
+    simulation.paint((150, 20), (40, 170))
+
+    painted = {(y // 10, x // 10) for y, x in np.argwhere(simulation.types() != EMPTY)}
+    woken = {(row, column) for row, column in np.argwhere(simulation.get_state()["chunks"] & 0b10)}
+    assert painted <= woken
+    # a diagonal band, not its bounding box
+    assert len(woken) < 2 * len(painted)
+
+
+def test_map_colors() -> None:
+    image = np.zeros((10, 20, 3), dtype=np.uint8)
+    image[:, :10] = (0x46, 0x1F, 0x00)
+    image[:, 10:] = (0xE4, 0xEB, 0x15)
+
+    simulation = csimulation.Simulation(30, 20, chunk_size=10)
+    simulation.map_colors(image)
+
+    types = simulation.types()
+    assert (types[10:20, :10] == WOOD).all() and (types[10:20, 10:] == SAND).all()
+    assert (particle.PALETTE[simulation.colors()[10:20, 10:]] == 0xE4EB15).all()
+    assert (types[:10] == EMPTY).all()
+
+
+def test_far_strokes_wake_sleeping_blocks() -> None:
+    simulation = csimulation.Simulation(400, 400, chunk_size=10, seed=7)
+    simulation.step(2)
+    simulation.pop_dirty_rects()
+    assert simulation.active_chunks() == 0
+
+    simulation.pen = SAND
+    simulation.paint((390, 10))
+    simulation.paint((10, 390))
+    simulation.step()
+
+    active = simulation.get_state()["chunks"] & 0b01
+    assert simulation.active_chunks() == active.sum() > 0
+    rows, columns = np.nonzero(active)
+    assert set(zip(rows // 20, columns // 20)) == {(0, 1), (1, 0)}
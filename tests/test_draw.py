@@ -0,0 +1,52 @@
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import glm
+import numpy as np
+import pygame as py
+import pytest
+from src.config import Config
+from src.draw import Display
+from src.profiler import Profiler
+from src.simulation import Simulation
+import src.particle as particle
+
+
+@pytest.fixture
+def display():
+    py.display.init()
+    config = Config(40, 60, scale=2, debug=False)
+    simulation = Simulation(40, 60, seed=0, profiler=Profiler(enabled=True))
+    yield Display(config.window_width, config.window_height, simulation, config)
+    py.display.quit()
+
+
+def test_frame_is_drawn_into_the_surface(display: Display) -> None:
+    display.simulation.paint(glm.ivec2(30, 5), pen=particle.Water)
+    display.redraw()
+
+    pixels = py.surfarray.array2d(display.surface)
+    assert (pixels.T == display.board.color).all()
+    window = py.surfarray.array2d(py.display.get_surface())
+    assert (window[::2, ::2].T & 0xFFFFFF == particle.PALETTE[display.board.color]).all()
+
+
+def test_present_skips_unchanged_frames(display: Display) -> None:
+    display.redraw()
+    assert not display.draw_frame()
+    display.present()
+    display.present()
+    assert display.simulation.profiler.stats("blit_scale")["count"] == 1
+
+    display.simulation.paint(glm.ivec2(30, 5), pen=particle.Sand)
+    display.redraw()
+    assert display.simulation.profiler.stats("blit_scale")["count"] == 2
+
+
+def test_present_redraws_chunk_outlines(display: Display) -> None:
+    display.config.debug = True
+    display.redraw()
+    display.present()
+
+    assert display.simulation.profiler.stats("blit_scale")["count"] == 2
@@ -0,0 +1,73 @@
+import pytest
+from src.simulation import *
+from src.board import CompactBoard
+from src.heat import *
+
+
+@pytest.fixture(params=[tools.Board, CompactBoard], ids=["Board", "CompactBoard"])
+def simulation(request):
+    return Simulation(30, 30, chunk_size=10, seed=0, board_type=request.param)
+
+
+def test_box_sum() -> None:
+    array = np.arange(12, dtype=np.float32).reshape(3, 4)
+
+    summed = box_sum(padded(array, (0, 0, 3, 4)))
+
+    assert summed.shape == array.shape
+    assert summed[1, 1] == array[:3, :3].sum()
+    assert summed[0, 0] == array[:2, :2].sum()
+
+
+def test_board_keeps_types() -> None:
+    board = tools.Board(4, 4)
+
+    board[1, 2] = particle.Wood(1, 2)
+    assert board.type[1, 2] == particle.ParticleType.Wood.value
+    board[1, 2] = None
+    assert board.type[1, 2] == EMPTY
+
+
+def test_flammable_follows_particles() -> None:
+    for cls in (particle.Sand, particle.Water, particle.Wood, particle.Fire, particle.Smoke):
+        assert FLAMMABLE[cls.kind] == cls(0, 0).flammable
+
+
+def test_fire_ignites_wood(simulation: Simulation) -> None:
+    for x in range(5, 25):
+        simulation.board[20, x] = particle.Wood(20, x)
+    simulation.board[19, 15] = particle.Fire(19, 15, True)
+    simulation.mark(0, 0, 30, 30)
+
+    simulation.step(60)
+
+    assert (simulation.board.type[20, 5:25] != particle.ParticleType.Wood.value).any()
+    assert simulation.heat.temperature.max() > IGNITION_TEMPERATURE
+
+
+def test_water_puts_fire_out(simulation: Simulation) -> None:
+    for x in range(10, 20):
+        simulation.board[29, x] = particle.Water(29, x)
+        simulation.board[28, x] = particle.Fire(28, x, True)
+    simulation.mark(0, 0, 30, 30)
+
+    simulation.step(2)
+
+    assert not (simulation.board.type == FIRE).any()
+
+
+def test_heat_cools_down_before_its_chunk_sleeps(simulation: Simulation) -> None:
+    simulation.step(3)
+    simulation.heat.temperature[4:7, 4:7] = FIRE_TEMPERATURE
+    simulation.mark(4, 4, 7, 7)
+
+    simulation.step(200)
+
+    assert simulation.heat.temperature.max() <= IGNITION_TEMPERATURE
+    assert simulation.active_chunks() == 0
+
+    for x in range(3, 8):
+        simulation.board[5, x] = particle.Wood(5, x)
+    simulation.mark(5, 3, 6, 8)
+    simulation.step(5)
+    assert (simulation.board.type[5, 3:8] == particle.ParticleType.Wood.value).all()
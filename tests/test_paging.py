@@ -0,0 +1,133 @@
+from functools import partial
+
+import pytest
+from src.paging import *
+from src.simulation import Simulation, PENS
+from src import snapshot, rng
+import src.particle as particle
+import glm
+
+
+@pytest.fixture
+def board():
+    # Room for two 10x10 pages
+    board = PagedBoard(40, 30, page_size=10, max_bytes=2 * 2300, sleep_ticks=2)
+    yield board
+    board.close()
+
+
+def test_pages_round_trip_through_the_file(board: PagedBoard) -> None:
+    board[3, 4] = particle.Water(3, 4)
+    board[35, 25] = particle.Sand(35, 25)
+    board.vel[35, 25] = (0.5, 2.0)
+    assert board.resident_pages() == 2
+
+    for _ in range(4):
+        board.evict()
+    board[15, 15] = particle.Wood(15, 15)
+    board[25, 5] = particle.Wood(25, 5)
+    board.evict()
+
+    assert board.evictions == 2
+    assert set(board.resident) == {(1, 1), (2, 0)}
+    assert np.asarray(board.type)[3, 4] == particle.ParticleType.Water.value
+    assert board[35, 25].id() == particle.ParticleType.Sand
+    assert tuple(board.vel[35, 25]) == (0.5, 2.0)
+    assert board.stats()["misses"] == 5
+
+
+def test_recently_used_pages_stay(board: PagedBoard) -> None:
+    for y in (0, 10, 20, 30):
+        board[y, 0] = particle.Sand(y, 0)
+    board.evict()
+
+    assert board.resident_pages() == 4
+    assert board.evictions == 0
+
+
+def test_slices_span_pages(board: PagedBoard) -> None:
+    board.color[5:25, 8:12] = 7
+    board.vel[12, 5:15] = np.arange(20, dtype=np.float32).reshape(10, 2)
+
+    expected = np.zeros((40, 30), dtype=np.uint8)
+    expected[5:25, 8:12] = 7
+    assert (np.asarray(board.color) == expected).all()
+    assert (board.color[4:26:3, 9] == expected[4:26:3, 9]).all()
+    assert (board.vel[12, 5:15] == np.arange(20).reshape(10, 2)).all()
+    assert (board.color[np.array([5, 30]), np.array([8, 8])] == (7, 0)).all()
+
+
+def test_paged_simulation_matches_compact() -> None:
+    def run(board_type):
+        simulation = Simulation(60, 80, 10, seed=3, board_type=board_type)
+        for i, pen in enumerate(("sand", "water", "wood", "fire")):
+            simulation.paint(glm.ivec2(10 + 20 * i, 5), glm.ivec2(15 + 20 * i, 8), pen=PENS[pen])
+        simulation.step(60)
+        return simulation
+
+    compact = run(CompactBoard)
+    paged = run(partial(PagedBoard, page_size=10, max_bytes=10 * 2300, sleep_ticks=3))
+
+    assert paged.board.evictions > 0
+    for name in CompactBoard.FIELDS:
+        assert (np.asarray(getattr(paged.board, name)) == getattr(compact.board, name)).all()
+    assert (np.asarray(paged.heat.temperature) == compact.heat.temperature).all()
+
+
+def test_snapshot_restores_into_paged_board(tmp_path) -> None:
+    original = Simulation(30, 30, 10, seed=0, board_type=CompactBoard)
+    original.paint(glm.ivec2(15, 5), pen=particle.Sand)
+    original.step(5)
+    snapshot.save(original, str(tmp_path / "world.snap"))
+
+    paged = Simulation(30, 30, 10, board_type=partial(PagedBoard, page_size=10))
+    snapshot.load(str(tmp_path / "world.snap"), paged)
+
+    assert paged.board.resident_pages() == 0
+    assert (np.asarray(paged.board.type) == original.board.type).all()
+    compact = snapshot.load(str(tmp_path / "world.snap"))
+    for simulation in (paged, compact):
+        rng.stream.seed(1)
+        simulation.step(5)
+    assert (np.asarray(paged.board.type) == compact.board.type).all()
+
+
+def test_settled_pages_are_evicted_and_paged_back_in() -> None:
+    simulation = Simulation(40, 30, 10, seed=0,
+                            board_type=partial(PagedBoard, page_size=10, max_bytes=0, sleep_ticks=5))
+    simulation.paint(glm.ivec2(15, 5), pen=particle.Sand)
+    painted = int((np.asarray(simulation.board.type) != CompactBoard.EMPTY).sum())
+
+    simulation.step(80)
+
+    assert simulation.active_chunks() == 0
+    assert simulation.board.resident_pages() == 0
+    assert int((np.asarray(simulation.board.type) != CompactBoard.EMPTY).sum()) == painted
+
+    misses = simulation.board.misses
+    simulation.paint(glm.ivec2(15, 25), pen=particle.Water)
+    assert simulation.board.misses > misses
+    assert simulation.board.resident_pages() > 0
+    assert simulation.board[25, 15].id() == particle.ParticleType.Water
+
+
+def test_pages_have_to_line_up_with_chunks() -> None:
+    with pytest.raises(ValueError):
+        Simulation(40, 30, 10, board_type=partial(PagedBoard, page_size=15))
+
+
+def test_index_arrays_touch_each_page_once(board: PagedBoard) -> None:
+    generator = np.random.default_rng(0)
+    ys, xs = generator.integers(0, 40, (6, 50)), generator.integers(-30, 30, (6, 50))
+    expected = np.zeros((40, 30, 2), dtype=np.float32)
+    values = generator.random((6, 50, 2), dtype=np.float32)
+
+    board.vel[ys, xs] = values
+    expected[ys, xs] = values
+
+    assert (np.asarray(board.vel) == expected).all()
+    assert (board.vel[ys, xs] == expected[ys, xs]).all()
+    # Every page at most once per write and once per read
+    assert board.hits + board.misses <= 2 * 12
+    with pytest.raises(IndexError):
+        board.color[np.array([40]), np.array([0])]
@@ -0,0 +1,52 @@
+import pytest
+from src.profiler import *
+from src.simulation import Simulation
+import src.particle as particle
+
+
+def test_ring_buffer_keeps_newest() -> None:
+    ring = RingBuffer(4)
+    for value in range(6):
+        ring.append(value)
+
+    assert ring.count == 4
+    assert ring.values().tolist() == [2, 3, 4, 5]
+
+
+def test_stats_percentiles() -> None:
+    profiler = Profiler(capacity=100, enabled=True)
+    for value in range(1, 101):
+        profiler.record("update", value)
+
+    stats = profiler.stats("update")
+    assert stats["count"] == 100
+    assert stats["p50"] == pytest.approx(50.5)
+    assert stats["p95"] == pytest.approx(95.05)
+    assert stats["p99"] == pytest.approx(99.01)
+    assert stats["max"] == 100
+
+
+def test_disabled_records_nothing() -> None:
+    profiler = Profiler()
+    with profiler.phase("update"):
+        pass
+    profiler.record("moved_particles", 3)
+
+    assert profiler.phase("update") is NULL_PHASE
+    assert profiler.summary() == {}
+
+
+def test_simulation_phases(tmp_path) -> None:
+    profiler = Profiler(enabled=True)
+    simulation = Simulation(40, 30, profiler=profiler)
+    simulation.paint((15, 5), pen=particle.Sand)
+    simulation.step(5)
+
+    summary = profiler.summary()
+    assert {"reset_chunks", "update", "active_chunks", "moved_particles"} <= set(summary)
+    assert summary["update"]["count"] == 5
+    assert profiler.values("moved_particles").max() > 0
+
+    path = tmp_path / "profile.json"
+    profiler.dump(str(path), samples=True)
+    assert json.loads(path.read_text())["samples"]["update"]
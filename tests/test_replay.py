@@ -0,0 +1,51 @@
+import pytest
+from src.replay import *
+from src.simulation import Simulation, PENS
+from src.board import CompactBoard
+import numpy as np
+
+
+def play(simulation, path: str, pens: dict = PENS) -> None:
+    simulation.recorder = Recorder(simulation)
+    for tick in range(30):
+        if tick < 10:
+            simulation.pen_size = 2 + tick % 3
+            simulation.paint((5 + tick, 3), (8 + tick, 6), pens["sand"] if tick % 2 else pens["water"])
+        if tick == 12:
+            simulation.paint((10, 30), pen=pens["eraser"])
+        simulation.step()
+    simulation.recorder.save(path, 30)
+
+
+def same_board(a, b) -> bool:
+    a, b = a.get_state(), b.get_state()
+    return all(np.array_equal(a[name], b[name]) for name in CompactBoard.FIELDS + ("chunks",))
+
+
+def test_recording(tmp_path) -> None:
+    path = str(tmp_path / "input.json")
+    play(Simulation(40, 30, seed=5), path)
+
+    recording = load(path)
+    assert recording["ticks"] == 30
+    assert recording["seed"] == 5
+    assert len(recording["events"]) == 11
+    assert recording["events"][0] == [0, 5, 3, 8, 6, LEFT, "water", 2]
+    assert recording["events"][-1][5:7] == [RIGHT, "eraser"]
+
+
+@pytest.mark.parametrize("engine", ["src", "cver", "numpy"])
+def test_replay_reproduces_the_run(tmp_path, engine: str) -> None:
+    if engine == "cver":
+        pytest.importorskip("cver.csimulation")
+    path = str(tmp_path / "input.json")
+    recording = {"height": 40, "width": 30, "chunk_size": 10, "seed": 5}
+
+    original, pens = make_simulation(engine, recording)
+    play(original, path, pens)
+
+    replayed, pens = make_simulation(engine, load(path))
+    replay(load(path), replayed, pens)
+
+    assert replayed.tick == original.tick
+    assert same_board(replayed, original)
@@ -0,0 +1,37 @@
+import pytest
+from src.rng import *
+from src.simulation import Simulation
+import src.particle as particle
+
+
+def test_same_seed_same_stream() -> None:
+    a, b = RandomStream(3, batch=16), RandomStream(3, batch=16)
+
+    # across several refills
+    assert [a.random() for _ in range(100)] == [b.random() for _ in range(100)]
+    a.seed(4)
+    b.seed(4)
+    assert a.random() == b.random()
+
+
+def test_ranges() -> None:
+    stream = RandomStream(0, batch=64)
+    ints = {stream.randint(-1, 1) for _ in range(1000)}
+    floats = [stream.random() for _ in range(1000)]
+
+    assert ints == {-1, 0, 1}
+    assert all(0.0 <= value < 1.0 for value in floats)
+    assert {stream.choice("abc") for _ in range(1000)} == set("abc")
+
+
+def test_simulation_is_deterministic_per_seed() -> None:
+    def run(seed: int) -> list:
+        simulation = Simulation(40, 30, seed=seed)
+        simulation.paint((15, 5), (20, 8), pen=particle.Water)
+        simulation.paint((5, 35), (25, 35), pen=particle.Wood)
+        simulation.paint((10, 33), pen=particle.Fire)
+        simulation.step(30)
+        return simulation.board.color.tolist()
+
+    assert run(1) == run(1)
+    assert run(1) != run(2)
@@ -0,0 +1,104 @@
+import pytest
+from src.simulation import *
+
+
+@pytest.fixture
+def simulation():
+    return Simulation(40, 30, chunk_size=10)
+
+
+def test_paint(simulation: Simulation) -> None:
+    simulation.paint(glm.ivec2(15, 10), pen=particle.Sand)
+
+    cell = simulation.board[10, 15]
+    assert cell is not None and cell.id() == particle.ParticleType.Sand
+    assert simulation.chunks[1, 1].should_be_updated_next_frame
+
+
+def test_step_without_display(simulation: Simulation) -> None:
+    simulation.paint(glm.ivec2(15, 5), pen=particle.Sand)
+    painted = sum(cell is not None for cell in simulation.board.flat)
+
+    simulation.step(60)
+
+    assert simulation.tick == 60
+    assert sum(cell is not None for cell in simulation.board.flat) == painted
+    # everything has settled on the floor
+    assert all(cell is None for cell in simulation.board[:30].flat)
+
+
+def test_step_sleeps_settled_chunks(simulation: Simulation) -> None:
+    simulation.step(3)
+
+    assert not any(chunk.is_active() for chunk in simulation.chunks.flat)
+
+
+def test_board_color_buffer(simulation: Simulation) -> None:
+    simulation.paint(glm.ivec2(15, 5), pen=particle.Sand)
+    simulation.step(20)
+
+    board = simulation.board
+    for y in range(simulation.height):
+        for x in range(simulation.width):
+            cell = board[y, x]
+            assert board.color[y, x] == (0 if cell is None else cell.color)
+
+
+def test_dirty_rects(simulation: Simulation) -> None:
+    assert len(simulation.pop_dirty_rects()) == simulation.chunks.size
+    assert len(simulation.pop_dirty_rects()) == 0
+
+    simulation.paint(glm.ivec2(15, 35), pen=particle.Wood)
+    rects = simulation.pop_dirty_rects()
+    assert len(rects) == 2
+    for top, left, bottom, right in rects:
+        # inside chunks (3, 1) and (3, 2)
+        assert 30 <= top < bottom <= 40 and 10 <= left < right <= 30
+    painted = {(y, x) for y, x in np.argwhere(simulation.board.color != 0)}
+    assert painted and all(any(top <= y < bottom and left <= x < right for top, left, bottom, right in rects)
+                           for y, x in painted)
+
+    simulation.step(3)
+    simulation.pop_dirty_rects()
+    simulation.step()
+    assert len(simulation.pop_dirty_rects()) == 0
+
+
+def test_update_visits_dirty_rects() -> None:
+    simulation = Simulation(128, 128, chunk_size=32)
+    simulation.step(2)
+    simulation.pen_size = 0
+    simulation.paint(glm.ivec2(64, 20), pen=particle.Sand)
+    simulation.step()
+
+    # the grain and its neighbours, not whole chunks
+    assert 0 < simulation.visited_cells < 32 * 32
+
+
+def test_stroke_wakes_chunks_under_the_brush() -> None:
+    simulation = Simulation(200, 200, chunk_size=10)
+    simulation.step(2)
+    simulation.pen_size = 3
+    simulation.paint(glm.ivec2(150, 20), glm.ivec2(40, 170), pen=particle.Wood)
+
+    painted = {(y // 10, x // 10) for y, x in np.argwhere(simulation.board.color != 0)}
+    woken = {(row, column) for (row, column), chunk in np.ndenumerate(simulation.chunks)
+             if chunk.should_be_updated_next_frame}
+    assert painted <= woken
+    # a diagonal band, not its bounding box
+    assert len(woken) < 2 * len(painted)
+
+
+def test_index_skips_sleeping_blocks() -> None:
+    simulation = Simulation(400, 400, chunk_size=10)
+    simulation.step(2)
+    simulation.pop_dirty_rects()
+    assert not simulation.index.awake and not simulation.index.active and not simulation.index.dirty
+
+    simulation.paint(glm.ivec2(390, 10), pen=particle.Sand)
+    assert simulation.index.awake == {(0, 4)}
+
+    simulation.step()
+    assert simulation.index.active == {(0, 4)}
+    assert 0 < simulation.active_chunks() == sum(chunk.is_active() for chunk in simulation.chunks.flat)
+    assert all(top < 80 and right > 320 for top, _, _, right in simulation.pop_dirty_rects())
@@ -0,0 +1,100 @@
+import os
+
+import pytest
+from src.snapshot import *
+from src.simulation import Simulation
+from src.board import CompactBoard
+import src.particle as particle
+
+
+@pytest.fixture
+def simulation() -> Simulation:
+    simulation = Simulation(40, 30, chunk_size=10)
+    simulation.paint((10, 5), (20, 5), pen=particle.Sand)
+    simulation.paint((5, 30), pen=particle.Wood)
+    simulation.step(5)
+    return simulation
+
+
+def same_state(a: dict, b: dict) -> bool:
+    return all(np.array_equal(a[name], b[name]) for name in CompactBoard.FIELDS + ("chunks",))
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_round_trip(simulation: Simulation, tmp_path, compress: bool) -> None:
+    path = str(tmp_path / "world.snd")
+    save(simulation, path, compress)
+
+    restored = load(path, Simulation(40, 30, chunk_size=10))
+
+    assert restored.tick == simulation.tick
+    assert same_state(restored.get_state(), simulation.get_state())
+    assert np.array_equal(restored.board.color, simulation.board.color)
+
+
+def test_mmap_load_on_compact_board(simulation: Simulation, tmp_path) -> None:
+    path = str(tmp_path / "world.snd")
+    save(simulation, path)
+    size = os.path.getsize(path)
+
+    restored = load(path)
+
+    assert isinstance(restored.board, CompactBoard)
+    assert isinstance(restored.board.type, np.memmap)
+    assert same_state(restored.get_state(), simulation.get_state())
+    # Copy on write, stepping never touches the file
+    restored.step(20)
+    assert same_state(read(path), simulation.get_state())
+    assert os.path.getsize(path) == size
+
+
+def test_compressed_is_smaller(simulation: Simulation, tmp_path) -> None:
+    save(simulation, str(tmp_path / "raw.snd"))
+    save(simulation, str(tmp_path / "small.snd"), compress=True)
+
+    assert os.path.getsize(tmp_path / "small.snd") < os.path.getsize(tmp_path / "raw.snd")
+
+
+def test_rejects_other_files(tmp_path) -> None:
+    path = tmp_path / "world.snd"
+    path.write_bytes(b"not a snapshot at all")
+
+    with pytest.raises(ValueError):
+        read(str(path))
+
+
+def test_reads_version_1_colors(simulation: Simulation, tmp_path, monkeypatch) -> None:
+    import src.snapshot
+    state = simulation.get_state()
+    path = str(tmp_path / "world.snd")
+    # Version 1 kept 0xRRGGBB colors
+    monkeypatch.setattr(src.snapshot, "VERSION", 1)
+    write(path, dict(state, color=particle.PALETTE[state["color"]]))
+    monkeypatch.undo()
+
+    assert read_header(path)["version"] == 1
+    assert same_state(read(path), state)
+
+
+def test_size_mismatch(simulation: Simulation, tmp_path) -> None:
+    path = str(tmp_path / "world.snd")
+    save(simulation, path)
+
+    with pytest.raises(ValueError):
+        load(path, Simulation(20, 30))
+
+
+def test_cver_round_trip(tmp_path) -> None:
+    csimulation = pytest.importorskip("cver.csimulation")
+    simulation = csimulation.Simulation(40, 30, seed=3)
+    simulation.paint((10, 5), (20, 5))
+    simulation.step(5)
+
+    path = str(tmp_path / "world.snd")
+    save(simulation, path)
+    restored = load(path, csimulation.Simulation(40, 30, seed=3))
+
+    assert restored.tick == simulation.tick
+    assert same_state(restored.get_state(), simulation.get_state())
+    # and the Python engine reads the same world
+    assert same_state(load(path).get_state(), simulation.get_state())
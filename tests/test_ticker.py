@@ -0,0 +1,85 @@
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import glm
+import numpy as np
+import pygame as py
+import pytest
+from src.config import Config
+from src.draw import Display
+from src.simulation import Simulation
+from src.ticker import *
+import src.particle as particle
+
+
+@pytest.fixture
+def display():
+    py.display.init()
+    config = Config(40, 60, scale=1, debug=False)
+    display = Display(config.window_width, config.window_height, Simulation(40, 60, seed=0), config)
+    display.simulation.paint(glm.ivec2(30, 5), pen=particle.Sand)
+    yield display
+    py.display.quit()
+
+
+def test_lockstep_ticks_once_per_frame(display: Display) -> None:
+    stepper = Lockstep(display)
+
+    stepper.advance(True)
+    stepper.advance(False)
+    stepper.present()
+
+    assert display.simulation.tick == 1
+    assert (display.surface_array == display.board.color.T).all()
+
+
+def test_ticker_publishes_the_latest_frame(display: Display) -> None:
+    ticker = Ticker(display, tick_rate=4)
+
+    assert ticker.catch_up(0.0) == 0.0
+    assert ticker.catch_up(0.125) == 0.125
+    assert ticker.catch_up(0.25) == 0.0
+    with ticker.lock:
+        display.simulation.paint(glm.ivec2(10, 5), pen=particle.Water)
+    ticker.catch_up(0.5)
+    ticker.present()
+
+    assert display.simulation.tick == 3 and ticker.frames > 0
+    assert (display.surface_array == display.board.color.T).all()
+
+
+def test_ticker_drops_what_it_can_not_catch_up(display: Display) -> None:
+    ticker = Ticker(display, tick_rate=4, max_catch_up=2)
+
+    ticker.catch_up(0.0)
+    ticker.catch_up(2.0)
+
+    assert display.simulation.tick == 3
+    assert ticker.dropped == 6
+    # The backlog is gone, not owed
+    assert ticker.catch_up(2.125) == 0.125
+
+
+def test_paused_ticker_still_shows_painting(display: Display) -> None:
+    ticker = Ticker(display, tick_rate=4)
+    ticker.advance(False)
+
+    with ticker.lock:
+        display.simulation.paint(glm.ivec2(10, 30), pen=particle.Wood)
+    ticker.catch_up(0.0)
+
+    assert display.simulation.tick == 0
+    assert (display.surface_array == display.board.color.T).all()
+    assert np.count_nonzero(display.surface_array) > 0
+
+
+def test_ticker_thread_reads_its_clock(display: Display) -> None:
+    # Time stands still: at most the first tick is ever due
+    ticker = Ticker(display, tick_rate=4, clock=lambda: 0.0)
+
+    ticker.start()
+    ticker.stop()
+
+    assert not ticker.is_alive()
+    assert display.simulation.tick <= 1
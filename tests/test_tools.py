@@ -42,7 +42,7 @@ def end():
     )
 
 
-def test_interpolate_pos(start: Iterable[Vec], end: Iterable[Vec]) -> None:
+def test_interpolate_pos(start: Iterable[glm.ivec2], end: Iterable[glm.ivec2]) -> None:
     for i, (s, e) in enumerate(zip(start, end), 1):
         print(f"\nTEST NUMBER {i} WITH DATA {s} | {e}")
         last_pos = None
@@ -59,7 +59,7 @@ def test_interpolate_pos(start: Iterable[Vec], end: Iterable[Vec]) -> None:
             ValueError("Destination not reached")
 
 
-def test_interpolate_pos_dda(start: Iterator[Vec], end: Iterator[Vec]) -> None:
+def test_interpolate_pos_dda(start: Iterator[glm.ivec2], end: Iterator[glm.ivec2]) -> None:
     for i, (s, e) in enumerate(zip(start, end), 1):
         print(f"\nTEST NUMBER {i} WITH DATA {s} | {e}")
         last_pos = None
@@ -84,4 +84,36 @@ def test_interpolate_pos_dda(start: Iterator[Vec], end: Iterator[Vec]) -> None:
             or last_pos == e - glm.ivec2(1, 0)\
             or last_pos == e - glm.ivec2(0, 1)\
             or last_pos == e + glm.ivec2(1, 0)\
-            or last_pos == e + glm.ivec2(0, 1), ValueError(f"Destination not reached for {last_pos}")
\ No newline at end of file
+            or last_pos == e + glm.ivec2(0, 1), ValueError(f"Destination not reached for {last_pos}")
+
+def test_ray(start: Iterable[glm.ivec2], end: Iterable[glm.ivec2]) -> None:
+    for s, e in zip(start, end):
+        offset = e - s
+        expected = tuple((pos.y - s.y, pos.x - s.x) for pos in interpolate_pos_dda(s, e))
+
+        assert ray(offset.y, offset.x) == expected
+        assert ray(offset.y, offset.x) is ray(offset.y, offset.x)
+
+
+def test_segment_box_distance() -> None:
+    top, left, bottom, right = np.array([10.0]), np.array([10.0]), np.array([19.0]), np.array([19.0])
+
+    # crossing the middle, far from every corner
+    assert segment_box_distance((5, 14), (25, 15), top, left, bottom, right)[0] == 0
+    # endpoint above the box
+    assert segment_box_distance((4, 12), (4, 12), top, left, bottom, right)[0] == pytest.approx(6)
+    # passing the bottom right corner diagonally
+    assert segment_box_distance((44, 0), (0, 44), top, left, bottom, right)[0] == pytest.approx(6 / 2 ** 0.5)
+
+
+def test_brush_stroke() -> None:
+    brush = Brush(None)
+    brush.pen_size = 3
+    ys, xs = brush.stroke(glm.ivec2(30, 18), glm.ivec2(10, 10))
+    cells = set(zip(ys.tolist(), xs.tolist()))
+
+    # every cell once, a full stamp at both ends
+    assert len(cells) == len(ys)
+    for y, x in np.argwhere(stamp(3)) - 3:
+        assert (10 + y, 10 + x) in cells and (18 + y, 30 + x) in cells
+    assert stamp(3) is stamp(3)
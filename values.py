@@ -3,9 +3,13 @@ WX, WY = 1440, 800
 SCALE = 4
 BOARD_X, BOARD_Y = WX // SCALE, WY // SCALE
 FPS = 30
+# Simulation ticks per second on their own thread, 0 steps once per frame
+TICK_RATE = 0
+CHUNK_SIZE = 10
 PAINT_RANGE = 5
 PAINT_SCALE = PAINT_RANGE
 DEBUG = True
 
 GRAVITY = 0.75
 AIR_FRICTION = 0.9
+TERMINAL_VELOCITY = 8.0